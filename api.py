@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from functools import wraps
 import datetime
+import json
 import jwt
 import os
 from flask_cors import cross_origin
@@ -8,37 +9,44 @@ from flask_cors import cross_origin
 # Create API blueprint
 api = Blueprint('api', __name__)
 
+# Texts scored per batch by the bulk sentiment endpoint
+SENTIMENT_BULK_BATCH = int(os.environ.get('SENTIMENT_BULK_BATCH', 500))
+
 # API authentication
+def token_error(headers):
+    """Why a request's bearer token is rejected, or None when it is valid"""
+    token = None
+    
+    # Check if token is in headers
+    if 'Authorization' in headers:
+        auth_header = headers['Authorization']
+        if auth_header.startswith('Bearer '):
+            token = auth_header.split(' ')[1]
+    
+    if not token:
+        return 'Authentication token is missing'
+        
+    try:
+        # Decode token
+        secret_key = os.environ.get('JWT_SECRET_KEY', 'default-dev-key')
+        data = jwt.decode(token, secret_key, algorithms=["HS256"])
+        
+        # You could add user info to request here
+        # request.current_user = get_user_by_id(data['user_id'])
+        
+    except:
+        return 'Invalid authentication token'
+    
+    return None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Check if token is in headers
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({
-                'status': 'error',
-                'message': 'Authentication token is missing',
-                'code': 401
-            }), 401
-            
-        try:
-            # Decode token
-            secret_key = os.environ.get('JWT_SECRET_KEY', 'default-dev-key')
-            data = jwt.decode(token, secret_key, algorithms=["HS256"])
-            
-            # You could add user info to request here
-            # request.current_user = get_user_by_id(data['user_id'])
-            
-        except:
+        error = token_error(request.headers)
+        if error:
             return jsonify({
                 'status': 'error',
-                'message': 'Invalid authentication token',
+                'message': error,
                 'code': 401
             }), 401
             
@@ -47,7 +55,7 @@ def token_required(f):
     return decorated
 
 # Standard response format
-def api_response(data=None, message=None, status="success", code=200):
+def api_response(data=None, message=None, status="success", code=200, meta=None):
     """Generate standardized API response"""
     response = {
         'status': status,
@@ -59,6 +67,10 @@ def api_response(data=None, message=None, status="success", code=200):
         
     if data is not None:
         response['data'] = data
+    
+    # Extra top-level fields, e.g. pagination cursors
+    if meta:
+        response.update(meta)
         
     return jsonify(response), code
 
@@ -95,38 +107,52 @@ def get_token():
 @cross_origin()
 @token_required
 def get_articles():
-    """Get articles with optional filtering"""
-    from app import fetch_articles
+    """
+    Get articles with optional filtering, one page at a time
+    Pages are ordered by (published, id), newest first; pass the returned
+    next_cursor as ?cursor= to get the following page.
+    """
+    from ingestion import read_articles
+    from article_store import articles, decode_cursor
     
-    search_query = request.args.get('query', None)
+    fetch_query = articles_fetch_query(request.args)
+    search_query = fetch_query.search_query
     source_type = request.args.get('source', None)
     language = request.args.get('language', None)
-    limit = min(int(request.args.get('limit', 30)), 100)  # Max 100 articles
+    limit = fetch_query.limit
+    cursor = request.args.get('cursor', None)
     
-    # Fetch articles
-    articles = fetch_articles(search_query)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return api_response(message="Invalid cursor", status="error", code=400)
     
-    # Apply filters
-    if source_type:
-        articles = [a for a in articles if a.get('type') == source_type]
+    # The first page makes sure the query has been ingested (or refreshed),
+    # running only the connectors that can match the filters
+    if after is None:
+        read_articles(fetch_query)
     
-    if language:
-        articles = [a for a in articles if a.get('language') == language]
-    
-    # Apply limit
-    articles = articles[:limit]
+    page, next_cursor = articles.page(search_query, source_type, language, after, limit)
     
     return api_response(
-        data=articles,
-        message=f"Retrieved {len(articles)} articles"
+        data=[article.to_dict() for article in page],
+        message=f"Retrieved {len(page)} articles",
+        meta={'next_cursor': next_cursor}
     )
 
+def articles_fetch_query(args):
+    """FetchQuery of an /articles request's query string"""
+    from fetch_planner import FetchQuery
+    
+    limit = min(int(args.get('limit', 30)), 100)  # Max 100 articles
+    return FetchQuery(args.get('query', None), [args.get('source', None)], [args.get('language', None)], limit)
+
 @api.route('/articles/<article_id>', methods=['GET'])
 @cross_origin()
 @token_required
 def get_article(article_id):
     """Get a specific article by ID"""
-    from app import articles
+    from article_store import articles
     
     article = articles.get(article_id)
     if not article:
@@ -137,7 +163,7 @@ def get_article(article_id):
         )
     
     return api_response(
-        data=article,
+        data=article.to_dict(),
         message="Article retrieved successfully"
     )
 
@@ -172,7 +198,8 @@ def get_sources():
 @token_required
 def analyze_text_sentiment():
     """Analyze sentiment of provided text"""
-    from app import analyze_sentiment, contains_indonesian_words, get_sentiment_color
+    from app import analyze_sentiment
+    from language_id import language_identifier
     
     # Get text from request
     text = request.json.get('text', '')
@@ -184,23 +211,155 @@ def analyze_text_sentiment():
         )
     
     # Analyze sentiment
-    is_indonesian = contains_indonesian_words(text)
-    analysis = analyze_sentiment(text, is_indonesian)
-    sentiment_score = analysis.sentiment.polarity
+    language, confidence = language_identifier.detect(text)
+    sentiment_score = analyze_sentiment(text, language)
     
-    sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-    if not is_indonesian:
-        sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
+    return api_response(
+        data=sentiment_result(text, language, confidence, sentiment_score),
+        message="Sentiment analysis completed"
+    )
+
+def sentiment_result(text, language, confidence, sentiment_score):
+    """Response fields for one scored text"""
+    from app import get_sentiment_color, get_sentiment_label
     
-    result = {
+    return {
         'text': text,
-        'language': 'id' if is_indonesian else 'en',
+        'language': language,
+        'language_confidence': confidence,
         'sentiment_score': round(sentiment_score, 2),
-        'sentiment_label': sentiment_label,
+        'sentiment_label': get_sentiment_label(sentiment_score, language),
         'sentiment_color': get_sentiment_color(sentiment_score)
     }
+
+def bulk_item(item, index, position='index'):
+    """
+    (id, text, extra fields) from a bulk item: a string or {"id": ..., "text": ...}
+    Plain strings are identified by their index. Objects without an id get a
+    null id plus their position, so they never collide with an explicit id.
+    """
+    if isinstance(item, dict):
+        if 'id' in item:
+            return item['id'], item.get('text'), {}
+        return None, item.get('text'), {position: index}
+    return index, item, {}
+
+def bulk_ndjson_items(stream):
+    """Yield (id, text, extra fields) from an NDJSON upload, one object per line"""
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None, None, {'line': index}
+            continue
+        yield bulk_item(item, index, 'line')
+
+def score_bulk(items):
+    """
+    Score (id, text, extra fields) items in batches of SENTIMENT_BULK_BATCH
+    Yields one NDJSON chunk per batch so the whole job never sits in memory.
+    """
+    from app import analyze_sentiment_batch
+    from language_id import language_identifier
+    
+    def score(batch):
+        texts = [text if isinstance(text, str) else '' for _, text, _ in batch]
+        detected = language_identifier.detect_batch(texts)
+        scores = analyze_sentiment_batch(texts, [language for language, _ in detected])
+        
+        lines = []
+        for (item_id, _, extra), text, (language, confidence), sentiment_score in zip(batch, texts, detected, scores):
+            if text:
+                result = dict(sentiment_result(text, language, confidence, sentiment_score), id=item_id, **extra)
+            else:
+                result = dict({'id': item_id, 'error': 'No text provided'}, **extra)
+            lines.append(json.dumps(result) + '\n')
+        return ''.join(lines)
+    
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= SENTIMENT_BULK_BATCH:
+            yield score(batch)
+            batch = []
+    if batch:
+        yield score(batch)
+
+@api.route('/sentiment/bulk', methods=['POST'])
+@cross_origin()
+@token_required
+def analyze_bulk_sentiment():
+    """
+    Analyze sentiment of many texts in one request
+    Accepts a JSON array (or {"texts": [...]}) of strings or {"id", "text"}
+    objects, or an application/x-ndjson upload of such objects, and streams
+    one NDJSON result line per text in input order. Strings are identified by
+    their index; objects without an id, and unparseable NDJSON lines, come
+    back with a null id and their zero-based "index" (array) or "line" (NDJSON).
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items = bulk_ndjson_items(request.stream)
+    else:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('texts')
+        if not isinstance(payload, list):
+            return api_response(
+                message="Expected a JSON array of texts or an NDJSON upload",
+                status="error",
+                code=400
+            )
+        items = (bulk_item(item, index) for index, item in enumerate(payload))
+    
+    return Response(stream_with_context(score_bulk(items)), mimetype='application/x-ndjson')
+
+@api.route('/sentiment/stats', methods=['GET'])
+@cross_origin()
+@token_required
+def sentiment_stats():
+    """Hit/miss counters of the memoized sentiment cache"""
+    from sentiment import sentiment_cache
     
     return api_response(
-        data=result,
-        message="Sentiment analysis completed"
+        data=sentiment_cache.stats(),
+        message="Sentiment cache statistics retrieved"
+    )
+
+@api.route('/store/stats', methods=['GET'])
+@cross_origin()
+@token_required
+def store_stats():
+    """Size, bounds and eviction counters of the article store"""
+    from article_store import articles
+    
+    return api_response(
+        data=articles.stats(),
+        message="Article store statistics retrieved"
+    )
+
+@api.route('/pipeline/stats', methods=['GET'])
+@cross_origin()
+@token_required
+def pipeline_stats():
+    """Per-stage counters and timings of the ingestion pipeline"""
+    from app import ingest_pipeline
+    
+    return api_response(
+        data=ingest_pipeline.stats_dict(),
+        message="Ingestion pipeline statistics retrieved"
+    )
+
+@api.route('/feeds/stats', methods=['GET'])
+@cross_origin()
+@token_required
+def feed_pool_stats():
+    """Requests, new connections and reused connections of the feed HTTP pool"""
+    from http_pool import pool_stats
+    
+    return api_response(
+        data=pool_stats(),
+        message="Feed connection pool statistics retrieved"
     )
@@ -2,7 +2,19 @@
 API Key and Rate Limit Management for MediaMon
 
 This module provides API key management and rate limiting for the MediaMon API.
+
+Rate limits use a sliding-window counter per key: the counts of the
+current and previous fixed windows, with the previous one weighted by how
+much of it the sliding window still covers. Every check is constant time
+and each key holds two counters, whatever its tier allows. Counters live in
+memory, or in Firestore as sharded documents updated with atomic
+increments; keys idle for a whole window are purged every
+RATE_LIMIT_PURGE_INTERVAL seconds.
 """
+import datetime
+import os
+import random
+import threading
 import time
 import uuid
 from flask import request, jsonify, g
@@ -69,11 +81,153 @@ class APIKeyManager:
             if key in self.keys:
                 del self.keys[key]
 
+# Seconds between sweeps that drop counters of keys idle for a whole window
+RATE_LIMIT_PURGE_INTERVAL = float(os.environ.get('RATE_LIMIT_PURGE_INTERVAL', 300))
+
+# Counter shards per key and window in Firestore; raise for keys that burst
+# above one request per second (Firestore sustains ~1 write/s per document)
+RATE_LIMIT_SHARDS = int(os.environ.get('RATE_LIMIT_SHARDS', 2))
+
+def window_estimate(previous, current, window, now):
+    """
+    Sliding-window request count from two fixed-window counters
+    The previous window's count is weighted by how much of it still
+    overlaps the sliding window ending now.
+    """
+    overlap = 1 - (now % window) / window
+    return previous * overlap + current
+
+class MemoryRateLimitBackend:
+    """Per-key sliding-window counters held in this process"""
+    def __init__(self, purge_interval=RATE_LIMIT_PURGE_INTERVAL):
+        self.counters = {}  # key -> [window index, current count, previous count, window]
+        self.lock = threading.Lock()
+        self.purge_interval = purge_interval
+        self.next_purge = time.time() + purge_interval
+
+    def hit(self, key, limit, window, now):
+        """Count a request if it is under the limit; True when allowed"""
+        index = int(now // window)
+        with self.lock:
+            if now >= self.next_purge:
+                self._purge(now)
+            counter = self.counters.get(key)
+            if counter is None or counter[3] != window:
+                counter = self.counters[key] = [index, 0, 0, window]
+            elif counter[0] != index:
+                # The old current window is the previous one only if adjacent
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+            if window_estimate(counter[2], counter[1], window, now) >= limit:
+                return False
+            counter[1] += 1
+            return True
+
+    def _purge(self, now):
+        """Drop keys with no requests in the current or previous window"""
+        self.next_purge = now + self.purge_interval
+        idle = [key for key, counter in self.counters.items() if counter[0] < int(now // counter[3]) - 1]
+        for key in idle:
+            del self.counters[key]
+
+    def reset(self, key=None):
+        with self.lock:
+            if key is None:
+                self.counters = {}
+            else:
+                self.counters.pop(key, None)
+
+class FirestoreRateLimitBackend:
+    """
+    Sliding-window counters in Firestore
+    Each (key, window) count is split over RATE_LIMIT_SHARDS documents in
+    the rate_limits collection, incremented with firestore.Increment so no
+    request reads or rewrites another's data. A check reads the shards of
+    the current window; the previous window's total is read once and kept,
+    since it no longer changes. Documents carry an `expires_at` two windows
+    out, for a Firestore TTL policy and for purge().
+    """
+    def __init__(self, db, shards=RATE_LIMIT_SHARDS, purge_interval=RATE_LIMIT_PURGE_INTERVAL):
+        self.db = db
+        self.collection = db.collection('rate_limits')
+        self.shards = max(1, shards)
+        self.closed = {}  # (key, window index) -> final count of a past window
+        self.lock = threading.Lock()
+        self.purge_interval = purge_interval
+        self.next_purge = time.time() + purge_interval
+
+    def _refs(self, key, index):
+        return [self.collection.document(f"{key}:{index}:{shard}") for shard in range(self.shards)]
+
+    def _count(self, key, index):
+        return sum((doc.to_dict() or {}).get('count', 0) for doc in self.db.get_all(self._refs(key, index)) if doc.exists)
+
+    def _previous(self, key, index):
+        with self.lock:
+            count = self.closed.get((key, index))
+        if count is None:
+            count = self._count(key, index)
+            with self.lock:
+                # Only the latest closed window of a key is needed
+                self.closed = {k: v for k, v in self.closed.items() if k[0] != key}
+                self.closed[(key, index)] = count
+        return count
+
+    def hit(self, key, limit, window, now):
+        index = int(now // window)
+        if now >= self.next_purge:
+            self.next_purge = now + self.purge_interval
+            self.purge(now)
+        estimate = window_estimate(self._previous(key, index - 1), self._count(key, index), window, now)
+        if estimate >= limit:
+            return False
+        shard = self._refs(key, index)[random.randrange(self.shards)]
+        shard.set({
+            'api_key': key,
+            'count': firestore.Increment(1),
+            'expires_at': datetime.datetime.fromtimestamp((index + 2) * window, datetime.timezone.utc)
+        }, merge=True)
+        return True
+
+    def purge(self, now):
+        """Delete counter documents whose windows have expired"""
+        expired = self.collection.where('expires_at', '<', datetime.datetime.fromtimestamp(now, datetime.timezone.utc))
+        try:
+            self._delete(expired.limit(500).stream())
+        except Exception as e:
+            print(f"Error purging rate limits: {e}")
+
+    def _delete(self, docs):
+        batch, pending = self.db.batch(), 0
+        for doc in docs:
+            batch.delete(doc.reference)
+            pending += 1
+            if pending == 500:  # Firestore batch limit
+                batch.commit()
+                batch, pending = self.db.batch(), 0
+        if pending:
+            batch.commit()
+
+    def reset(self, key=None):
+        if key is None:
+            self._delete(self.collection.stream())
+            with self.lock:
+                self.closed = {}
+        else:
+            self._delete(self.collection.where('api_key', '==', key).stream())
+            with self.lock:
+                self.closed = {k: v for k, v in self.closed.items() if k[0] != key}
+
 class RateLimiter:
-    """Handle API rate limiting"""
+    """
+    Handle API rate limiting
+    Each key gets a sliding-window counter: constant time and memory per
+    request whatever the tier's limit, in memory or in Firestore.
+    """
     def __init__(self, db=None):
         self.db = db
-        self.requests = {}  # In-memory request tracking
+        self.memory = MemoryRateLimitBackend()
+        self.firestore = FirestoreRateLimitBackend(db) if db else None
         self.limits = {
             'default': {
                 'requests': 100,  # Requests per window
@@ -96,90 +250,39 @@ class RateLimiter:
     def is_allowed(self, api_key, tier='default'):
         """Check if request is allowed based on rate limits"""
         now = time.time()
+        limit = self.limits.get(tier, self.limits['default'])
         
-        if self.db:
+        if self.firestore:
             # Use Firestore for tracking in production
             try:
-                # Get usage document
-                usage_ref = self.db.collection('rate_limits').document(api_key)
-                usage_doc = usage_ref.get()
-                
-                if usage_doc.exists:
-                    # Get existing usage data
-                    usage_data = usage_doc.to_dict()
-                    requests_timestamps = usage_data.get('requests', [])
-                    
-                    # Clean up old requests outside the window
-                    limit = self.limits.get(tier, self.limits['default'])
-                    window = limit['window']
-                    requests_timestamps = [t for t in requests_timestamps if t > now - window]
-                    
-                    # Check if under limit
-                    if len(requests_timestamps) >= limit['requests']:
-                        return False
-                    
-                    # Record this request
-                    requests_timestamps.append(now)
-                    usage_ref.set({'requests': requests_timestamps, 'last_updated': now})
-                else:
-                    # First request for this key, create new document
-                    usage_ref.set({'requests': [now], 'last_updated': now})
-                
-                return True
+                return self.firestore.hit(api_key, limit['requests'], limit['window'], now)
             except Exception as e:
                 print(f"Error checking rate limit: {e}")
                 # Fallback to in-memory tracking if DB fails
-                return self._check_in_memory(api_key, tier, now)
-        else:
-            # Use in-memory tracking for development
-            return self._check_in_memory(api_key, tier, now)
-    
-    def _check_in_memory(self, api_key, tier, now):
-        """Check rate limit using in-memory tracking"""
-        # Initialize tracking for new keys
-        if api_key not in self.requests:
-            self.requests[api_key] = []
         
-        # Clear old requests outside the window
-        limit = self.limits.get(tier, self.limits['default'])
-        window = limit['window']
-        self.requests[api_key] = [t for t in self.requests[api_key] if t > now - window]
-        
-        # Check if under limit
-        if len(self.requests[api_key]) >= limit['requests']:
-            return False
-        
-        # Record this request
-        self.requests[api_key].append(now)
-        return True
+        return self.memory.hit(api_key, limit['requests'], limit['window'], now)
     
     def reset_for_key(self, api_key):
         """Reset rate limiting for a specific key"""
-        if self.db:
+        if self.firestore:
             try:
-                self.db.collection('rate_limits').document(api_key).delete()
+                self.firestore.reset(api_key)
             except Exception as e:
                 print(f"Error resetting rate limit: {e}")
         
         # Also reset in-memory tracking
-        if api_key in self.requests:
-            self.requests[api_key] = []
+        self.memory.reset(api_key)
     
     def reset_all(self):
         """Reset all rate limiting data"""
-        if self.db:
+        if self.firestore:
             try:
-                # Delete all rate limit documents
-                batch = self.db.batch()
-                docs = self.db.collection('rate_limits').stream()
-                for doc in docs:
-                    batch.delete(doc.reference)
-                batch.commit()
+                self.firestore.reset()
             except Exception as e:
                 print(f"Error resetting all rate limits: {e}")
         
         # Reset in-memory tracking
-        self.requests = {}
+        self.memory.reset()
 
 # Create API management utilities for Flask with database
 def create_api_manager(db=None):
@@ -1,7 +1,4 @@
 from flask import Flask, render_template, request
-import feedparser
-from textblob import TextBlob
-import uuid
 import datetime
 from urllib.parse import urlparse, quote
 import requests
@@ -12,13 +9,20 @@ import tweepy
 from facebook_scraper import get_posts
 import instaloader
 from flask_cors import CORS
+from feed_fetcher import fetch_feeds, FEED_ENTRY_LIMIT
+from sentiment import score_batch, sentiment_cache
+from article_store import articles
+from article import Article
+from ingestion import read_articles, start_worker
+from dedupe import dedupe_index, dedupe_keys, article_id_for, published_close
+from language_id import language_identifier
+from pipeline import Pipeline, PipelineItem, Stage, PIPELINE_BATCH_SIZE
+from fetch_planner import Connector, FetchQuery, plan
+from social_clients import social_clients, INSTAGRAM_SESSION_PATH
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# In-memory storage for articles (in a real app, you'd use a database)
-articles = {}
-
 # Social media API configuration
 class SocialMediaConfig:
     # Twitter API credentials
@@ -40,573 +44,635 @@ class SocialMediaConfig:
     FACEBOOK_ENABLED = bool(FACEBOOK_EMAIL and FACEBOOK_PASSWORD)
     INSTAGRAM_ENABLED = bool(INSTAGRAM_USERNAME and INSTAGRAM_PASSWORD)
 
-def fetch_twitter_posts(search_query=None, count=10):
-    """Fetch tweets related to a search query"""
+def create_twitter_client(refresh=False):
+    """Authenticated Twitter API client"""
+    auth = tweepy.OAuthHandler(
+        SocialMediaConfig.TWITTER_API_KEY, 
+        SocialMediaConfig.TWITTER_API_SECRET
+    )
+    auth.set_access_token(
+        SocialMediaConfig.TWITTER_ACCESS_TOKEN, 
+        SocialMediaConfig.TWITTER_ACCESS_SECRET
+    )
+    return tweepy.API(auth)
+
+def create_instagram_client(refresh=False):
+    """
+    Instagram loader, logged in
+    Restores the saved session unless Instagram just rejected it; a new
+    login is saved for the next restart.
+    """
+    loader = instaloader.Instaloader()
+    username = SocialMediaConfig.INSTAGRAM_USERNAME
+    
+    if not refresh:
+        try:
+            loader.load_session_from_file(username, INSTAGRAM_SESSION_PATH)
+            return loader
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading Instagram session: {e}")
+    
+    try:
+        loader.login(username, SocialMediaConfig.INSTAGRAM_PASSWORD)
+        loader.save_session_to_file(INSTAGRAM_SESSION_PATH)
+    except Exception as e:
+        print(f"Instagram login failed: {e}")
+    return loader
+
+# Each client is built once per process and rebuilt only on these auth errors
+social_clients.register('twitter', create_twitter_client, auth_errors=(tweepy.errors.Unauthorized,))
+social_clients.register(
+    'instagram', create_instagram_client, auth_errors=(instaloader.exceptions.LoginRequiredException,)
+)
+
+def twitter_records(search_query=None, count=10):
+    """Yield tweets related to a search query"""
     if not SocialMediaConfig.TWITTER_ENABLED:
         print("Twitter API credentials not configured")
-        return []
+        return
     
     try:
-        # Set up Twitter API client
-        auth = tweepy.OAuthHandler(
-            SocialMediaConfig.TWITTER_API_KEY, 
-            SocialMediaConfig.TWITTER_API_SECRET
-        )
-        auth.set_access_token(
-            SocialMediaConfig.TWITTER_ACCESS_TOKEN, 
-            SocialMediaConfig.TWITTER_ACCESS_SECRET
-        )
-        api = tweepy.API(auth)
-        
-        # Search for tweets
-        tweets = []
+        # Search for tweets with the shared client
         if search_query:
             # Search tweets with query
-            search_results = api.search_tweets(q=search_query, count=count, tweet_mode='extended')
-            tweets.extend(search_results)
+            tweets = social_clients.call(
+                'twitter', lambda api: api.search_tweets(q=search_query, count=count, tweet_mode='extended')
+            )
         else:
             # Get home timeline tweets if no query
-            home_tweets = api.home_timeline(count=count, tweet_mode='extended')
-            tweets.extend(home_tweets)
-        
-        # Process tweets into our article format
-        twitter_articles = []
-        for tweet in tweets:
-            # Extract text (handling both normal and extended tweets)
-            if hasattr(tweet, 'full_text'):
-                text = tweet.full_text
-            else:
-                text = tweet.text
-            
-            # Skip retweets to avoid duplication
-            if hasattr(tweet, 'retweeted_status'):
-                continue
-                
-            # Perform sentiment analysis
-            is_indonesian = contains_indonesian_words(text)
-            analysis = analyze_sentiment(text, is_indonesian)
-            sentiment_score = analysis.sentiment.polarity
-            
-            sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-            if not is_indonesian:
-                sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-            
-            article_id = f"twitter_{tweet.id}"
-            
-            # Create article object
-            article = {
-                'id': article_id,
-                'title': f"@{tweet.user.screen_name}: {text[:50]}...",
-                'summary': text,
-                'link': f"https://twitter.com/{tweet.user.screen_name}/status/{tweet.id}",
-                'published': tweet.created_at,
-                'source': 'Twitter',
-                'sentiment_score': round(sentiment_score, 2),
-                'sentiment_label': sentiment_label,
-                'sentiment_color': get_sentiment_color(sentiment_score),
-                'language': 'id' if is_indonesian else 'en',
-                'user': tweet.user.screen_name,
-                'profile_image': tweet.user.profile_image_url_https,
-                'type': 'twitter'
-            }
-            
-            # Store in our articles dict and return list
-            articles[article_id] = article
-            twitter_articles.append(article)
-            
-        return twitter_articles
-        
+            tweets = social_clients.call(
+                'twitter', lambda api: api.home_timeline(count=count, tweet_mode='extended')
+            )
     except Exception as e:
         print(f"Error fetching Twitter data: {e}")
-        return []
+        return
+    
+    for tweet in tweets:
+        # Skip retweets to avoid duplication
+        if hasattr(tweet, 'retweeted_status'):
+            continue
+        yield PipelineItem('twitter', tweet)
 
-def fetch_facebook_posts(search_query=None, pages=None, count=5):
-    """Fetch Facebook posts from specific pages or search"""
+def facebook_records(search_query=None, pages=None, count=5):
+    """Yield Facebook posts from specific pages or search"""
     if not SocialMediaConfig.FACEBOOK_ENABLED:
         print("Facebook credentials not configured")
-        return []
+        return
     
     if pages is None:
         # Default Indonesian news pages to monitor
         pages = ['detikcom', 'kompascom', 'tribunnews']
     
-    facebook_articles = []
-    
-    try:
-        # For each page, get recent posts
-        for page in pages:
-            try:
-                # Get posts from the page
-                posts = list(get_posts(
-                    page, 
-                    pages=1,
-                    credentials=(SocialMediaConfig.FACEBOOK_EMAIL, SocialMediaConfig.FACEBOOK_PASSWORD),
-                    options={"posts_per_page": count}
-                ))
-                
-                # Process posts
-                for post in posts:
-                    # Skip posts without text
-                    if not post.get('text'):
-                        continue
-                    
-                    text = post.get('text')
-                    
-                    # If search query provided, skip non-matching posts
-                    if search_query and search_query.lower() not in text.lower():
-                        continue
-                    
-                    # Perform sentiment analysis
-                    is_indonesian = contains_indonesian_words(text)
-                    analysis = analyze_sentiment(text, is_indonesian)
-                    sentiment_score = analysis.sentiment.polarity
-                    
-                    sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-                    if not is_indonesian:
-                        sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-                    
-                    article_id = f"facebook_{post.get('post_id')}"
-                    
-                    # Get publication date
-                    pub_date = post.get('time')
-                    if not pub_date:
-                        pub_date = datetime.datetime.now()
-                    
-                    # Create article object
-                    article = {
-                        'id': article_id,
-                        'title': f"Facebook: {text[:50]}...",
-                        'summary': text,
-                        'link': post.get('post_url'),
-                        'published': pub_date,
-                        'source': f"Facebook/{page}",
-                        'sentiment_score': round(sentiment_score, 2),
-                        'sentiment_label': sentiment_label,
-                        'sentiment_color': get_sentiment_color(sentiment_score),
-                        'language': 'id' if is_indonesian else 'en',
-                        'user': page,
-                        'type': 'facebook'
-                    }
-                    
-                    # Store and append
-                    articles[article_id] = article
-                    facebook_articles.append(article)
-                    
-            except Exception as e:
-                print(f"Error fetching posts from Facebook page {page}: {e}")
-                continue
-                
-        return facebook_articles
+    # For each page, get recent posts
+    for page in pages:
+        try:
+            # Get posts from the page
+            posts = list(get_posts(
+                page, 
+                pages=1,
+                credentials=(SocialMediaConfig.FACEBOOK_EMAIL, SocialMediaConfig.FACEBOOK_PASSWORD),
+                options={"posts_per_page": count}
+            ))
+        except Exception as e:
+            print(f"Error fetching posts from Facebook page {page}: {e}")
+            continue
         
-    except Exception as e:
-        print(f"Error with Facebook scraper: {e}")
-        return []
+        for post in posts:
+            # Skip posts without text
+            text = post.get('text')
+            if not text:
+                continue
+            
+            # If search query provided, skip non-matching posts
+            if search_query and search_query.lower() not in text.lower():
+                continue
+            
+            yield PipelineItem('facebook', (page, post))
 
-def fetch_instagram_posts(search_query=None, accounts=None, count=5):
-    """Fetch Instagram posts from specific accounts or hashtag search"""
+def instagram_records(search_query=None, accounts=None, count=5):
+    """Yield Instagram posts from specific accounts or hashtag search"""
     if not SocialMediaConfig.INSTAGRAM_ENABLED:
         print("Instagram credentials not configured")
-        return []
+        return
     
     if accounts is None:
         # Default Indonesian news accounts
         accounts = ['detikcom', 'kompascom', 'tribunnews']
     
-    instagram_articles = []
+    if search_query and search_query.startswith('#'):
+        # Search by hashtag, limiting the number of posts
+        hashtag = search_query.replace('#', '')
+        targets = [(None, lambda loader: loader.get_hashtag_posts(hashtag))]
+    else:
+        # Get posts from specified accounts
+        targets = [
+            (username, lambda loader, username=username:
+                instaloader.Profile.from_username(loader.context, username).get_posts())
+            for username in accounts
+        ]
     
-    try:
-        # Set up Instagram loader
-        loader = instaloader.Instaloader()
+    for username, posts_for in targets:
+        try:
+            loader = social_clients.get('instagram')
+        except Exception as e:
+            print(f"Error with Instagram loader: {e}")
+            return
         
-        # Login if credentials provided
-        if SocialMediaConfig.INSTAGRAM_USERNAME and SocialMediaConfig.INSTAGRAM_PASSWORD:
+        # One retry with a fresh login if the saved session was rejected
+        for attempt in range(2):
             try:
-                loader.login(SocialMediaConfig.INSTAGRAM_USERNAME, SocialMediaConfig.INSTAGRAM_PASSWORD)
-            except Exception as e:
-                print(f"Instagram login failed: {e}")
-        
-        # Process based on search type
-        if search_query and search_query.startswith('#'):
-            # Search by hashtag
-            hashtag = search_query.replace('#', '')
-            posts = loader.get_hashtag_posts(hashtag)
-            
-            # Limit number of posts
-            post_count = 0
-            for post in posts:
-                if post_count >= count:
-                    break
-                
-                try:
-                    # Get post text
-                    text = post.caption if post.caption else "No caption"
-                    
-                    # Perform sentiment analysis
-                    is_indonesian = contains_indonesian_words(text)
-                    analysis = analyze_sentiment(text, is_indonesian)
-                    sentiment_score = analysis.sentiment.polarity
-                    
-                    sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-                    if not is_indonesian:
-                        sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-                    
-                    article_id = f"instagram_{post.shortcode}"
+                post_count = 0
+                for post in posts_for(loader):
+                    if post_count >= count:
+                        break
                     
-                    # Create article object
-                    article = {
-                        'id': article_id,
-                        'title': f"Instagram: {text[:50]}...",
-                        'summary': text,
-                        'link': f"https://www.instagram.com/p/{post.shortcode}/",
-                        'published': post.date_local,
-                        'source': f"Instagram/{post.owner_username}",
-                        'sentiment_score': round(sentiment_score, 2),
-                        'sentiment_label': sentiment_label,
-                        'sentiment_color': get_sentiment_color(sentiment_score),
-                        'language': 'id' if is_indonesian else 'en',
-                        'user': post.owner_username,
-                        'type': 'instagram'
-                    }
+                    # If search query provided, skip non-matching account posts
+                    text = post.caption if post.caption else "No caption"
+                    if username and search_query and search_query.lower() not in text.lower():
+                        continue
                     
-                    # Store and append
-                    articles[article_id] = article
-                    instagram_articles.append(article)
+                    yield PipelineItem('instagram', (username or post.owner_username, post))
                     post_count += 1
-                    
-                except Exception as e:
-                    print(f"Error processing Instagram post: {e}")
-                    continue
-                    
-        else:
-            # Get posts from specified accounts
-            for username in accounts:
-                try:
-                    profile = instaloader.Profile.from_username(loader.context, username)
-                    posts = profile.get_posts()
-                    
-                    post_count = 0
-                    for post in posts:
-                        if post_count >= count:
-                            break
-                            
-                        text = post.caption if post.caption else "No caption"
-                        
-                        # If search query provided, skip non-matching posts
-                        if search_query and search_query.lower() not in text.lower():
-                            continue
-                        
-                        # Perform sentiment analysis
-                        is_indonesian = contains_indonesian_words(text)
-                        analysis = analyze_sentiment(text, is_indonesian)
-                        sentiment_score = analysis.sentiment.polarity
-                        
-                        sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-                        if not is_indonesian:
-                            sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-                        
-                        article_id = f"instagram_{post.shortcode}"
-                        
-                        # Create article object
-                        article = {
-                            'id': article_id,
-                            'title': f"Instagram: {text[:50]}...",
-                            'summary': text,
-                            'link': f"https://www.instagram.com/p/{post.shortcode}/",
-                            'published': post.date_local,
-                            'source': f"Instagram/{username}",
-                            'sentiment_score': round(sentiment_score, 2),
-                            'sentiment_label': sentiment_label,
-                            'sentiment_color': get_sentiment_color(sentiment_score),
-                            'language': 'id' if is_indonesian else 'en',
-                            'user': username,
-                            'type': 'instagram'
-                        }
-                        
-                        # Store and append
-                        articles[article_id] = article
-                        instagram_articles.append(article)
-                        post_count += 1
-                        
-                except Exception as e:
-                    print(f"Error fetching Instagram posts from {username}: {e}")
-                    continue
-                    
-        return instagram_articles
+                break
+            except social_clients.auth_errors('instagram') as e:
+                if attempt:
+                    print(f"Instagram login required for {username or search_query}: {e}")
+                    break
+                print(f"Instagram session rejected ({e}), logging in again")
+                loader = social_clients.refresh('instagram', stale=loader)
+            except Exception as e:
+                print(f"Error fetching Instagram posts from {username or search_query}: {e}")
+                break
+
+def rss_records(feeds):
+    """Yield feed entries, downloading and parsing all feeds concurrently"""
+    for feed_result in fetch_feeds(feeds):
+        if not feed_result.ok:
+            print(f"Error fetching from {feed_result.url}: {feed_result.status} ({feed_result.error})")
+            continue
         
-    except Exception as e:
-        print(f"Error with Instagram loader: {e}")
-        return []
+        for entry in feed_result.entries[:FEED_ENTRY_LIMIT]:
+            yield PipelineItem('news', (feed_result.url, entry))
+
+def normalize_tweet(item):
+    tweet = item.raw
+    
+    # Extract text (handling both normal and extended tweets)
+    if hasattr(tweet, 'full_text'):
+        text = tweet.full_text
+    else:
+        text = tweet.text
+    
+    item.text = text
+    item.article = Article(
+        id=f"twitter_{tweet.id}",
+        title=f"@{tweet.user.screen_name}: {text[:50]}...",
+        summary=text,
+        link=f"https://twitter.com/{tweet.user.screen_name}/status/{tweet.id}",
+        published=tweet.created_at,
+        source='Twitter',
+        user=tweet.user.screen_name,
+        profile_image=tweet.user.profile_image_url_https,
+        type='twitter'
+    )
+    return item
+
+def normalize_facebook_post(item):
+    page, post = item.raw
+    text = post.get('text')
+    
+    # Get publication date
+    pub_date = post.get('time')
+    if not pub_date:
+        pub_date = datetime.datetime.now()
+    
+    item.text = text
+    item.article = Article(
+        id=f"facebook_{post.get('post_id')}",
+        title=f"Facebook: {text[:50]}...",
+        summary=text,
+        link=post.get('post_url'),
+        published=pub_date,
+        source=f"Facebook/{page}",
+        user=page,
+        type='facebook'
+    )
+    return item
+
+def normalize_instagram_post(item):
+    username, post = item.raw
+    text = post.caption if post.caption else "No caption"
+    
+    item.text = text
+    item.article = Article(
+        id=f"instagram_{post.shortcode}",
+        title=f"Instagram: {text[:50]}...",
+        summary=text,
+        link=f"https://www.instagram.com/p/{post.shortcode}/",
+        published=post.date_local,
+        source=f"Instagram/{username}",
+        user=username,
+        type='instagram'
+    )
+    return item
 
-def fetch_articles(search_query=None):
+def normalize_rss_entry(item):
+    feed_url, entry = item.raw
+    
+    # Make sure we have a title
+    if not hasattr(entry, 'title'):
+        return None
+    
+    # Ensure title is a string
+    title = entry.title
+    if not isinstance(title, str):
+        title = str(title)
+    
+    link = getattr(entry, 'link', feed_url)
+    if not isinstance(link, str):
+        link = str(link)
+    
+    # Get publication date or use current time if not available
+    pub_date = entry.get('published_parsed', None)
+    if pub_date:
+        try:
+            pub_date = datetime.datetime(*pub_date[:6])
+        except Exception:
+            pub_date = datetime.datetime.now()
+    else:
+        pub_date = datetime.datetime.now()
+    
+    # Extract source name from feed URL or entry
+    source_url = link
+    source = urlparse(source_url).netloc.replace('www.', '').split('.')[0].capitalize()
+    
+    # Better source detection, with special handling for Indonesian sources
+    if source == 'News' or source == 'Google':
+        # Try to extract real source from entry source or title
+        if hasattr(entry, 'source'):
+            entry_source = getattr(entry, 'source')
+            if isinstance(entry_source, str):
+                source = entry_source
+        elif isinstance(title, str) and ' - ' in title:
+            # Many titles end with " - Source Name"
+            source = title.split(' - ')[-1]
+    
+    # Check for common Indonesian sources and clean up names
+    indonesian_sources = {
+        'kompas': 'Kompas', 
+        'detik': 'Detik', 
+        'tempo': 'Tempo',
+        'republika': 'Republika', 
+        'liputan6': 'Liputan 6',
+        'tribunnews': 'Tribun News',
+        'cnbcindonesia': 'CNBC Indonesia',
+        'klikdokter': 'Klik Dokter'
+    }
+    
+    for key, value in indonesian_sources.items():
+        if key in source.lower():
+            source = value
+            break
+    
+    # Get summary, with a fallback
+    summary = getattr(entry, 'summary', 'No summary available')
+    if not isinstance(summary, str):
+        summary = str(summary)
+    
+    item.text = title
+    item.article = Article(
+        # Stable ID derived from the canonical link
+        id=article_id_for(link),
+        title=title,
+        summary=summary,
+        link=link,
+        published=pub_date,
+        source=source,
+        type='news' # Mark as news article type
+    )
+    return item
+
+# Normalizer for each connector's raw records
+NORMALIZERS = {
+    'news': normalize_rss_entry,
+    'twitter': normalize_tweet,
+    'facebook': normalize_facebook_post,
+    'instagram': normalize_instagram_post
+}
+
+def normalize_item(item):
+    """Normalize stage: turn a raw record into an article without analysis"""
+    return NORMALIZERS[item.kind](item)
+
+def dedupe_item(item, seen_ids):
     """
-    Fetch articles from RSS feeds and social media, then analyze sentiment
-    If search_query is provided, search for that topic
+    Dedupe stage: drop repeats within this run and reuse stored articles
+    News is matched by normalized title and canonical URL, so duplicates are
+    skipped before any language detection or sentiment work; social posts
+    keep their stored analysis while their text is unchanged. Across runs a
+    headline alone only matches a story published close to this one.
     """
-    all_articles = []
+    article = item.article
+    article_id = article.id
+    
+    if item.kind == 'news':
+        item.keys = dedupe_keys(article.title, article.link)
+        if not seen_ids.isdisjoint(item.keys):
+            return None  # Same headline or link already collected from another feed
+        seen_ids.update(item.keys)
+    
+    if article_id in seen_ids:
+        return None  # Already collected from another feed
     
+    existing_id = article_id
+    existing = articles.get(article_id)
+    if existing is None and item.kind == 'news':
+        # Stored under another link with the same headline
+        existing_id = dedupe_index.lookup(item.keys) or article_id
+        if existing_id != article_id and existing_id not in seen_ids:
+            existing = articles.get(existing_id)
+    
+    if existing is not None:
+        if item.kind != 'news':
+            unchanged = existing.summary == item.text
+        elif existing_id == article_id:
+            # Same link seen in an earlier run: reuse unless its headline changed
+            unchanged = existing.title == article.title
+        else:
+            # A recurring headline ("Harga Emas Hari Ini") is a new story unless published close by
+            unchanged = published_close(existing.published, article.published)
+        if unchanged:
+            seen_ids.add(existing_id)
+            item.article = existing
+            item.reused = True
+            return item
+    
+    seen_ids.add(article_id)
+    return item
+
+def detect_item_languages(batch):
+    """Language stage: identify the language of every new item in one batch"""
+    fresh = [item for item in batch if not item.reused]
+    detected = language_identifier.detect_batch([item.text for item in fresh])
+    for item, (language, _) in zip(fresh, detected):
+        item.article.language = language
+    return batch
+
+def score_item_sentiment(batch):
+    """Sentiment stage: score and label every new item in one batch"""
+    fresh = [item for item in batch if not item.reused]
+    scores = analyze_sentiment_batch(
+        [item.text for item in fresh],
+        [item.article.language for item in fresh]
+    )
+    for item, sentiment_score in zip(fresh, scores):
+        article = item.article
+        article.sentiment_score = round(sentiment_score, 2)
+        article.sentiment_label = get_sentiment_label(sentiment_score, article.language)
+        article.sentiment_color = get_sentiment_color(sentiment_score)
+    return batch
+
+def store_item(item):
+    """Store stage: register new news articles with the dedupe index"""
+    if item.keys and not item.reused:
+        dedupe_index.add(item.keys, item.article.id)
+    return item
+
+def ingestion_stages(fetch_query=None, limit=None, seen_ids=None):
+    """
+    Fresh stages for one ingestion run
+    A filtered query drops non-matching articles once their language is
+    known, before they are scored. Runs sharing `seen_ids` drop each
+    other's repeats.
+    """
+    if seen_ids is None:
+        seen_ids = set()
+    if limit is None and fetch_query:
+        limit = fetch_query.limit
+    batch_size = PIPELINE_BATCH_SIZE
+    if limit:
+        # Small batches, so a limited run can stop soon after its limit
+        batch_size = min(batch_size, limit)
+    
+    stages = [
+        Stage('normalize', normalize_item),
+        Stage('dedupe', lambda item: dedupe_item(item, seen_ids)),
+        Stage('language', detect_item_languages, batch_size=batch_size)
+    ]
+    if fetch_query and (fetch_query.sources or fetch_query.languages):
+        stages.append(Stage('filter', lambda item: item if fetch_query.accepts(item.article) else None))
+    stages.append(Stage('sentiment', score_item_sentiment, batch_size=batch_size))
+    stages.append(Stage('store', store_item))
+    return stages
+
+# Ingestion pipeline shared by every connector, with per-stage counters
+ingest_pipeline = Pipeline()
+
+def run_ingestion(source, fetch_query=None, limit=None, stages=None):
+    """
+    Run connector records through the pipeline and return the articles
+    Stops pulling records once `limit` (by default the query's) is reached;
+    the fetch thread reads no more than that many records ahead.
+    """
+    if limit is None and fetch_query:
+        limit = fetch_query.limit
+    stream = ingest_pipeline.run(source, stages or ingestion_stages(fetch_query, limit), queue_size=limit)
+    results = []
+    try:
+        for item in stream:
+            results.append(item.article)
+            if limit and len(results) >= limit:
+                break
+    finally:
+        # Closing the stream stops the fetch thread and any connector still running
+        stream.close()
+    return results
+
+def fetch_twitter_posts(search_query=None, count=10):
+    """Fetch tweets related to a search query"""
+    return run_ingestion(twitter_records(search_query, count))
+
+def fetch_facebook_posts(search_query=None, pages=None, count=5):
+    """Fetch Facebook posts from specific pages or search"""
+    return run_ingestion(facebook_records(search_query, pages, count))
+
+def fetch_instagram_posts(search_query=None, accounts=None, count=5):
+    """Fetch Instagram posts from specific accounts or hashtag search"""
+    return run_ingestion(instagram_records(search_query, accounts, count))
+
+def feeds_for(search_query=None):
+    """(feed URL, language) of the RSS feeds to poll for a search, or the home page"""
     # Default feeds with Indonesian sources
     default_feeds = [
         # Indonesian news sources
-        "https://www.kompas.com/rss/",
-        "https://rss.tempo.co/",
-        "https://www.republika.co.id/rss/",
-        "https://www.detik.com/rss",
+        ("https://www.kompas.com/rss/", 'id'),
+        ("https://rss.tempo.co/", 'id'),
+        ("https://www.republika.co.id/rss/", 'id'),
+        ("https://www.detik.com/rss", 'id'),
         # International sources
-        "https://www.theguardian.com/world/rss",
-        "https://rss.nytimes.com/services/xml/rss/nyt/World.xml"
+        ("https://www.theguardian.com/world/rss", 'en'),
+        ("https://rss.nytimes.com/services/xml/rss/nyt/World.xml", 'en')
     ]
     
+    if not search_query:
+        return default_feeds
+    
     # If we have a search query, build a list of targeted feeds
     feeds = []
-    if search_query:
-        # Clear existing articles when performing a new search
-        articles.clear()
-        
-        # Detect if the search query might be in Indonesian
-        is_indonesian_query = contains_indonesian_words(search_query)
-        
-        # Google News RSS search (Indonesian version if detected)
-        if is_indonesian_query:
-            google_news = f"https://news.google.com/rss/search?q={quote(search_query)}&hl=id-ID&gl=ID&ceid=ID:id"
-        else:
-            google_news = f"https://news.google.com/rss/search?q={quote(search_query)}&hl=en-US&gl=US&ceid=US:en"
-        feeds.append(google_news)
-        
-        # Indonesian specific search
-        indonesian_search = f"https://news.google.com/rss/search?q={quote(search_query)}+Indonesia&hl=id-ID&gl=ID&ceid=ID:id"
-        feeds.append(indonesian_search)
-        
-        # Add topic-specific feeds from major news sources
-        topic_feeds = {
-            "technology": [
-                "https://www.theverge.com/rss/index.xml",
-                "https://feeds.wired.com/wired/index",
-                # Indonesian tech sources
-                "https://www.techno.id/rss",
-                "https://tekno.kompas.com/rss/"
-            ],
-            "politics": [
-                "https://rss.nytimes.com/services/xml/rss/nyt/Politics.xml",
-                # Indonesian politics sources
-                "https://nasional.kompas.com/rss/",
-                "https://rss.tempo.co/nasional"
-            ],
-            "business": [
-                "https://rss.nytimes.com/services/xml/rss/nyt/Business.xml",
-                # Indonesian business sources
-                "https://ekonomi.kompas.com/rss/",
-                "https://www.cnbcindonesia.com/rss"
-            ],
-            "health": [
-                "https://rss.nytimes.com/services/xml/rss/nyt/Health.xml",
-                # Indonesian health sources
-                "https://health.kompas.com/rss/",
-                "https://www.klikdokter.com/rss"
-            ],
-            "teknologi": [  # Indonesian word for technology
-                "https://tekno.kompas.com/rss/",
-                "https://www.techno.id/rss"
-            ],
-            "politik": [  # Indonesian word for politics
-                "https://nasional.kompas.com/rss/",
-                "https://rss.tempo.co/nasional"
-            ],
-            "bisnis": [  # Indonesian word for business
-                "https://ekonomi.kompas.com/rss/",
-                "https://www.cnbcindonesia.com/rss"
-            ],
-            "kesehatan": [  # Indonesian word for health
-                "https://health.kompas.com/rss/",
-                "https://www.klikdokter.com/rss"
-            ]
-        }
-        
-        # Check if search query matches any of our predefined topics (in English or Indonesian)
-        for topic, topic_feed_list in topic_feeds.items():
-            if re.search(r'\b' + re.escape(topic) + r'\b', search_query.lower()):
-                feeds.extend(topic_feed_list)
+    
+    # Detect if the search query might be in Indonesian
+    is_indonesian_query = detect_language(search_query) == 'id'
+    
+    # Google News RSS search (Indonesian version if detected)
+    if is_indonesian_query:
+        google_news = (f"https://news.google.com/rss/search?q={quote(search_query)}&hl=id-ID&gl=ID&ceid=ID:id", 'id')
     else:
-        feeds = default_feeds
+        google_news = (f"https://news.google.com/rss/search?q={quote(search_query)}&hl=en-US&gl=US&ceid=US:en", 'en')
+    feeds.append(google_news)
     
-    # Process each feed
-    for feed_url in feeds:
-        try:
-            feed = feedparser.parse(feed_url)
-            
-            for entry in feed.entries[:10]:  # Limit to 10 articles per feed
-                try:
-                    # Skip if article with the same title exists
-                    # Make sure we have a title
-                    if not hasattr(entry, 'title'):
-                        continue
-                    
-                    # Ensure title is a string
-                    title = entry.title
-                    if not isinstance(title, str):
-                        title = str(title)
-                    
-                    if any(a['title'] == title for a in all_articles):
-                        continue
-                        
-                    # Generate a unique ID for each article
-                    article_id = str(uuid.uuid4())
-                    
-                    # Get publication date or use current time if not available
-                    pub_date = entry.get('published_parsed', None)
-                    if pub_date:
-                        try:
-                            pub_date = datetime.datetime(*pub_date[:6])
-                        except Exception:
-                            pub_date = datetime.datetime.now()
-                    else:
-                        pub_date = datetime.datetime.now()
-                        
-                    # Perform sentiment analysis
-                    # TextBlob doesn't work well for Indonesian, but we'll use it as a fallback
-                    is_indonesian = contains_indonesian_words(title)
-                    analysis = analyze_sentiment(title, is_indonesian)
-                    sentiment_score = analysis.sentiment.polarity
-                    sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
-                    
-                    if not is_indonesian:  # Use English labels for non-Indonesian content
-                        sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
-                    
-                    # Extract source name from feed URL or entry
-                    link = getattr(entry, 'link', feed_url)
-                    if not isinstance(link, str):
-                        link = str(link)
-                        
-                    source_url = link
-                    source = urlparse(source_url).netloc.replace('www.', '').split('.')[0].capitalize()
-                    
-                    # Better source detection, with special handling for Indonesian sources
-                    if source == 'News' or source == 'Google':
-                        # Try to extract real source from entry source or title
-                        if hasattr(entry, 'source'):
-                            entry_source = getattr(entry, 'source')
-                            if isinstance(entry_source, str):
-                                source = entry_source
-                        elif isinstance(title, str) and ' - ' in title:
-                            # Many titles end with " - Source Name"
-                            source = title.split(' - ')[-1]
-                    
-                    # Check for common Indonesian sources and clean up names
-                    indonesian_sources = {
-                        'kompas': 'Kompas', 
-                        'detik': 'Detik', 
-                        'tempo': 'Tempo',
-                        'republika': 'Republika', 
-                        'liputan6': 'Liputan 6',
-                        'tribunnews': 'Tribun News',
-                        'cnbcindonesia': 'CNBC Indonesia',
-                        'klikdokter': 'Klik Dokter'
-                    }
-                    
-                    for key, value in indonesian_sources.items():
-                        if key in source.lower():
-                            source = value
-                            break
-                    
-                    # Determine language of article
-                    language = 'id' if is_indonesian else 'en'
-                    
-                    # Get summary, with a fallback
-                    summary = getattr(entry, 'summary', 'No summary available')
-                    if not isinstance(summary, str):
-                        summary = str(summary)
-                    
-                    article = {
-                        'id': article_id,
-                        'title': title,
-                        'summary': summary,
-                        'link': link,
-                        'published': pub_date,
-                        'source': source,
-                        'sentiment_score': round(sentiment_score, 2),
-                        'sentiment_label': sentiment_label,
-                        'sentiment_color': get_sentiment_color(sentiment_score),
-                        'language': language,
-                        'type': 'news' # Mark as news article type
-                    }
-                    
-                    articles[article_id] = article
-                    all_articles.append(article)
-                except Exception as e:
-                    print(f"Error processing entry: {e}")
-                    continue  # Skip this problematic entry
-        except Exception as e:
-            print(f"Error fetching from {feed_url}: {e}")
+    # Indonesian specific search
+    indonesian_search = (f"https://news.google.com/rss/search?q={quote(search_query)}+Indonesia&hl=id-ID&gl=ID&ceid=ID:id", 'id')
+    feeds.append(indonesian_search)
     
-    # Add social media content
-    try:
-        # Fetch from Twitter if enabled
-        twitter_articles = fetch_twitter_posts(search_query)
-        all_articles.extend(twitter_articles)
-        
-        # Fetch from Facebook if enabled
-        facebook_articles = fetch_facebook_posts(search_query)
-        all_articles.extend(facebook_articles)
-        
-        # Fetch from Instagram if enabled
-        instagram_articles = fetch_instagram_posts(search_query)
-        all_articles.extend(instagram_articles)
-    except Exception as e:
-        print(f"Error fetching social media content: {e}")
+    # Add topic-specific feeds from major news sources
+    topic_feeds = {
+        "technology": [
+            ("https://www.theverge.com/rss/index.xml", 'en'),
+            ("https://feeds.wired.com/wired/index", 'en'),
+            # Indonesian tech sources
+            ("https://www.techno.id/rss", 'id'),
+            ("https://tekno.kompas.com/rss/", 'id')
+        ],
+        "politics": [
+            ("https://rss.nytimes.com/services/xml/rss/nyt/Politics.xml", 'en'),
+            # Indonesian politics sources
+            ("https://nasional.kompas.com/rss/", 'id'),
+            ("https://rss.tempo.co/nasional", 'id')
+        ],
+        "business": [
+            ("https://rss.nytimes.com/services/xml/rss/nyt/Business.xml", 'en'),
+            # Indonesian business sources
+            ("https://ekonomi.kompas.com/rss/", 'id'),
+            ("https://www.cnbcindonesia.com/rss", 'id')
+        ],
+        "health": [
+            ("https://rss.nytimes.com/services/xml/rss/nyt/Health.xml", 'en'),
+            # Indonesian health sources
+            ("https://health.kompas.com/rss/", 'id'),
+            ("https://www.klikdokter.com/rss", 'id')
+        ],
+        "teknologi": [  # Indonesian word for technology
+            ("https://tekno.kompas.com/rss/", 'id'),
+            ("https://www.techno.id/rss", 'id')
+        ],
+        "politik": [  # Indonesian word for politics
+            ("https://nasional.kompas.com/rss/", 'id'),
+            ("https://rss.tempo.co/nasional", 'id')
+        ],
+        "bisnis": [  # Indonesian word for business
+            ("https://ekonomi.kompas.com/rss/", 'id'),
+            ("https://www.cnbcindonesia.com/rss", 'id')
+        ],
+        "kesehatan": [  # Indonesian word for health
+            ("https://health.kompas.com/rss/", 'id'),
+            ("https://www.klikdokter.com/rss", 'id')
+        ]
+    }
     
-    return sorted(all_articles, key=lambda x: x['published'], reverse=True)
+    # Check if search query matches any of our predefined topics (in English or Indonesian)
+    for topic, topic_feed_list in topic_feeds.items():
+        if re.search(r'\b' + re.escape(topic) + r'\b', search_query.lower()):
+            feeds.extend(topic_feed_list)
+    
+    return feeds
 
-def contains_indonesian_words(text):
+def connectors_for(fetch_query):
     """
-    Simple check if text might be Indonesian by looking for common Indonesian words
-    A more sophisticated approach would use a language detection library
+    Every connector that could serve a query, cheapest first
+    Feeds publishing in a language the query filters out are left out of
+    the RSS connector altogether.
     """
-    # First, check if the input is a string
-    if not isinstance(text, str):
-        try:
-            text = str(text)
-        except:
-            return False
-    
-    # Ensure we have a non-empty string
-    if not text:
-        return False
-    
-    common_indonesian_words = [
-        'dan', 'atau', 'yang', 'di', 'ini', 'itu', 'dengan', 'untuk', 'dalam', 'tidak',
-        'pada', 'dari', 'jika', 'maka', 'akan', 'oleh', 'saya', 'kamu', 'mereka', 'kami',
-        'indonesia', 'jakarta', 'adalah', 'bisa', 'dapat', 'tahun', 'menurut', 'tentang'
+    search_query = fetch_query.search_query
+    feeds = [(url, language) for url, language in feeds_for(search_query)
+             if fetch_query.wants_language([language])]
+    feed_urls = [url for url, _ in feeds]
+    
+    # Default social pages and accounts are Indonesian; searches and hashtags can be anything
+    is_hashtag = bool(search_query) and search_query.startswith('#')
+    return [
+        Connector('news', {language for _, language in feeds}, lambda: rss_records(feed_urls)),
+        Connector('twitter', None, lambda: twitter_records(search_query)),
+        Connector('facebook', ['id'], lambda: facebook_records(search_query)),
+        Connector('instagram', None if is_hashtag else ['id'], lambda: instagram_records(search_query))
     ]
+
+def fetch_articles(query=None):
+    """
+    Fetch articles from RSS feeds and social media, then analyze sentiment
+    `query` is a search string (None for the home page feeds) or a
+    FetchQuery; only the connectors that can contribute to it are run, and
+    fetching stops once its limit of matching articles is reached.
+    """
+    fetch_query = FetchQuery.of(query)
+    connectors = plan(fetch_query, connectors_for(fetch_query))
     
-    try:
-        # Convert to lowercase and split into words
-        words = text.lower().split()
-        
-        # Check if any common Indonesian words are in the text
-        for word in words:
-            if word in common_indonesian_words:
-                return True
-    except Exception:
-        # If any error occurs in processing, assume it's not Indonesian
-        return False
+    # RSS feeds and social media go through the same staged pipeline, one
+    # connector at a time: the next one is only started once everything
+    # the ones before it fetched has been processed and the limit is still
+    # not reached
+    seen_ids = set()
+    limit = fetch_query.limit
+    all_articles = []
+    for connector in connectors:
+        if limit and len(all_articles) >= limit:
+            break
+        remaining = limit - len(all_articles) if limit else None
+        stages = ingestion_stages(fetch_query, remaining, seen_ids)
+        all_articles.extend(run_ingestion(connector.records(), fetch_query, remaining, stages))
+    
+    # Keep the index and memoized scores for the next ingestion run
+    dedupe_index.save()
+    sentiment_cache.save()
     
-    return False
+    return sorted(all_articles, key=lambda x: x.published, reverse=True)
 
-def analyze_sentiment(text, is_indonesian=False):
+def detect_language(text):
     """
-    Analyze sentiment of text
-    For Indonesian text, we'd use a specialized model, but TextBlob as fallback
+    Language of a text: 'id', 'en' or 'other'
+    Uses the precomputed character n-gram model loaded at startup
     """
-    # Ensure we have a valid string
-    if not isinstance(text, str) or not text:
-        return TextBlob("")  # Return neutral sentiment for empty text
-        
+    return language_identifier.detect(text)[0]
+
+def analyze_sentiment(text, language='en'):
+    """
+    Return the sentiment polarity of text (-1.0 to 1.0)
+    Indonesian text is scored with the Indonesian lexicon, everything else in English
+    """
+    return analyze_sentiment_batch([text], [language])[0]
+
+def analyze_sentiment_batch(texts, languages=None):
+    """
+    Score a list of texts in one call, grouped by language
+    English polarity matches TextBlob(text).sentiment.polarity; repeated
+    texts are answered from the memoized sentiment cache
+    """
+    if languages is None:
+        languages = ['en'] * len(texts)
+    
     try:
-        # In a real implementation, you could use a proper Indonesian sentiment model
-        # For now, we'll use TextBlob for both languages
-        return TextBlob(text)
-    except Exception:
-        # If TextBlob fails, return a neutral sentiment
-        return TextBlob("")
+        return sentiment_cache.score_batch(texts, languages, score_batch)
+    except Exception as e:
+        # If scoring fails, return neutral sentiment
+        print(f"Error analyzing sentiment: {e}")
+        return [0.0] * len(texts)
+
+def get_sentiment_label(score, language):
+    """Sentiment label, worded in Indonesian for Indonesian content"""
+    if language == 'id':
+        return "Positif" if score > 0 else "Negatif" if score < 0 else "Netral"
+    return "Positive" if score > 0 else "Negative" if score < 0 else "Neutral"
 
 def get_sentiment_color(score):
     """Return a color based on sentiment score"""
@@ -623,17 +689,12 @@ def get_sentiment_color(score):
 def home():
     """Home page - display list of articles with sentiment analysis"""
     search_query = request.args.get('query', None)
-    article_list = fetch_articles(search_query)
+    article_list = read_articles(search_query)
     return render_template('index.html', articles=article_list, request=request)
 
 @app.route('/article/<article_id>')
 def article_detail(article_id):
     """Article detail page"""
-    if article_id not in articles:
-        # If we don't have the article in memory, re-fetch all articles
-        search_query = request.args.get('query', None)
-        fetch_articles(search_query)
-    
     article = articles.get(article_id, None)
     if not article:
         return "Article not found", 404
@@ -663,5 +724,7 @@ def api_integration():
 if __name__ == '__main__':
     # Get port from the environment variable (for App Engine)
     port = int(os.environ.get('PORT', 8080))
+    # Start background ingestion before serving
+    start_worker(fetch_articles)
     # Run the app on all interfaces (0.0.0.0)
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,89 @@
+"""
+Compact article records for MediaMon
+
+Every article the store holds is an Article: a __slots__ object instead of
+a dict, so it carries no per-instance hash table. The handful of values
+repeated across thousands of articles (sentiment label and color, type,
+language, source and user names) are interned on assignment, so every
+article shares one copy of 'Positive', 'news', 'Kompas', ...:
+
+    article = Article(id=article_id, title=title, type='news', ...)
+    article.sentiment_label = 'Positive'
+    payload = article.to_dict()
+
+Views and templates read fields as attributes. Item access
+(article['title'], article.get('language')) is kept for code that still
+treats articles as mappings, and to_dict() returns the same dict the API
+has always serialized, without the fields an article does not have.
+"""
+import sys
+
+class Article:
+    """One news article or social media post"""
+    __slots__ = (
+        'id', 'title', 'summary', 'link', 'published', 'source', 'type',
+        'language', 'sentiment_score', 'sentiment_label', 'sentiment_color',
+        'user', 'profile_image'
+    )
+
+    # Fields drawn from a small set of values, shared across articles
+    INTERNED = frozenset(('source', 'type', 'language', 'sentiment_label', 'sentiment_color', 'user'))
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            self[name] = fields.get(name)
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        if name in self.INTERNED and type(value) is str:
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        value = getattr(self, name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, Article):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        # Equal articles always share an id; the id never changes once stored
+        return hash(self.id)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            self[name] = value
+
+    def __repr__(self):
+        return f"Article(id={self.id!r}, type={self.type!r}, title={self.title!r})"
+
+    def to_dict(self):
+        """Plain dict for JSON responses, leaving out fields that are not set"""
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Article from a dict, e.g. a snapshot written before articles were records"""
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
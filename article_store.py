@@ -0,0 +1,663 @@
+"""
+Shared article store for MediaMon
+
+The ingestion worker writes articles here and the Flask views and API only
+read from it. Articles are kept by ID, and the store doubles as the
+per-query result cache: each canonicalized search query (or 'default' for
+the home page feeds) maps to the ranked article IDs of its last ingestion
+run and the time that run finished, so callers can decide when the cached
+result is stale.
+
+When a snapshot path is configured the store is written to disk after every
+update and readers in other processes pick up the new snapshot on their
+next read, which lets the ingestion worker run as its own process.
+
+The store is bounded. Every ingestion run re-stamps the articles it
+returns; articles no ingestion has returned for ARTICLE_TTL seconds expire,
+and beyond ARTICLE_STORE_MAX articles or an estimated ARTICLE_STORE_MAX_MB
+of article data the least recently read or stored ones are evicted first.
+Lookups by ID stay O(1), and stats() reports size and eviction counters.
+
+With ARTICLE_STORE_DB set the store is an SQLite database in WAL mode
+instead (SQLiteArticleStore), which every gunicorn worker and the ingestion
+process open directly: readers run concurrently against one consistent
+corpus while a single writer commits each ingestion run in one transaction.
+Articles are indexed by published, source, language and type, query
+results by query tag, and titles/summaries in an FTS5 full-text table. The TTL and ARTICLE_STORE_MAX bounds apply there too,
+by ingestion time; the memory budget does not, as nothing is held in memory.
+The database also carries the searches web processes ask a separate
+ingestion process to run (request_query / take_requests); the snapshot
+store, written only by the worker, cannot.
+"""
+import base64
+import binascii
+import bisect
+import datetime
+import json
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from article import Article
+from search_index import SearchIndex, SEARCH_LIMIT, TITLE_WEIGHT, tokenize
+
+# Articles kept in memory before the least recently used are evicted
+ARTICLE_STORE_MAX = int(os.environ.get('ARTICLE_STORE_MAX', 20000))
+
+# Estimated memory budget for article data, in megabytes
+ARTICLE_STORE_MAX_MB = float(os.environ.get('ARTICLE_STORE_MAX_MB', 256))
+
+# Seconds an article is kept after the last ingestion run that returned it
+ARTICLE_TTL = float(os.environ.get('ARTICLE_TTL', 172800))
+
+# SQLite database shared by all workers; the in-memory store is used when unset
+ARTICLE_STORE_DB = os.environ.get('ARTICLE_STORE_DB')
+
+def article_size(article):
+    """
+    Approximate bytes held by one article
+    Interned fields are shared between articles and not counted.
+    """
+    size = sys.getsizeof(article)
+    for value in (article.id, article.title, article.summary, article.link,
+                  article.published, article.sentiment_score, article.profile_image):
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+def published_key(published):
+    """Sortable form of a published timestamp, as the SQLite store keeps it"""
+    if isinstance(published, datetime.datetime):
+        return published.isoformat()
+    return '' if published is None else str(published)
+
+def encode_cursor(article):
+    """Opaque cursor pointing just past an article in (published, id) order"""
+    raw = json.dumps([published_key(article.published), article.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(published key, article ID) of a cursor; ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        published, article_id = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(published, str) or not isinstance(article_id, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return published, article_id
+
+def query_tag(search_query, sources=None, languages=None):
+    """
+    Canonical key for a search query
+    Case and whitespace differences ("Politik ", "politik") share one entry.
+    Source/language filters get their own entry ("politik?language=id"), and
+    a FetchQuery is keyed by its own tag.
+    """
+    tag = getattr(search_query, 'tag', None)
+    if tag is not None:
+        return tag
+
+    if not search_query:
+        tag = 'default'
+    else:
+        tag = re.sub(r'\s+', ' ', search_query).strip().lower() or 'default'
+
+    filters = []
+    if languages:
+        filters.append('language=' + ','.join(sorted(languages)))
+    if sources:
+        filters.append('source=' + ','.join(sorted(sources)))
+    return tag + '?' + '&'.join(filters) if filters else tag
+
+def page_tags(search_query, source_type=None, language=None):
+    """Cached result sets a filtered page of a search draws on"""
+    tags = [query_tag(search_query)]
+    if source_type or language:
+        tags.append(query_tag(search_query, source_type and [source_type], language and [language]))
+    return tags
+
+class ArticleStore:
+    """Thread-safe, bounded article store with optional on-disk snapshot"""
+    def __init__(self, path=None, max_articles=ARTICLE_STORE_MAX,
+                 max_bytes=int(ARTICLE_STORE_MAX_MB * 2 ** 20), ttl=ARTICLE_TTL):
+        self.path = path
+        self.max_articles = max_articles
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.articles = OrderedDict()  # article_id -> Article, least recently used first
+        self.stored = OrderedDict()    # article_id -> (stored_at, size), oldest first
+        self.index = SearchIndex()     # full-text index over the stored articles
+        self.timeline = []             # sorted (published key, article_id) of every article
+        self.queries = {}              # query tag -> (ranked article IDs, updated_at)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {'ttl': 0, 'lru': 0, 'memory': 0}
+        self.lock = threading.RLock()
+        self.loaded_mtime = None
+
+        if self.path:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        """Load the snapshot if another process has written a newer one"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        if mtime == self.loaded_mtime:
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading article store snapshot: {e}")
+            return
+
+        with self.lock:
+            self.articles = OrderedDict()
+            self.stored = OrderedDict()
+            self.index = SearchIndex()
+            self.timeline = []
+            self.nbytes = 0
+            # Snapshots written before the store was bounded have no store times
+            stored_at = snapshot.get('stored', {})
+            now = time.time()
+            for article_id, article in snapshot.get('articles', {}).items():
+                # Snapshots written before articles were records hold plain dicts
+                self._put(Article.from_dict(article), stored_at.get(article_id, now))
+            self.stored = OrderedDict(sorted(self.stored.items(), key=lambda item: item[1][0]))
+            self.queries = snapshot.get('queries', {})
+            self.loaded_mtime = mtime
+
+    def _save(self):
+        """Write the snapshot atomically so readers never see a partial file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'articles': self.articles,
+                    'queries': self.queries,
+                    'stored': {article_id: entry[0] for article_id, entry in self.stored.items()}
+                }, f)
+            os.replace(tmp_path, self.path)
+            self.loaded_mtime = os.path.getmtime(self.path)
+        except Exception as e:
+            print(f"Error saving article store snapshot: {e}")
+
+    def _put(self, article, now):
+        """Insert or re-stamp an article as the most recently used"""
+        article_id = article.id
+        previous = self.stored.pop(article_id, None)
+        if previous is not None:
+            self.nbytes -= previous[1]
+        size = article_size(article)
+        current = self.articles.get(article_id)
+        if current is not article:
+            self.index.add(article)
+            if current is not None:
+                self._unlink(current)
+            bisect.insort(self.timeline, (published_key(article.published), article_id))
+        self.articles[article_id] = article
+        self.articles.move_to_end(article_id)
+        self.stored[article_id] = (now, size)
+        self.nbytes += size
+
+    def _unlink(self, article):
+        """Take an article's entry out of the timeline"""
+        key = (published_key(article.published), article.id)
+        i = bisect.bisect_left(self.timeline, key)
+        if i < len(self.timeline) and self.timeline[i] == key:
+            del self.timeline[i]
+
+    def _remove(self, article_id, reason):
+        self._unlink(self.articles.pop(article_id))
+        self.index.remove(article_id)
+        self.nbytes -= self.stored.pop(article_id)[1]
+        self.evictions[reason] += 1
+
+    def _evict(self, now):
+        """Drop expired articles, then the least recently used until within bounds"""
+        expired_before = now - self.ttl
+        while self.stored:
+            article_id, (stored_at, _) = next(iter(self.stored.items()))
+            if stored_at > expired_before:
+                break
+            self._remove(article_id, 'ttl')
+
+        while len(self.articles) > self.max_articles:
+            self._remove(next(iter(self.articles)), 'lru')
+
+        while self.nbytes > self.max_bytes and self.articles:
+            self._remove(next(iter(self.articles)), 'memory')
+
+        # Searches nobody has refreshed within the TTL go with their articles
+        for tag in [tag for tag, (_, updated_at) in self.queries.items() if updated_at <= expired_before]:
+            del self.queries[tag]
+
+    def replace_query(self, search_query, article_list):
+        """Store the results of one ingestion run for a query"""
+        tag = query_tag(search_query)
+        now = time.time()
+        with self.lock:
+            for article in article_list:
+                self._put(article, now)
+            self.queries[tag] = ([article.id for article in article_list], now)
+            self._evict(now)
+            if self.path:
+                self._save()
+
+    def query_age(self, search_query):
+        """Seconds since the query was last ingested, or None if it never was"""
+        if self.path:
+            self._reload_if_changed()
+        entry = self.queries.get(query_tag(search_query))
+        if entry is None:
+            return None
+        return time.time() - entry[1]
+
+    def query(self, search_query):
+        """Articles for a query, newest first"""
+        if self.path:
+            self._reload_if_changed()
+        with self.lock:
+            entry = self.queries.get(query_tag(search_query))
+            if entry is None:
+                return []
+            results = []
+            for article_id in entry[0]:
+                article = self.articles.get(article_id)
+                if article is not None:
+                    self.articles.move_to_end(article_id)
+                    results.append(article)
+            return results
+
+    def search(self, search_query, limit=SEARCH_LIMIT):
+        """Stored articles matching every term of a search, best match first"""
+        if self.path:
+            self._reload_if_changed()
+        with self.lock:
+            results = []
+            for article_id in self.index.search(search_query, limit):
+                self.articles.move_to_end(article_id)
+                results.append(self.articles[article_id])
+            return results
+
+    def page(self, search_query=None, source_type=None, language=None, after=None, limit=30):
+        """
+        One page of articles, newest first, and the cursor of the next page
+        Pages walk the whole store, or a search's matches (local full-text
+        matches and its last ingestion runs, filtered or not), in
+        (published, id) order; `after` is a decoded cursor.
+        """
+        if self.path:
+            self._reload_if_changed()
+        with self.lock:
+            if search_query:
+                ids = set(self.index.search(search_query, None))
+                for tag in page_tags(search_query, source_type, language):
+                    ids.update(self.queries.get(tag, ((), 0))[0])
+                keys = sorted(
+                    (published_key(self.articles[i].published), i) for i in ids if i in self.articles
+                )
+            else:
+                keys = self.timeline
+            end = bisect.bisect_left(keys, tuple(after)) if after else len(keys)
+
+            results = []
+            for i in range(end - 1, -1, -1):
+                article = self.articles[keys[i][1]]
+                if source_type and article.type != source_type:
+                    continue
+                if language and article.language != language:
+                    continue
+                results.append(article)
+                if len(results) > limit:
+                    break
+
+        if len(results) > limit:
+            return results[:limit], encode_cursor(results[limit - 1])
+        return results, None
+
+    def get(self, article_id, default=None):
+        if self.path:
+            self._reload_if_changed()
+        with self.lock:
+            article = self.articles.get(article_id)
+            if article is None:
+                self.misses += 1
+                return default
+            if self.stored[article_id][0] <= time.time() - self.ttl:
+                self._remove(article_id, 'ttl')
+                self.misses += 1
+                return default
+            self.articles.move_to_end(article_id)
+            self.hits += 1
+            return article
+
+    def stats(self):
+        """Size, bounds and hit/eviction counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'articles': len(self.articles),
+                'queries': len(self.queries),
+                'bytes': self.nbytes,
+                'max_articles': self.max_articles,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': dict(self.evictions)
+            }
+
+    def request_query(self, tag, payload):
+        """Ask a separate ingestion process for a query; False as snapshots only flow one way"""
+        return False
+
+    def take_requests(self):
+        return []
+
+    def __contains__(self, article_id):
+        return self.get(article_id) is not None
+
+    def __len__(self):
+        return len(self.articles)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    summary TEXT,
+    link TEXT,
+    published TEXT,
+    source TEXT,
+    type TEXT,
+    language TEXT,
+    sentiment_score REAL,
+    sentiment_label TEXT,
+    sentiment_color TEXT,
+    user TEXT,
+    profile_image TEXT,
+    stored_at REAL NOT NULL
+);
+DROP INDEX IF EXISTS articles_published;
+CREATE INDEX IF NOT EXISTS articles_published_id ON articles (published, id);
+CREATE INDEX IF NOT EXISTS articles_source ON articles (source);
+CREATE INDEX IF NOT EXISTS articles_language ON articles (language);
+CREATE INDEX IF NOT EXISTS articles_type ON articles (type);
+CREATE INDEX IF NOT EXISTS articles_stored_at ON articles (stored_at);
+CREATE TABLE IF NOT EXISTS queries (
+    tag TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_articles (
+    tag TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    article_id TEXT NOT NULL,
+    PRIMARY KEY (tag, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS query_articles_article ON query_articles (article_id);
+CREATE TABLE IF NOT EXISTS query_requests (
+    tag TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    requested_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5 (title, body);
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+    DELETE FROM articles_fts WHERE rowid = old.rowid;
+END;
+"""
+
+# Article fields in column order
+COLUMNS = Article.__slots__
+SELECT_ARTICLE = 'SELECT ' + ', '.join(f'a.{column}' for column in COLUMNS) + ' FROM articles a'
+
+def _to_row(article, stored_at):
+    row = [getattr(article, column) for column in COLUMNS]
+    row[COLUMNS.index('published')] = published_key(article.published)
+    row.append(stored_at)
+    return row
+
+def _fts_row(article):
+    """Search tokens of an article as FTS5 sees them"""
+    return (' '.join(tokenize(article.title)), ' '.join(tokenize(article.summary)), article.id)
+
+def _from_row(row):
+    article = Article(**dict(zip(COLUMNS, row)))
+    if article.published:
+        article.published = datetime.datetime.fromisoformat(article.published)
+    return article
+
+class SQLiteArticleStore:
+    """Article store in an SQLite database shared between processes (WAL mode)"""
+    def __init__(self, path, max_articles=ARTICLE_STORE_MAX, ttl=ARTICLE_TTL):
+        self.path = path
+        self.max_articles = max_articles
+        self.ttl = ttl
+        self.local = threading.local()  # one connection per thread
+        self.write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {'ttl': 0, 'lru': 0}
+
+        db = self._db()
+        with self.write_lock:
+            db.executescript(SCHEMA)
+            self._backfill_search(db)
+
+    def _backfill_search(self, db):
+        """Index articles stored before the database had a full-text table"""
+        if db.execute('SELECT 1 FROM articles_fts LIMIT 1').fetchone() is not None:
+            return
+        rows = db.execute(SELECT_ARTICLE).fetchall()
+        if not rows:
+            return
+        db.execute('BEGIN IMMEDIATE')
+        db.executemany(
+            'INSERT INTO articles_fts (rowid, title, body) SELECT rowid, ?, ? FROM articles WHERE id = ?',
+            [_fts_row(_from_row(row)) for row in rows]
+        )
+        db.execute('COMMIT')
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            # Autocommit; writes open their own transactions
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            # REPLACE fires the delete trigger that keeps articles_fts in step
+            db.execute('PRAGMA recursive_triggers=ON')
+            self.local.db = db
+        return db
+
+    def replace_query(self, search_query, article_list):
+        """Store the results of one ingestion run for a query in one transaction"""
+        tag = query_tag(search_query)
+        now = time.time()
+        placeholders = ', '.join('?' * (len(COLUMNS) + 1))
+        db = self._db()
+        with self.write_lock:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.executemany(
+                    f"INSERT OR REPLACE INTO articles ({', '.join(COLUMNS)}, stored_at) VALUES ({placeholders})",
+                    [_to_row(article, now) for article in article_list]
+                )
+                db.executemany(
+                    'INSERT INTO articles_fts (rowid, title, body) SELECT rowid, ?, ? FROM articles WHERE id = ?',
+                    [_fts_row(article) for article in article_list]
+                )
+                db.execute('DELETE FROM query_articles WHERE tag = ?', (tag,))
+                db.executemany(
+                    'INSERT INTO query_articles (tag, rank, article_id) VALUES (?, ?, ?)',
+                    [(tag, rank, article.id) for rank, article in enumerate(article_list)]
+                )
+                db.execute('INSERT OR REPLACE INTO queries (tag, updated_at) VALUES (?, ?)', (tag, now))
+                self._evict(db, now)
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+
+    def _evict(self, db, now):
+        """Drop expired articles, then the longest-stored until within ARTICLE_STORE_MAX"""
+        expired_before = now - self.ttl
+        expired = db.execute('DELETE FROM articles WHERE stored_at <= ?', (expired_before,)).rowcount
+        self.evictions['ttl'] += expired
+
+        excess = db.execute('SELECT COUNT(*) FROM articles').fetchone()[0] - self.max_articles
+        if excess > 0:
+            db.execute(
+                'DELETE FROM articles WHERE id IN (SELECT id FROM articles ORDER BY stored_at LIMIT ?)',
+                (excess,)
+            )
+            self.evictions['lru'] += excess
+
+        # Searches nobody has refreshed within the TTL go with their articles
+        db.execute(
+            'DELETE FROM query_articles WHERE tag IN (SELECT tag FROM queries WHERE updated_at <= ?)',
+            (expired_before,)
+        )
+        db.execute('DELETE FROM queries WHERE updated_at <= ?', (expired_before,))
+        if expired or excess > 0:
+            db.execute('DELETE FROM query_articles WHERE article_id NOT IN (SELECT id FROM articles)')
+
+    def query_age(self, search_query):
+        """Seconds since the query was last ingested, or None if it never was"""
+        row = self._db().execute(
+            'SELECT updated_at FROM queries WHERE tag = ?', (query_tag(search_query),)
+        ).fetchone()
+        if row is None:
+            return None
+        return time.time() - row[0]
+
+    def query(self, search_query):
+        """Articles for a query, newest first"""
+        rows = self._db().execute(
+            SELECT_ARTICLE + ' JOIN query_articles q ON q.article_id = a.id WHERE q.tag = ? ORDER BY q.rank',
+            (query_tag(search_query),)
+        ).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def search(self, search_query, limit=SEARCH_LIMIT):
+        """Stored articles matching every term of a search, best match first"""
+        tokens = set(tokenize(search_query))
+        if not tokens:
+            return []
+        match = ' '.join('"' + token.replace('"', '""') + '"' for token in tokens)
+        rows = self._db().execute(
+            SELECT_ARTICLE + ' JOIN articles_fts f ON f.rowid = a.rowid'
+            ' WHERE articles_fts MATCH ? AND a.stored_at > ?'
+            f' ORDER BY bm25(articles_fts, {TITLE_WEIGHT}.0, 1.0) LIMIT ?',
+            (match, time.time() - self.ttl, limit)
+        ).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def page(self, search_query=None, source_type=None, language=None, after=None, limit=30):
+        """One page of articles, newest first, and the cursor of the next page"""
+        clauses = ['a.stored_at > ?']
+        params = [time.time() - self.ttl]
+        if search_query:
+            tags = page_tags(search_query, source_type, language)
+            matches = f"a.id IN (SELECT article_id FROM query_articles WHERE tag IN ({', '.join('?' * len(tags))}))"
+            params.extend(tags)
+            tokens = set(tokenize(search_query))
+            if tokens:
+                matches += ' OR a.rowid IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)'
+                params.append(' '.join('"' + token.replace('"', '""') + '"' for token in tokens))
+            clauses.append(f'({matches})')
+        if source_type:
+            clauses.append('a.type = ?')
+            params.append(source_type)
+        if language:
+            clauses.append('a.language = ?')
+            params.append(language)
+        if after:
+            # Row value comparison walks the (published, id) index from the cursor
+            clauses.append('(a.published, a.id) < (?, ?)')
+            params.extend(after)
+
+        rows = self._db().execute(
+            SELECT_ARTICLE + ' WHERE ' + ' AND '.join(clauses) +
+            ' ORDER BY a.published DESC, a.id DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+        results = [_from_row(row) for row in rows[:limit]]
+        if len(rows) > limit:
+            return results, encode_cursor(results[-1])
+        return results, None
+
+    def get(self, article_id, default=None):
+        row = self._db().execute(
+            SELECT_ARTICLE + ' WHERE a.id = ? AND a.stored_at > ?',
+            (article_id, time.time() - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return _from_row(row)
+
+    def stats(self):
+        """Size, bounds and hit/eviction counters (counters are per process)"""
+        db = self._db()
+        lookups = self.hits + self.misses
+        page_count = db.execute('PRAGMA page_count').fetchone()[0]
+        page_size = db.execute('PRAGMA page_size').fetchone()[0]
+        return {
+            'articles': len(self),
+            'queries': db.execute('SELECT COUNT(*) FROM queries').fetchone()[0],
+            'bytes': page_count * page_size,
+            'max_articles': self.max_articles,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': dict(self.evictions)
+        }
+
+    def request_query(self, tag, payload):
+        """Queue a query for the ingestion process (once per tag until it is taken)"""
+        self._db().execute(
+            'INSERT OR IGNORE INTO query_requests (tag, payload, requested_at) VALUES (?, ?, ?)',
+            (tag, json.dumps(payload), time.time())
+        )
+        return True
+
+    def take_requests(self):
+        """Remove and return the queued query payloads, oldest first"""
+        db = self._db()
+        with self.write_lock:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = db.execute('SELECT payload FROM query_requests ORDER BY requested_at').fetchall()
+                db.execute('DELETE FROM query_requests')
+                db.execute('COMMIT')
+            except Exception:
+                db.execute('ROLLBACK')
+                raise
+        return [json.loads(payload) for payload, in rows]
+
+    def __contains__(self, article_id):
+        return self.get(article_id) is not None
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+# Process-wide store shared by the views, the API and the ingestion worker
+if ARTICLE_STORE_DB:
+    articles = SQLiteArticleStore(ARTICLE_STORE_DB)
+else:
+    articles = ArticleStore(os.environ.get('ARTICLE_STORE_PATH'))
@@ -0,0 +1,86 @@
+"""
+Async (ASGI) entry point for MediaMon
+
+Under sync gunicorn workers a request for a query that was never ingested
+holds its worker for up to INGESTION_COLD_WAIT seconds, and every other
+request queues behind it. This entry point serves the same Flask app from
+one event loop instead:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Reads that may have to wait for ingestion (`/` and the first page of
+GET /api/v1/articles) await the query's refresh as a coroutine first, so
+hundreds of them can wait at once without holding a thread. The Flask
+view then runs on asgiref's thread pool with the cold wait switched off,
+finding the query already ingested. Every other route, including
+POST /api/v1/sentiment (CPU-bound scoring with no upstream wait), goes
+straight to the Flask app through asgiref's stock WsgiToAsgi. Each request
+runs inside its own ThreadSensitiveContext, so its view gets a thread of
+its own instead of asgiref's single shared sync thread, and one slow view
+does not hold up the others.
+
+The ingestion worker is started on import when INGESTION_MODE=thread, as
+it is by main.py for gunicorn. Compare the two with
+benchmarks/serving_load_bench.py.
+"""
+from urllib.parse import parse_qsl
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers, MultiDict
+from app import app as flask_app, fetch_articles
+from api import articles_fetch_query, token_error
+from fetch_planner import FetchQuery
+from ingestion import cold_wait, read_articles_async, start_worker
+
+# Keep the article store filled in the background (INGESTION_MODE=thread)
+start_worker(fetch_articles)
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+def request_parts(scope):
+    """Query arguments and headers of an HTTP scope"""
+    args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+    headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', [])])
+    return args, headers
+
+def cold_query(scope):
+    """
+    The query a request may wait on ingestion for, or None
+    Unauthenticated and malformed API requests are left to Flask to reject.
+    """
+    if scope['method'] != 'GET':
+        return None
+    path = scope['path']
+    args, headers = request_parts(scope)
+    if path == '/':
+        return FetchQuery(args.get('query', None))
+    if path == '/api/v1/articles' and not args.get('cursor') and token_error(headers) is None:
+        try:
+            return articles_fetch_query(args)
+        except ValueError:
+            return None
+    return None
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    if scope['type'] == 'http':
+        fetch_query = cold_query(scope)
+        if fetch_query is not None:
+            await read_articles_async(fetch_query)
+            # Copied into the Flask view's thread: it must not block again
+            cold_wait.set(0)
+
+    # A thread per request rather than one shared sync thread for all of them
+    async with ThreadSensitiveContext():
+        await flask_asgi(scope, receive, send)
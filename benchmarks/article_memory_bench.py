@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark the memory held per stored article, as dicts and as Article records.
+
+Builds --count synthetic news articles from the recorded headline corpora
+(titles, Google News style links, HTML summaries, sources, labels, colors,
+language codes) and measures the bytes allocated per article with
+tracemalloc, once as the plain dicts the store used to hold and once as
+Article records. Repeated values are built fresh for every article, the way
+feed parsing and string formatting produce them, so only interning makes
+them shared.
+
+    python benchmarks/article_memory_bench.py --count 100000
+"""
+import argparse
+import datetime
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from article import Article
+
+SOURCES = ['Kompas', 'Detik', 'Tempo', 'Republika', 'Liputan 6', 'Tribun News', 'The Guardian']
+LABELS = [('Positif', 'success'), ('Netral', 'info'), ('Negatif', 'warning'), ('Positive', 'info'), ('Negative', 'danger')]
+
+def load_titles():
+    titles = []
+    for language in ('en', 'id'):
+        with open(os.path.join(ROOT, 'benchmarks', 'data', f'headlines_{language}.txt'), encoding='utf-8') as f:
+            titles.extend((line.strip(), language) for line in f if line.strip())
+    return titles
+
+def fresh(value):
+    """An equal string that is not the same object, like a parsed feed field"""
+    return ''.join(list(value))
+
+def article_fields(i, titles, published):
+    title, language = titles[i % len(titles)]
+    source = SOURCES[i % len(SOURCES)]
+    label, color = LABELS[i % len(LABELS)]
+    return {
+        'id': f"news_{i:016x}",
+        'title': f"{title} - {source}",
+        'summary': f'<a href="https://news.google.com/articles/{i:016x}" target="_blank">{title}</a>'
+                   f'&nbsp;&nbsp;<font color="#6f6f6f">{source}</font>',
+        'link': f"https://news.google.com/rss/articles/{i:016x}?oc=5",
+        'published': published + datetime.timedelta(seconds=i),
+        'source': fresh(source),
+        'type': fresh('news'),
+        'language': fresh(language),
+        'sentiment_score': round((i % 21 - 10) / 10, 2),
+        'sentiment_label': fresh(label),
+        'sentiment_color': fresh(color)
+    }
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(count)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return records, used
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark memory per stored article')
+    parser.add_argument('--count', type=int, default=100000, help='Articles held in memory')
+    args = parser.parse_args()
+
+    titles = load_titles()
+    published = datetime.datetime(2024, 1, 1)
+
+    def as_dicts(count):
+        return {f"news_{i:016x}": article_fields(i, titles, published) for i in range(count)}
+
+    def as_records(count):
+        return {f"news_{i:016x}": Article(**article_fields(i, titles, published)) for i in range(count)}
+
+    dicts, dict_bytes = measure(as_dicts, args.count)
+    del dicts
+    records, record_bytes = measure(as_records, args.count)
+
+    print(f"{args.count} articles")
+    print(f"dict:    {dict_bytes / args.count:8.0f} bytes/article ({dict_bytes / 2 ** 20:.1f} MiB)")
+    print(f"Article: {record_bytes / args.count:8.0f} bytes/article ({record_bytes / 2 ** 20:.1f} MiB, "
+          f"{100 * (1 - record_bytes / dict_bytes):.0f}% less)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
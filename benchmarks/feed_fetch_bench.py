@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark sequential vs concurrent feed fetching.
+
+Starts a local stand-in HTTP server that serves recorded-style RSS feeds
+with configurable latency (fast, slow and hanging hosts), then compares the
+old one-after-another feedparser loop with feed_fetcher.fetch_feeds.
+
+    python benchmarks/feed_fetch_bench.py --fast 4 --slow 2 --hang 1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedparser
+from feed_fetcher import fetch_feeds
+
+def build_feed(name, count=30):
+    """Build an RSS 2.0 document shaped like the Kompas/Detik feeds"""
+    items = []
+    for i in range(count):
+        items.append(f"""
+        <item>
+            <title>{name} berita nomor {i} tentang ekonomi dan politik Indonesia</title>
+            <link>https://{name}.example/read/2024/01/01/{i}/berita-{i}</link>
+            <description><![CDATA[<p>Ringkasan berita {i} dari {name}.</p>]]></description>
+            <pubDate>Mon, 01 Jan 2024 {i % 24:02d}:00:00 +0700</pubDate>
+            <guid>https://{name}.example/read/{i}</guid>
+        </item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel>
+    <title>{name}</title>
+    <link>https://{name}.example/</link>
+    <description>Recorded {name} feed</description>
+    {''.join(items)}
+</channel></rss>""".encode('utf-8')
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves /<delay-ms>/<name> after sleeping for the given delay"""
+    def do_GET(self):
+        try:
+            _, delay_ms, name = self.path.split('/', 2)
+            time.sleep(int(delay_ms) / 1000.0)
+        except ValueError:
+            self.send_error(404)
+            return
+
+        body = build_feed(name)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feed fan-out')
+    parser.add_argument('--fast', type=int, default=4, help='Feeds answering in ~20ms')
+    parser.add_argument('--slow', type=int, default=2, help='Feeds answering in ~1.5s')
+    parser.add_argument('--hang', type=int, default=1, help='Feeds answering after 30s')
+    parser.add_argument('--feed-timeout', type=float, default=3.0)
+    parser.add_argument('--deadline', type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    urls = [f"{base}/20/fast{i}" for i in range(args.fast)]
+    urls += [f"{base}/1500/slow{i}" for i in range(args.slow)]
+    urls += [f"{base}/30000/hang{i}" for i in range(args.hang)]
+
+    # Sequential baseline skips hanging hosts, otherwise it never finishes
+    sequential_urls = [u for u in urls if '/30000/' not in u]
+    started = time.perf_counter()
+    entries = 0
+    for url in sequential_urls:
+        entries += len(feedparser.parse(url).entries)
+    sequential = time.perf_counter() - started
+    print(f"sequential ({len(sequential_urls)} feeds, hanging hosts excluded): "
+          f"{sequential:.2f}s, {entries} entries")
+
+    started = time.perf_counter()
+    results = fetch_feeds(urls, feed_timeout=args.feed_timeout, deadline=args.deadline)
+    concurrent = time.perf_counter() - started
+    entries = sum(len(r.entries) for r in results)
+    print(f"concurrent ({len(urls)} feeds): {concurrent:.2f}s, {entries} entries")
+    for result in results:
+        print(f"  {result.status:8} {result.elapsed:6.2f}s  {result.url}")
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Benchmark feed parsing: feedparser vs the streaming parser.
+
+Parses the recorded Kompas, Detik and Google News feeds in
+benchmarks/data/feeds/ --rounds times each, once with feedparser.parse
+(every entry parsed, sanitized and date-parsed, then sliced to --limit)
+and once with feed_parser.parse_entries, which stops after --limit
+entries. Also checks that both return the same titles, links and dates.
+
+    python benchmarks/feed_parse_bench.py --limit 10 --rounds 200
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import feedparser
+from feed_parser import parse_entries
+
+FEEDS = ('kompas', 'detik', 'google_news')
+
+def timed(parse, body, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        entries = parse(body)
+    return (time.perf_counter() - started) / rounds, entries
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feed parsing')
+    parser.add_argument('--limit', type=int, default=10, help='Entries kept per feed (0: all)')
+    parser.add_argument('--rounds', type=int, default=200, help='Parses timed per feed and parser')
+    args = parser.parse_args()
+    limit = args.limit or None
+
+    def full(body):
+        return feedparser.parse(body).entries[:limit]
+
+    def streaming(body):
+        return parse_entries(body, limit=limit)
+
+    for name in FEEDS:
+        with open(os.path.join(ROOT, 'benchmarks', 'data', 'feeds', f'{name}.xml'), 'rb') as f:
+            body = f.read()
+        full_time, expected = timed(full, body, args.rounds)
+        stream_time, entries = timed(streaming, body, args.rounds)
+
+        same = [(e.title, e.link, e.published_parsed) for e in expected] == \
+               [(e.title, e.link, e.published_parsed) for e in entries]
+        print(f"{name:12} {len(body) / 1024:5.0f} KiB  feedparser {1000 * full_time:7.2f} ms  "
+              f"streaming {1000 * stream_time:6.2f} ms  ({full_time / stream_time:4.1f}x, "
+              f"{len(entries) / stream_time:8.0f} entries/s, {'same' if same else 'DIFFERENT'} entries)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Benchmark the Indonesian sentiment scorer on the recorded headline corpus.
+
+Scores benchmarks/data/headlines_id.txt with TextBlob (what Indonesian text
+used to get) and with the Indonesian lexicon scorer, reports throughput with
+a cold and a warm stem cache, and how many headlines each one scores as
+non-neutral.
+
+    python benchmarks/indonesian_sentiment_bench.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from textblob import TextBlob
+from sentiment import IndonesianSentiment
+
+def load_corpus():
+    with open(os.path.join(ROOT, 'benchmarks', 'data', 'headlines_id.txt'), encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Indonesian sentiment scoring')
+    parser.add_argument('--repeat', type=int, default=200, help='Times the corpus is scored')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    texts = corpus * args.repeat
+
+    started = time.perf_counter()
+    baseline = [TextBlob(text).sentiment.polarity for text in texts]
+    textblob_time = time.perf_counter() - started
+
+    scorer = IndonesianSentiment()
+    started = time.perf_counter()
+    scorer.score_batch(corpus)
+    cold_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores = scorer.score_batch(texts)
+    warm_time = time.perf_counter() - started
+
+    print(f"{len(texts)} texts ({len(corpus)} distinct, {len(scorer.stems)} distinct words stemmed)")
+    print(f"TextBlob:          {len(texts) / textblob_time:10.0f} texts/s")
+    print(f"Indonesian (cold): {len(corpus) / cold_time:10.0f} texts/s")
+    print(f"Indonesian (warm): {len(texts) / warm_time:10.0f} texts/s "
+          f"({textblob_time / warm_time:.1f}x)")
+    print(f"non-neutral headlines: TextBlob {sum(1 for s in baseline[:len(corpus)] if s)}/{len(corpus)}, "
+          f"Indonesian {sum(1 for s in scores[:len(corpus)] if s)}/{len(corpus)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark the n-gram language identifier against the old keyword check.
+
+Classifies the recorded headline corpora in benchmarks/data (headlines_en.txt
+and headlines_id.txt) with both, reports accuracy per language and
+throughput on a cold pass (empty token memo) and a warm one. Then checks
+the short texts the sentiment endpoints and searches get ("bad", "sad day",
+"bagus", "politik"), where n-grams alone carry too little evidence, and
+fails if fewer than --min-short-accuracy of them are classified correctly.
+
+    python benchmarks/language_bench.py --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from language_id import LanguageIdentifier
+
+# The check app.py used before the n-gram model, kept as the baseline
+COMMON_INDONESIAN_WORDS = [
+    'dan', 'atau', 'yang', 'di', 'ini', 'itu', 'dengan', 'untuk', 'dalam', 'tidak',
+    'pada', 'dari', 'jika', 'maka', 'akan', 'oleh', 'saya', 'kamu', 'mereka', 'kami',
+    'indonesia', 'jakarta', 'adalah', 'bisa', 'dapat', 'tahun', 'menurut', 'tentang'
+]
+
+def contains_indonesian_words(text):
+    for word in text.lower().split():
+        if word in COMMON_INDONESIAN_WORDS:
+            return True
+    return False
+
+# Short inputs with their expected language
+SHORT_TEXTS = [
+    ('bad', 'en'), ('sad', 'en'), ('ok', 'en'), ('lame', 'en'), ('pain', 'en'),
+    ('sad day', 'en'), ('bad bad bad', 'en'), ('great', 'en'), ('so good', 'en'),
+    ('not bad', 'en'), ('love it', 'en'), ('terrible service', 'en'),
+    ('good day', 'en'), ('War in Gaza', 'en'), ('economy', 'en'), ('stock market', 'en'),
+    ('bagus', 'id'), ('sedih', 'id'), ('tidak bagus', 'id'), ('harga naik', 'id'),
+    ('saya senang', 'id'), ('buruk sekali', 'id'), ('banjir di jakarta', 'id'),
+    ('sangat mengecewakan', 'id'), ('politik', 'id'), ('korupsi', 'id'), ('ekonomi', 'id'),
+    ('kesehatan', 'id'), ('teknologi', 'id'), ('bisnis', 'id'), ('pendidikan', 'id'),
+    ('olahraga', 'id'), ('pemilu', 'id'),
+]
+
+def load_corpus():
+    labelled = []
+    data_dir = os.path.join(ROOT, 'benchmarks', 'data')
+    for language in ('en', 'id'):
+        with open(os.path.join(data_dir, f'headlines_{language}.txt'), encoding='utf-8') as f:
+            labelled.extend((line.strip(), language) for line in f if line.strip())
+    return labelled
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark language identification')
+    parser.add_argument('--repeat', type=int, default=200, help='Times the corpus is classified')
+    parser.add_argument('--min-short-accuracy', type=float, default=0.9,
+                        help='Share of the short texts that must be classified correctly')
+    args = parser.parse_args()
+
+    labelled = load_corpus()
+    texts = [text for text, _ in labelled] * args.repeat
+
+    def keyword(text):
+        return 'id' if contains_indonesian_words(text) else 'en'
+
+    identifier = LanguageIdentifier()
+    started = time.perf_counter()
+    ngram_results = [language for language, _ in identifier.detect_batch([text for text, _ in labelled])]
+    cold_time = time.perf_counter() - started
+
+    for name, classify in (('keyword', keyword), ('n-gram', lambda text: identifier.detect(text)[0])):
+        results = ngram_results if name == 'n-gram' else [keyword(text) for text, _ in labelled]
+        for language in ('en', 'id'):
+            total = sum(1 for _, expected in labelled if expected == language)
+            correct = sum(1 for (_, expected), got in zip(labelled, results)
+                          if expected == language and got == language)
+            print(f"{name:8} {language}: {correct}/{total} correct")
+
+        started = time.perf_counter()
+        for text in texts:
+            classify(text)
+        elapsed = time.perf_counter() - started
+        print(f"{name:8} warm: {len(texts) / elapsed:10.0f} texts/s")
+
+    print(f"n-gram   cold: {len(labelled) / cold_time:10.0f} texts/s (first pass, empty token memo)")
+
+    wrong = [(text, expected, identifier.detect(text)[0]) for text, expected in SHORT_TEXTS
+             if identifier.detect(text)[0] != expected]
+    accuracy = 1 - len(wrong) / len(SHORT_TEXTS)
+    print(f"n-gram   short: {len(SHORT_TEXTS) - len(wrong)}/{len(SHORT_TEXTS)} correct")
+    for text, expected, got in wrong:
+        print(f"         {text!r}: expected {expected}, got {got}")
+    return 0 if accuracy >= args.min_short_accuracy else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark local full-text search against the article stores.
+
+Fills the in-memory store and a temporary SQLite store with --count
+synthetic articles built from the recorded headline corpora, then times
+searches for words taken from those headlines. Compare the per-search
+latency with a Google News RSS round trip (typically several hundred ms).
+
+    python benchmarks/search_bench.py --count 20000
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from article import Article
+from article_store import ArticleStore, SQLiteArticleStore
+from search_index import tokenize
+
+SOURCES = ['Kompas', 'Detik', 'Tempo', 'Republika', 'The Guardian']
+
+def load_titles():
+    titles = []
+    for language in ('en', 'id'):
+        with open(os.path.join(ROOT, 'benchmarks', 'data', f'headlines_{language}.txt'), encoding='utf-8') as f:
+            titles.extend(line.strip() for line in f if line.strip())
+    return titles
+
+def build_articles(titles, count):
+    published = datetime.datetime(2024, 1, 1)
+    article_list = []
+    for i in range(count):
+        title = f"{titles[i % len(titles)]} ({i // len(titles)})"
+        source = SOURCES[i % len(SOURCES)]
+        article_list.append(Article(
+            id=f"news_{i:016x}",
+            title=f"{title} - {source}",
+            summary=f'<a href="https://news.google.com/articles/{i:016x}">{title}</a>&nbsp;<font>{source}</font>',
+            link=f"https://news.google.com/rss/articles/{i:016x}",
+            published=published + datetime.timedelta(seconds=i),
+            source=source,
+            type='news'
+        ))
+    return article_list
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark local full-text search')
+    parser.add_argument('--count', type=int, default=20000, help='Articles in the store')
+    parser.add_argument('--queries', type=int, default=500, help='Searches timed per store')
+    args = parser.parse_args()
+
+    titles = load_titles()
+    article_list = build_articles(titles, args.count)
+
+    # One- and two-word searches drawn from the headlines
+    queries = []
+    for i in range(args.queries):
+        tokens = [t for t in tokenize(titles[i % len(titles)]) if t.isalpha()] or ['jakarta']
+        queries.append(' '.join(tokens[(i // len(titles)) % len(tokens):][:1 + i % 2]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = (
+            ('memory', ArticleStore(max_articles=args.count)),
+            ('sqlite', SQLiteArticleStore(os.path.join(directory, 'articles.db'), max_articles=args.count)),
+        )
+        for name, store in stores:
+            started = time.perf_counter()
+            store.replace_query(None, article_list)
+            index_time = time.perf_counter() - started
+
+            matches = 0
+            started = time.perf_counter()
+            for query in queries:
+                matches += len(store.search(query))
+            search_time = time.perf_counter() - started
+
+            print(f"{name:7} index {args.count} articles in {index_time:.2f}s, "
+                  f"search {1000 * search_time / len(queries):.2f} ms/query "
+                  f"({matches / len(queries):.0f} results on average)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark the batch sentiment engine against per-text TextBlob objects.
+
+Scores the recorded headline corpora in benchmarks/data with both
+implementations, reports throughput and checks that polarity agrees within
+the tolerance.
+
+    python benchmarks/sentiment_bench.py --repeat 50
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from textblob import TextBlob
+from sentiment import sentiment_engine
+
+def load_corpus():
+    texts = []
+    data_dir = os.path.join(ROOT, 'benchmarks', 'data')
+    for name in sorted(os.listdir(data_dir)):
+        if name.startswith('headlines_'):
+            with open(os.path.join(data_dir, name), encoding='utf-8') as f:
+                texts.extend(line.strip() for line in f if line.strip())
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sentiment scoring')
+    parser.add_argument('--repeat', type=int, default=50, help='Times the corpus is scored')
+    parser.add_argument('--tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    texts = corpus * args.repeat
+
+    started = time.perf_counter()
+    baseline = [TextBlob(text).sentiment.polarity for text in texts]
+    textblob_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = sentiment_engine.score_batch(texts)
+    engine_time = time.perf_counter() - started
+
+    mismatches = [
+        (text, a, b) for text, a, b in zip(corpus, baseline, batch)
+        if abs(a - b) > args.tolerance
+    ]
+
+    print(f"{len(texts)} texts ({len(corpus)} distinct)")
+    print(f"TextBlob:     {len(texts) / textblob_time:10.0f} texts/s")
+    print(f"batch engine: {len(texts) / engine_time:10.0f} texts/s "
+          f"({textblob_time / engine_time:.1f}x)")
+    print(f"polarity mismatches above {args.tolerance}: {len(mismatches)}")
+    for text, a, b in mismatches[:10]:
+        print(f"  {a:+.3f} vs {b:+.3f}  {text}")
+
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
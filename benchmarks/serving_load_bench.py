@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Load-test the sync (gunicorn) and async (uvicorn asgi:app) serving modes.
+
+Starts the app both ways on a local port with the real views, API and
+ingestion worker, but with upstream scraping replaced by a stand-in that
+takes --fetch-delay seconds per query. It then fires a mix of concurrent
+requests: searches nobody has made before (each waits for its first
+ingestion), and warm requests to `/`, GET /api/v1/articles and
+POST /api/v1/sentiment that the store can answer at once. The sync mode
+runs one sync gunicorn worker, as on the F1 instance.
+
+    python benchmarks/serving_load_bench.py --cold 20 --warm 400 --concurrency 200
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCES = ['Kompas', 'Detik', 'Tempo', 'Republika']
+
+def slow_fetch(fetch_delay):
+    """Stand-in for fetch_articles: an upstream wait, then a page of articles"""
+    from article import Article
+
+    def fetch(query):
+        time.sleep(fetch_delay)
+        published = datetime.datetime(2024, 1, 1)
+        return [
+            Article(
+                id=f"news_{abs(hash((str(query), i))):016x}",
+                title=f"Berita {i} tentang ekonomi dan politik - {SOURCES[i % len(SOURCES)]}",
+                summary=f"<p>Ringkasan berita {i}</p>",
+                link=f"https://news.example/read/{i}",
+                published=published + datetime.timedelta(minutes=i),
+                source=SOURCES[i % len(SOURCES)],
+                type='news',
+                language='id',
+                sentiment_score=0.2,
+                sentiment_label='Positif',
+                sentiment_color='info'
+            )
+            for i in range(20)
+        ]
+    return fetch
+
+def serve(mode, port, fetch_delay, workers):
+    """Run the app in this process (the benchmark starts one per mode)"""
+    import ingestion
+
+    if mode == 'async':
+        import uvicorn
+        ingestion.start_worker(slow_fetch(fetch_delay))
+        import asgi
+        uvicorn.run(asgi.app, host='127.0.0.1', port=port, ws='none', log_level='warning')
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    class SyncServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"127.0.0.1:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'sync')
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            # Runs in the worker, before main.py starts the real ingestion
+            ingestion.start_worker(slow_fetch(fetch_delay))
+            from main import app
+            return app
+
+    SyncServer().run()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def request(port, method, path, body=None, headers=None, timeout=120):
+    """(status, seconds) of one request on a fresh connection"""
+    started = time.perf_counter()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        status = response.status
+    except Exception:
+        status = None
+    return status, time.perf_counter() - started
+
+def wait_ready(port, deadline=60):
+    stop = time.monotonic() + deadline
+    while time.monotonic() < stop:
+        if request(port, 'GET', '/api/docs', timeout=2)[0] == 200:
+            return True
+        time.sleep(0.2)
+    return False
+
+def workload(cold, warm, token):
+    """Shuffled (kind, method, path, body, headers) requests"""
+    auth = {'Authorization': f"Bearer {token}"}
+    sentiment = json.dumps({'text': 'Pemerintah menilai kebijakan baru sangat bagus'})
+    warm_requests = [
+        ('home', 'GET', '/', None, {}),
+        ('articles', 'GET', '/api/v1/articles?limit=10', None, auth),
+        ('sentiment', 'POST', '/api/v1/sentiment', sentiment, dict(auth, **{'Content-Type': 'application/json'})),
+    ]
+    requests = [('cold', 'GET', f"/?query=topik{i}", None, {}) for i in range(cold)]
+    requests += [warm_requests[i % len(warm_requests)] for i in range(warm)]
+    random.Random(7).shuffle(requests)
+    return requests
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def run_mode(mode, args, token):
+    port = free_port()
+    env = dict(os.environ, INGESTION_MODE='thread', INGESTION_INTERVAL='3600',
+               INGESTION_COLD_WAIT=str(args.cold_wait))
+    env.pop('ARTICLE_STORE_DB', None)
+    env.pop('ARTICLE_STORE_PATH', None)
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port),
+         '--fetch-delay', str(args.fetch_delay), '--workers', str(args.workers)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_ready(port):
+            print(f"{mode}: server did not start")
+            return
+        # The home page is warm before the load starts
+        request(port, 'GET', '/')
+
+        latencies = {}
+        failed = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            jobs = [
+                (kind, pool.submit(request, port, method, path, body, headers))
+                for kind, method, path, body, headers in workload(args.cold, args.warm, token)
+            ]
+            for kind, job in jobs:
+                status, seconds = job.result()
+                if status != 200:
+                    failed += 1
+                latencies.setdefault(kind, []).append(seconds)
+        elapsed = time.perf_counter() - started
+
+        total = sum(len(values) for values in latencies.values())
+        print(f"{mode:5} {total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s), {failed} failed")
+        for kind in ('cold', 'home', 'articles', 'sentiment'):
+            values = latencies.get(kind, [])
+            print(f"      {kind:9} p50 {1000 * percentile(values, 0.5):7.0f} ms   "
+                  f"p95 {1000 * percentile(values, 0.95):7.0f} ms   max {1000 * max(values, default=0):7.0f} ms")
+    finally:
+        server.terminate()
+        server.wait(10)
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test sync vs async serving')
+    parser.add_argument('--cold', type=int, default=20, help='Never-seen searches in the mix')
+    parser.add_argument('--warm', type=int, default=400, help='Requests the store can answer at once')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight')
+    parser.add_argument('--fetch-delay', type=float, default=0.5, help='Seconds one upstream ingestion takes')
+    parser.add_argument('--cold-wait', type=float, default=10, help='INGESTION_COLD_WAIT for the server')
+    parser.add_argument('--workers', type=int, default=1, help='Sync gunicorn workers')
+    parser.add_argument('--modes', default='sync,async', help='Comma-separated serving modes to run')
+    parser.add_argument('--serve', choices=('sync', 'async'), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.fetch_delay, args.workers)
+        return 0
+
+    import jwt
+    token = jwt.encode({'sub': 'load-test', 'exp': time.time() + 3600},
+                       os.environ.get('JWT_SECRET_KEY', 'default-dev-key'), algorithm='HS256')
+    for mode in args.modes.split(','):
+        run_mode(mode.strip(), args, token)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Exact de-duplication for ingested articles
+
+Every article is reduced to two keys: a hash of its normalized title and a
+hash of its canonical URL (with Google News redirect links unwrapped to the
+publisher URL). The DedupeIndex maps those keys to the ID of the article
+that first produced them, so a duplicate entry can be recognised with a
+dictionary lookup before language detection and sentiment ever run.
+
+A link identifies a story for good, but a headline does not: daily titles
+like "Harga Emas Antam Hari Ini" recur with new stories. A title match with
+an article from an earlier run therefore only counts when the two were
+published within DEDUPE_TITLE_WINDOW hours of each other.
+
+The index is shared by all feeds and, when a path is configured, persisted
+to disk so it survives across ingestion runs and restarts.
+
+Article IDs are content-addressed from the same canonical URL, so a story
+keeps its ID (and its /article/<id> link) across refreshes.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, urlunparse
+
+# Most recent keys kept in the index before the oldest are forgotten
+DEDUPE_MAX_KEYS = int(os.environ.get('DEDUPE_MAX_KEYS', 200000))
+
+# Hours apart two articles with the same headline can be published and still be one story
+DEDUPE_TITLE_WINDOW = float(os.environ.get('DEDUPE_TITLE_WINDOW', 12))
+
+# Click-tracking query parameters, which never change which article a URL
+# points to (every utm_* parameter is dropped as well)
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga'
+}
+
+_punctuation = re.compile(r'[^\w\s]', re.UNICODE)
+_whitespace = re.compile(r'\s+')
+
+def normalize_title(title):
+    """Lowercase, strip accents/punctuation and the trailing ' - Source' suffix"""
+    if not isinstance(title, str):
+        title = str(title)
+
+    # Google News titles end with " - Publisher Name"
+    if ' - ' in title:
+        title = title.rsplit(' - ', 1)[0]
+
+    title = unicodedata.normalize('NFKD', title)
+    title = ''.join(c for c in title if not unicodedata.combining(c))
+    title = _punctuation.sub(' ', title.lower())
+    return _whitespace.sub(' ', title).strip()
+
+def unwrap_google_news(link):
+    """Return the publisher URL hidden inside a Google News redirect link"""
+    parsed = urlparse(link)
+    if not parsed.netloc.endswith('news.google.com'):
+        return link
+
+    # Older redirect format: /news/url?...&url=<target>
+    params = parse_qs(parsed.query)
+    if 'url' in params:
+        return params['url'][0]
+
+    # RSS format: /rss/articles/<base64 protobuf carrying the target URL>
+    segment = parsed.path.rstrip('/').split('/')[-1]
+    try:
+        decoded = base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+    except (ValueError, binascii.Error):
+        return link
+
+    start = decoded.find(b'http')
+    if start < 1:
+        return link
+
+    # The byte before the URL is its protobuf length prefix when it fits in one byte
+    length = decoded[start - 1]
+    if length < 0x80 and start + length <= len(decoded):
+        candidate = decoded[start:start + length]
+    else:
+        match = re.match(rb'https?://[\x21-\x7e]+', decoded[start:])
+        candidate = match.group(0) if match else b''
+
+    try:
+        candidate = candidate.decode('ascii')
+    except UnicodeDecodeError:
+        return link
+    return candidate if candidate.startswith(('http://', 'https://')) else link
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+def canonical_url(link):
+    """Normalize a link so trivially different URLs for one article compare equal"""
+    if not link:
+        return ''
+    if not isinstance(link, str):
+        link = str(link)
+
+    parsed = urlparse(unwrap_google_news(link.strip()))
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    if netloc.startswith('m.'):
+        netloc = netloc[2:]
+
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if not is_tracking_param(k)]
+    path = parsed.path.rstrip('/') or '/'
+
+    return urlunparse(('https', netloc, path, '', urlencode(sorted(query)), ''))
+
+def article_id_for(link, source_type='news'):
+    """
+    Stable article ID derived from the canonical link and source type
+    The same story always maps to the same ID, so re-ingestion is an upsert.
+    """
+    digest = hashlib.sha1(f"{source_type}|{canonical_url(link)}".encode('utf-8')).hexdigest()
+    return f"{source_type}_{digest[:16]}"
+
+def published_close(first, second, window=DEDUPE_TITLE_WINDOW):
+    """Whether two publication datetimes are within `window` hours of each other"""
+    try:
+        return abs((first - second).total_seconds()) <= window * 3600
+    except TypeError:
+        # Missing dates, or naive and aware datetimes: not provably the same story
+        return False
+
+def _hash(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:20]
+
+def dedupe_keys(title, link):
+    """Hash keys identifying an article by title and by canonical URL"""
+    keys = []
+    normalized = normalize_title(title)
+    if normalized:
+        keys.append('t:' + _hash(normalized))
+    canonical = canonical_url(link)
+    if canonical:
+        keys.append('u:' + _hash(canonical))
+    return keys
+
+class DedupeIndex:
+    """Bounded key -> article ID index with optional JSON persistence"""
+    def __init__(self, path=None, max_keys=DEDUPE_MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+
+        if self.path:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.keys = OrderedDict(json.load(f))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Error loading dedupe index: {e}")
+
+    def lookup(self, keys):
+        """Return the article ID already registered for any of the keys"""
+        with self.lock:
+            for key in keys:
+                article_id = self.keys.get(key)
+                if article_id is not None:
+                    self.keys.move_to_end(key)
+                    return article_id
+        return None
+
+    def add(self, keys, article_id):
+        """Register an article under all of its keys"""
+        with self.lock:
+            for key in keys:
+                self.keys[key] = article_id
+                self.keys.move_to_end(key)
+            while len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+            self.dirty = True
+
+    def save(self):
+        """Persist the index if it changed since the last save"""
+        if not self.path or not self.dirty:
+            return
+
+        with self.lock:
+            data = json.dumps(list(self.keys.items()))
+            self.dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving dedupe index: {e}")
+
+    def __len__(self):
+        return len(self.keys)
+
+# Index shared by every feed and ingestion run in this process
+dedupe_index = DedupeIndex(os.environ.get('DEDUPE_INDEX_PATH'))
@@ -0,0 +1,338 @@
+"""
+Concurrent RSS feed fetching for MediaMon
+
+This module downloads and parses all planned feeds in parallel on a bounded
+thread pool. Each feed gets its own deadline and the whole batch gets a
+request deadline, so one hanging host can no longer stall a search. Feeds
+that miss their deadline are reported with a status instead of an exception
+and the caller carries on with whatever did arrive.
+
+Downloads go through FeedCache, which keeps feed bodies and their
+ETag/Last-Modified validators on disk and sends conditional requests. A 304
+or a body whose hash has not changed reuses the previously parsed entries
+instead of parsing the feed again.
+
+Requests are sent through the shared keep-alive pool in http_pool.py, so
+feeds on the same host reuse one connection, and the downloaded bytes are
+handed to the parser rather than letting it open its own connection.
+
+Only the first FEED_ENTRY_LIMIT entries of each feed are parsed, with the
+streaming parser in feed_parser.py.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from feed_parser import parse_entries
+from http_pool import http_get, USER_AGENT
+
+# Per-feed deadline in seconds (covers connect, download and parse)
+FEED_TIMEOUT = float(os.environ.get('FEED_TIMEOUT', 8))
+
+# Deadline for the whole fan-out in seconds
+FEED_REQUEST_DEADLINE = float(os.environ.get('FEED_REQUEST_DEADLINE', 12))
+
+# Upper bound on concurrent feed downloads
+FEED_MAX_WORKERS = int(os.environ.get('FEED_MAX_WORKERS', 8))
+
+# Entries kept per feed; the parser stops reading the feed after these
+FEED_ENTRY_LIMIT = int(os.environ.get('FEED_ENTRY_LIMIT', 10))
+
+# Where feed bodies and validators are kept between runs
+FEED_CACHE_DIR = os.environ.get(
+    'FEED_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'mediamon_feed_cache')
+)
+
+# Feeds whose parsed entries are kept in memory (least recently used dropped first)
+FEED_CACHE_MAX_FEEDS = int(os.environ.get('FEED_CACHE_MAX_FEEDS', 200))
+
+# Seconds a feed can go unused before its files are removed from FEED_CACHE_DIR
+FEED_CACHE_MAX_AGE = float(os.environ.get('FEED_CACHE_MAX_AGE', 7 * 24 * 3600))
+
+# Seconds between sweeps of FEED_CACHE_DIR for aged-out feeds
+FEED_CACHE_PRUNE_INTERVAL = float(os.environ.get('FEED_CACHE_PRUNE_INTERVAL', 3600))
+
+# Shared pool so abandoned downloads never block the caller on shutdown
+_executor = ThreadPoolExecutor(max_workers=FEED_MAX_WORKERS, thread_name_prefix='feed-fetch')
+
+class FeedResult:
+    """Outcome of fetching a single feed"""
+    OK = 'ok'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+
+    def __init__(self, url, status, entries=None, error=None, elapsed=0.0, cached=False):
+        self.url = url
+        self.status = status
+        self.entries = entries if entries is not None else []
+        self.error = error
+        self.elapsed = elapsed
+        # True when the entries were reused without parsing the feed again
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.status == self.OK
+
+    def to_dict(self):
+        """Per-feed status without the parsed entries"""
+        return {
+            'url': self.url,
+            'status': self.status,
+            'entries': len(self.entries),
+            'error': self.error,
+            'elapsed': round(self.elapsed, 3),
+            'cached': self.cached
+        }
+
+class FeedCache:
+    """
+    On-disk conditional-GET cache for feed downloads
+    Each feed is stored as <key>.xml (raw body) and <key>.json (validators and
+    body hash). Parsed entries are kept in memory keyed by the body hash so an
+    unchanged feed is parsed at most once per process.
+
+    Both are bounded: only the max_feeds most recently used feeds keep their
+    parsed entries, and feeds not fetched for max_age seconds (every use
+    touches the .json file) are deleted from disk by periodic sweeps.
+    """
+    def __init__(self, cache_dir=None, max_feeds=FEED_CACHE_MAX_FEEDS, max_age=FEED_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir or FEED_CACHE_DIR
+        self.parsed = OrderedDict()  # url -> (content_hash, entries), least recently used first
+        self.max_feeds = max_feeds
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.next_prune = 0.0
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Feed cache directory unavailable: {e}")
+
+    def prune(self, now=None):
+        """Delete the files of feeds unused for max_age seconds; returns how many were removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return removed
+        for name in names:
+            key, _, extension = name.partition('.')
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if extension == 'json' or extension.endswith('tmp'):
+                    if now - os.path.getmtime(path) <= self.max_age:
+                        continue
+                    os.remove(path)
+                    if extension == 'json':
+                        removed += 1
+                elif extension == 'xml' and not os.path.exists(os.path.join(self.cache_dir, f"{key}.json")):
+                    # Body without validators, or whose validators aged out
+                    os.remove(path)
+            except OSError:
+                pass
+        return removed
+
+    def _maybe_prune(self):
+        now = time.time()
+        with self.lock:
+            if now < self.next_prune:
+                return
+            self.next_prune = now + FEED_CACHE_PRUNE_INTERVAL
+        self.prune(now)
+
+    def _touch(self, feed_url):
+        """Mark a feed as used so pruning keeps it"""
+        try:
+            os.utime(self._path(feed_url, 'json'))
+        except OSError:
+            pass
+
+    def _path(self, feed_url, extension):
+        key = hashlib.sha1(feed_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def _load_meta(self, feed_url):
+        try:
+            with open(self._path(feed_url, 'json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _store(self, feed_url, meta, body=None):
+        """Persist validators, plus the body when it changed"""
+        try:
+            if body is not None:
+                self._write_atomic(self._path(feed_url, 'xml'), body)
+            self._write_atomic(self._path(feed_url, 'json'), json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            print(f"Could not write feed cache for {feed_url}: {e}")
+
+    def _entries_for(self, feed_url, content_hash, body=None, headers=None):
+        """Return parsed entries for a body hash, parsing only on a miss"""
+        with self.lock:
+            cached = self.parsed.get(feed_url)
+            if cached:
+                self.parsed.move_to_end(feed_url)
+        if cached and cached[0] == content_hash:
+            return cached[1], True
+
+        if body is None:
+            # Validators survived a restart but the parsed copy did not
+            with open(self._path(feed_url, 'xml'), 'rb') as f:
+                body = f.read()
+        entries = parse_entries(body, limit=FEED_ENTRY_LIMIT, headers=headers)
+        with self.lock:
+            self.parsed[feed_url] = (content_hash, entries)
+            self.parsed.move_to_end(feed_url)
+            while len(self.parsed) > self.max_feeds:
+                self.parsed.popitem(last=False)
+        return entries, False
+
+    def fetch(self, feed_url, timeout):
+        """
+        Fetch a feed with a conditional request
+        Returns (entries, cached) where cached means parsing was skipped.
+        """
+        self._maybe_prune()
+        meta = self._load_meta(feed_url)
+        if not os.path.exists(self._path(feed_url, 'xml')):
+            # Without the stored body a 304 would leave nothing to serve
+            meta = {}
+
+        headers = {'User-Agent': USER_AGENT}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        response = http_get(feed_url, timeout=timeout, headers=headers)
+
+        if response.status_code == 304 and meta.get('content_hash'):
+            # Not a hit if the body had to be re-parsed after a restart
+            entries, cached = self._entries_for(feed_url, meta['content_hash'])
+            self._touch(feed_url)
+            return entries, cached
+
+        response.raise_for_status()
+        body = response.content
+        content_hash = hashlib.sha1(body).hexdigest()
+        entries, cached = self._entries_for(
+            feed_url, content_hash, body=body, headers=dict(response.headers)
+        )
+
+        new_meta = {
+            'url': feed_url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': content_hash,
+            'fetched_at': time.time()
+        }
+        if content_hash != meta.get('content_hash'):
+            self._store(feed_url, new_meta, body=body)
+        elif (new_meta['etag'], new_meta['last_modified']) != (meta.get('etag'), meta.get('last_modified')):
+            # Same body, new validators: only the metadata needs rewriting
+            self._store(feed_url, new_meta)
+        else:
+            self._touch(feed_url)
+
+        return entries, cached
+
+feed_cache = FeedCache()
+
+def _fetch_one(feed_url, timeout, starts=None):
+    """Download and parse a single feed, never raising"""
+    started = time.monotonic()
+    if starts is not None:
+        # The caller times the feed out from here, not from dispatch
+        starts[feed_url] = started
+    try:
+        entries, cached = feed_cache.fetch(feed_url, timeout)
+        return FeedResult(
+            feed_url, FeedResult.OK, entries,
+            elapsed=time.monotonic() - started, cached=cached
+        )
+    except Exception as e:
+        return FeedResult(feed_url, FeedResult.ERROR, error=str(e), elapsed=time.monotonic() - started)
+
+def fetch_feeds(feed_urls, feed_timeout=None, deadline=None):
+    """
+    Fetch and parse feeds concurrently
+    Returns one FeedResult per distinct URL, in the order given. A feed
+    times out feed_timeout seconds after its download starts (feeds queued
+    behind a busy pool are not charged for the wait), and no feed runs past
+    the request deadline, counted from dispatch.
+    """
+    if feed_timeout is None:
+        feed_timeout = FEED_TIMEOUT
+    if deadline is None:
+        deadline = FEED_REQUEST_DEADLINE
+
+    started = time.monotonic()
+    request_deadline = started + deadline
+
+    # Skip duplicate URLs (topic feeds can overlap) while keeping order
+    starts = {}
+    futures = {}
+    for feed_url in dict.fromkeys(feed_urls):
+        futures[feed_url] = _executor.submit(_fetch_one, feed_url, feed_timeout, starts)
+
+    if not futures:
+        return []
+
+    def feed_deadline(feed_url):
+        feed_started = starts.get(feed_url)
+        if feed_started is None:
+            return request_deadline
+        return min(feed_started + feed_timeout, request_deadline)
+
+    timed_out = set()
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        for feed_url in [url for url in pending if feed_deadline(url) <= now]:
+            pending.discard(feed_url)
+            if not futures[feed_url].done():
+                timed_out.add(feed_url)
+        if not pending:
+            break
+        wait(
+            [futures[url] for url in pending],
+            timeout=max(0, min(feed_deadline(url) for url in pending) - now),
+            return_when=FIRST_COMPLETED
+        )
+        pending = {url for url in pending if not futures[url].done()}
+
+    results = []
+    for feed_url, future in futures.items():
+        if feed_url not in timed_out:
+            results.append(future.result())
+        else:
+            future.cancel()
+            feed_started = starts.get(feed_url, started)
+            results.append(FeedResult(
+                feed_url,
+                FeedResult.TIMEOUT,
+                error=f"No response within {feed_deadline(feed_url) - feed_started:.1f}s",
+                elapsed=time.monotonic() - feed_started
+            ))
+
+    return results
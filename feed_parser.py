@@ -0,0 +1,229 @@
+"""
+Streaming RSS 2.0 / Atom parsing for MediaMon
+
+Ingestion keeps only the first few entries of each feed, but feedparser
+parses, sanitizes and date-parses every entry of the document first. This
+module reads the feed with lxml's iterparse instead: entries are built one
+at a time as their closing tag arrives, and parsing stops as soon as
+`limit` entries have been read, so the rest of a large feed is never
+parsed at all:
+
+    entries = parse_entries(body, limit=10)
+
+Entries are feedparser.FeedParserDict objects with the fields the
+normalizers use (title, link, summary, published, published_parsed, id,
+source), so they can be used in place of feedparser's. Summaries are
+sanitized with lxml's HTML cleaner, and RFC 822 and ISO 8601 dates are
+parsed with a regex fast path (feedparser's date parser handles the rest).
+
+Anything other than an RSS 2.0 (or 0.9x) or Atom 1.0 document, or a
+document lxml cannot parse before the first entry, is handed to
+feedparser.parse unchanged.
+"""
+import calendar
+import io
+import re
+import time
+from html import escape
+import feedparser
+import lxml.html
+from feedparser.datetimes import _parse_date
+from lxml import etree
+from lxml.html.clean import Cleaner
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+CONTENT_ENCODED = '{http://purl.org/rss/1.0/modules/content/}encoded'
+
+# Summaries are rendered as HTML on the article page
+_cleaner = Cleaner(
+    scripts=True, javascript=True, comments=True, style=True, inline_style=True,
+    links=True, meta=True, page_structure=True, processing_instructions=True,
+    embedded=True, frames=True, forms=True, annoying_tags=True, safe_attrs_only=True
+)
+
+_MONTHS = {name: i for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1
+)}
+# Offsets in minutes of the zone names seen in feeds (Indonesian feeds use WIB/WITA/WIT)
+_ZONES = {
+    'GMT': 0, 'UT': 0, 'UTC': 0, 'Z': 0,
+    'EST': -300, 'EDT': -240, 'CST': -360, 'CDT': -300,
+    'MST': -420, 'MDT': -360, 'PST': -480, 'PDT': -420,
+    'WIB': 420, 'WITA': 480, 'WIT': 540
+}
+
+_rfc822 = re.compile(
+    r'^\s*(?:[A-Za-z]{3},?\s*)?(\d{1,2})\s+([A-Za-z]{3})[a-z]*\s+(\d{2,4})\s+'
+    r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([+-]\d{4}|[A-Za-z]{1,4})?\s*$'
+)
+_iso8601 = re.compile(
+    r'^\s*(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?)?\s*(Z|[+-]\d{2}:?\d{2})?\s*$'
+)
+
+class UnsupportedFeed(ValueError):
+    """A document that is neither RSS 2.0 nor Atom"""
+
+def _offset(zone):
+    """Minutes east of UTC for '+0700', '+07:00' or a zone name, None if unknown"""
+    if not zone:
+        return 0
+    if zone[0] in '+-':
+        digits = zone[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:4])
+        return -minutes if zone[0] == '-' else minutes
+    return _ZONES.get(zone.upper())
+
+def _utc(year, month, day, hour, minute, second, offset):
+    timestamp = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0)) - offset * 60
+    return time.gmtime(timestamp)
+
+def parse_date(value):
+    """UTC time.struct_time of an RFC 822 or ISO 8601 date, like feedparser's published_parsed"""
+    if not value:
+        return None
+    match = _rfc822.match(value)
+    if match:
+        day, month, year, hour, minute, second, zone = match.groups()
+        month = _MONTHS.get(month.lower())
+        offset = _offset(zone)
+        if month and offset is not None:
+            year = int(year)
+            if year < 100:
+                year += 2000 if year < 50 else 1900
+            try:
+                return _utc(year, month, int(day), int(hour), int(minute), int(second or 0), offset)
+            except (ValueError, OverflowError):
+                pass
+    else:
+        match = _iso8601.match(value)
+        if match:
+            year, month, day, hour, minute, second, zone = match.groups()
+            try:
+                return _utc(int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+                            int(second or 0), _offset(zone))
+            except (ValueError, OverflowError):
+                pass
+    # Anything else goes through feedparser's full set of date handlers
+    return _parse_date(value)
+
+def clean_summary(html):
+    """Sanitized HTML of a summary (plain text is returned as-is)"""
+    if not html or '<' not in html:
+        return html
+    try:
+        fragment = lxml.html.fragment_fromstring(html, create_parent='div')
+        _cleaner(fragment)
+    except (etree.ParserError, ValueError):
+        return ''
+    return escape(fragment.text or '', quote=False) + ''.join(
+        lxml.html.tostring(child, encoding='unicode') for child in fragment
+    )
+
+def _text(element):
+    return (element.text or '').strip() if element is not None else ''
+
+def _rss_entry(item):
+    entry = feedparser.FeedParserDict()
+    title = item.find('title')
+    if title is not None:
+        entry['title'] = _text(title)
+    link = _text(item.find('link'))
+    if link:
+        entry['link'] = link
+    summary = item.find('description')
+    if summary is None:
+        summary = item.find(CONTENT_ENCODED)
+    if summary is not None:
+        entry['summary'] = clean_summary(summary.text or '')
+    published = _text(item.find('pubDate'))
+    if published:
+        entry['published'] = published
+        entry['published_parsed'] = parse_date(published)
+    guid = _text(item.find('guid'))
+    if guid:
+        entry['id'] = guid
+    source = item.find('source')
+    if source is not None:
+        entry['source'] = feedparser.FeedParserDict(href=source.get('url', ''), title=_text(source))
+    return entry
+
+def _atom_entry(item):
+    entry = feedparser.FeedParserDict()
+    title = item.find(ATOM + 'title')
+    if title is not None:
+        # Atom titles may hold (X)HTML; only their text is kept
+        entry['title'] = ''.join(title.itertext()).strip()
+    for link in item.iterfind(ATOM + 'link'):
+        if link.get('rel', 'alternate') == 'alternate' and link.get('href'):
+            entry['link'] = link.get('href')
+            break
+    summary = item.find(ATOM + 'summary')
+    if summary is None:
+        summary = item.find(ATOM + 'content')
+    if summary is not None:
+        if summary.get('type') == 'xhtml':
+            text = ''.join(etree.tostring(child, encoding='unicode') for child in summary)
+        else:
+            text = summary.text or ''
+        entry['summary'] = clean_summary(text)
+    published = _text(item.find(ATOM + 'published')) or _text(item.find(ATOM + 'updated'))
+    if published:
+        entry['published'] = published
+        entry['published_parsed'] = parse_date(published)
+    entry_id = _text(item.find(ATOM + 'id'))
+    if entry_id:
+        entry['id'] = entry_id
+    source = item.find(ATOM + 'source')
+    if source is not None:
+        entry['source'] = feedparser.FeedParserDict(title=_text(source.find(ATOM + 'title')))
+    return entry
+
+def iter_entries(body):
+    """
+    Yield the entries of an RSS 2.0 or Atom document as they are parsed
+    Raises UnsupportedFeed before yielding anything for other documents.
+    """
+    events = etree.iterparse(
+        io.BytesIO(body), events=('start', 'end'),
+        resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False
+    )
+    item_tag = build = None
+    for event, element in events:
+        if item_tag is None:
+            # The first event is the root element's start
+            if element.tag == 'rss':
+                item_tag, build = 'item', _rss_entry
+            elif element.tag == ATOM + 'feed':
+                item_tag, build = ATOM + 'entry', _atom_entry
+            else:
+                raise UnsupportedFeed(f"Unsupported feed root <{element.tag}>")
+            continue
+        if event == 'end' and element.tag == item_tag:
+            yield build(element)
+            # Drop the parsed entry and its predecessors to keep memory flat
+            element.clear()
+            parent = element.getparent()
+            while element.getprevious() is not None:
+                del parent[0]
+
+def parse_entries(body, limit=None, headers=None):
+    """
+    The first `limit` entries of a feed (all of them when limit is None)
+    Falls back to feedparser for feeds the streaming parser does not handle.
+    """
+    entries = []
+    if limit is not None and limit <= 0:
+        return entries
+    try:
+        for entry in iter_entries(body):
+            entries.append(entry)
+            if limit is not None and len(entries) >= limit:
+                break
+        return entries
+    except (etree.XMLSyntaxError, UnsupportedFeed):
+        if entries:
+            # Keep what parsed before a broken tail, as feedparser would
+            return entries
+
+    parsed = feedparser.parse(body, response_headers=headers or {}).entries
+    return parsed[:limit] if limit is not None else parsed
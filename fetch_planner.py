@@ -0,0 +1,97 @@
+"""
+Fetch planning for MediaMon
+
+A FetchQuery says what a caller actually wants from an ingestion run: the
+search, which source types ('news', 'twitter', 'facebook', 'instagram')
+and languages ('id', 'en', 'other') it will keep, and how many results it
+needs. plan() keeps only the connectors that can contribute to it, so
+/api/v1/articles?source=news&language=id never scrapes social media or
+English feeds:
+
+    fetch_query = FetchQuery('politik', sources=['news'], languages=['id'], limit=30)
+    for connector in plan(fetch_query, connectors):
+        records = connector.records()
+
+Connectors run one at a time in the order given, each reading no more
+than the remaining limit ahead. Ingestion stops as soon as `limit`
+matching articles are through the pipeline, and the next connector is
+only started once the earlier ones have been fully processed without
+producing enough.
+
+A filtered query's results are cached under their own tag
+("politik?language=id&source=news"), next to the unfiltered search. The
+limit is not part of the tag: every limit reads the same stored results
+and takes its own slice, and only a query that was never ingested runs a
+limited ingestion.
+"""
+from article_store import query_tag
+
+SOURCE_TYPES = ('news', 'twitter', 'facebook', 'instagram')
+
+class FetchQuery:
+    """Search, source types, languages and result limit of one ingestion run"""
+    __slots__ = ('search_query', 'sources', 'languages', 'limit')
+
+    def __init__(self, search_query=None, sources=None, languages=None, limit=None):
+        self.search_query = search_query or None
+        # None means every source type / language
+        self.sources = frozenset(s for s in sources or () if s) or None
+        self.languages = frozenset(l for l in languages or () if l) or None
+        self.limit = limit
+
+    @classmethod
+    def of(cls, query):
+        """FetchQuery for a plain search string (or None), or the query itself"""
+        return query if isinstance(query, cls) else cls(query)
+
+    @property
+    def tag(self):
+        """Key the results are cached under in the article store"""
+        return query_tag(self.search_query, self.sources, self.languages)
+
+    def to_dict(self):
+        """JSON-serializable form, e.g. to hand the query to the ingestion process"""
+        return {
+            'search_query': self.search_query,
+            'sources': sorted(self.sources) if self.sources else None,
+            'languages': sorted(self.languages) if self.languages else None,
+            'limit': self.limit
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('search_query'), data.get('sources'), data.get('languages'), data.get('limit'))
+
+    def unlimited(self):
+        """The same query without a result limit"""
+        return FetchQuery(self.search_query, self.sources, self.languages) if self.limit else self
+
+    def wants_source(self, source_type):
+        return self.sources is None or source_type in self.sources
+
+    def wants_language(self, languages):
+        """Whether content in any of `languages` (None: unknown) can match"""
+        return self.languages is None or languages is None or not self.languages.isdisjoint(languages)
+
+    def accepts(self, article):
+        """Whether an analyzed article matches the source and language filters"""
+        return self.wants_source(article.type) and (self.languages is None or article.language in self.languages)
+
+    def __repr__(self):
+        return f"FetchQuery({self.tag!r}, limit={self.limit!r})"
+
+class Connector:
+    """One source of records: its type, the languages it yields (None: any) and a records() callable"""
+    __slots__ = ('source_type', 'languages', 'records')
+
+    def __init__(self, source_type, languages, records):
+        self.source_type = source_type
+        self.languages = frozenset(languages) if languages is not None else None
+        self.records = records
+
+def plan(fetch_query, connectors):
+    """The connectors that can contribute to a query, in the given order"""
+    return [
+        connector for connector in connectors
+        if fetch_query.wants_source(connector.source_type) and fetch_query.wants_language(connector.languages)
+    ]
@@ -0,0 +1,27 @@
+"""
+Firestore query behind get_cached_articles
+
+Kept apart from main.py so the query shapes can be checked against
+firestore.indexes.json without Firebase installed (test_firestore_indexes.py).
+Every shape needs a composite index: array_contains on search_queries, an
+equality filter per optional field, then (published, id) newest first.
+"""
+
+# Same value as firestore.Query.DESCENDING
+DESCENDING = 'DESCENDING'
+
+# Optional equality filters, in the order they are applied
+FILTER_FIELDS = ('type', 'language')
+
+def cached_articles_query(articles_ref, search_query=None, source_type=None, language=None):
+    """Filtered, (published, id)-ordered query for one search, before paging"""
+    query = search_query if search_query else 'default'
+    query_ref = articles_ref.where('search_queries', 'array_contains', query)
+    for field, value in zip(FILTER_FIELDS, (source_type, language)):
+        if value:
+            query_ref = query_ref.where(field, '==', value)
+    return (
+        query_ref
+        .order_by('published', direction=DESCENDING)
+        .order_by('id', direction=DESCENDING)
+    )
@@ -2,10 +2,16 @@ import firebase_admin
 from firebase_admin import firestore, initialize_app
 from firebase_functions import https_fn, options
 import feedparser
+import requests
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from textblob import TextBlob
-import uuid
+from textblob.en import sentiment as pattern_sentiment
+import base64
+import hashlib
 import datetime
-from urllib.parse import urlparse, quote
+from urllib.parse import urlparse, quote, parse_qs, parse_qsl, urlencode, urlunparse
 import re
 import json
 from flask import Flask, render_template, request, jsonify
@@ -14,6 +20,8 @@ import tweepy
 from facebook_scraper import get_posts
 import instaloader
 from dotenv import load_dotenv
+from write_buffer import WriteBehindBuffer
+from article_query import cached_articles_query
 
 # Load environment variables
 load_dotenv()
@@ -23,6 +31,9 @@ initialize_app()
 db = firestore.client()
 articles_ref = db.collection('articles')
 
+# Article writes are buffered and committed in batches
+article_writer = WriteBehindBuffer(db)
+
 # Social media API configuration
 class SocialMediaConfig:
     # Twitter API credentials
@@ -102,6 +113,126 @@ def get_sentiment_color(score):
     else:
         return "danger"
 
+# Stable article IDs (mirrors dedupe.py in the Flask app)
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga'
+}
+
+def unwrap_google_news(link):
+    """Return the publisher URL hidden inside a Google News redirect link"""
+    parsed = urlparse(link)
+    if not parsed.netloc.endswith('news.google.com'):
+        return link
+    
+    params = parse_qs(parsed.query)
+    if 'url' in params:
+        return params['url'][0]
+    
+    segment = parsed.path.rstrip('/').split('/')[-1]
+    try:
+        decoded = base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+    except Exception:
+        return link
+    
+    start = decoded.find(b'http')
+    if start < 1 or decoded[start - 1] >= 0x80:
+        return link
+    try:
+        candidate = decoded[start:start + decoded[start - 1]].decode('ascii')
+    except UnicodeDecodeError:
+        return link
+    return candidate if candidate.startswith(('http://', 'https://')) else link
+
+def canonical_url(link):
+    """Normalize a link so trivially different URLs for one article compare equal"""
+    parsed = urlparse(unwrap_google_news(str(link).strip()))
+    netloc = parsed.netloc.lower()
+    for prefix in ('www.', 'm.'):
+        if netloc.startswith(prefix):
+            netloc = netloc[len(prefix):]
+    query = [(k, v) for k, v in parse_qsl(parsed.query)
+             if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS]
+    return urlunparse(('https', netloc, parsed.path.rstrip('/') or '/', '', urlencode(sorted(query)), ''))
+
+def article_id_for(link, source_type='news'):
+    """Stable article ID so re-ingestion upserts the same Firestore document"""
+    digest = hashlib.sha1(f"{source_type}|{canonical_url(link)}".encode('utf-8')).hexdigest()
+    return f"{source_type}_{digest[:16]}"
+
+# Concurrent feed fetching (mirrors feed_fetcher.py in the Flask app)
+FEED_TIMEOUT = float(os.environ.get('FEED_TIMEOUT', 8))
+FEED_REQUEST_DEADLINE = float(os.environ.get('FEED_REQUEST_DEADLINE', 12))
+feed_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('FEED_MAX_WORKERS', 8)))
+
+# Keep-alive connections shared by the feed threads (mirrors http_pool.py)
+feed_adapter = requests.adapters.HTTPAdapter(pool_maxsize=int(os.environ.get('FEED_MAX_WORKERS', 8)))
+feed_sessions = threading.local()
+
+def feed_session():
+    """This thread's session on the shared connection pool"""
+    session = getattr(feed_sessions, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update({'User-Agent': 'MediaMon/1.0', 'Accept-Encoding': 'gzip, deflate'})
+        session.mount('http://', feed_adapter)
+        session.mount('https://', feed_adapter)
+        feed_sessions.session = session
+    return session
+
+def fetch_feed(feed_url, timeout, starts=None):
+    """Download and parse a single feed, returning a status dict"""
+    started = time.monotonic()
+    if starts is not None:
+        starts[feed_url] = started
+    try:
+        response = feed_session().get(feed_url, timeout=(min(3.05, timeout), timeout))
+        response.raise_for_status()
+        feed = feedparser.parse(response.content, response_headers=dict(response.headers))
+        return {'url': feed_url, 'status': 'ok', 'entries': feed.entries, 'elapsed': time.monotonic() - started}
+    except Exception as e:
+        return {'url': feed_url, 'status': 'error', 'entries': [], 'error': str(e), 'elapsed': time.monotonic() - started}
+
+def fetch_feeds(feed_urls, feed_timeout=FEED_TIMEOUT, deadline=FEED_REQUEST_DEADLINE):
+    """
+    Fetch feeds in parallel, returning partial results with a per-feed status
+    Each feed times out feed_timeout after its own start, and none runs past
+    the request deadline.
+    """
+    request_deadline = time.monotonic() + deadline
+    starts = {}
+    futures = {url: feed_executor.submit(fetch_feed, url, feed_timeout, starts) for url in dict.fromkeys(feed_urls)}
+    if not futures:
+        return []
+    
+    def feed_deadline(feed_url):
+        if feed_url not in starts:
+            return request_deadline  # still queued
+        return min(starts[feed_url] + feed_timeout, request_deadline)
+    
+    timed_out = set()
+    pending = set(futures)
+    while pending:
+        now = time.monotonic()
+        for feed_url in [url for url in pending if feed_deadline(url) <= now]:
+            pending.discard(feed_url)
+            if not futures[feed_url].done():
+                timed_out.add(feed_url)
+        if pending:
+            wait([futures[url] for url in pending],
+                 timeout=max(0, min(feed_deadline(url) for url in pending) - now),
+                 return_when=FIRST_COMPLETED)
+            pending = {url for url in pending if not futures[url].done()}
+    
+    results = []
+    for feed_url, future in futures.items():
+        if feed_url not in timed_out:
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append({'url': feed_url, 'status': 'timeout', 'entries': [], 'error': 'Deadline exceeded'})
+    return results
+
 def fetch_twitter_posts(search_query=None, count=10):
     """Fetch tweets related to a search query"""
     if not SocialMediaConfig.TWITTER_ENABLED:
@@ -171,14 +302,15 @@ def fetch_twitter_posts(search_query=None, count=10):
                 'user': tweet.user.screen_name,
                 'profile_image': tweet.user.profile_image_url_https,
                 'type': 'twitter',
-                'search_query': search_query if search_query else 'default',
+                'search_queries': firestore.ArrayUnion([search_query if search_query else 'default']),
                 'created_at': firestore.SERVER_TIMESTAMP
             }
             
-            # Store in Firestore
-            articles_ref.document(article_id).set(article)
+            # Buffer the Firestore write (committed in batches)
+            article_writer.set(articles_ref.document(article_id), article, merge=True)
             twitter_articles.append(article)
             
+        article_writer.flush()
         return twitter_articles
         
     except Exception as e:
@@ -251,18 +383,19 @@ def fetch_facebook_posts(search_query=None, pages=None, count=5):
                         'language': 'id' if is_indonesian else 'en',
                         'user': page,
                         'type': 'facebook',
-                        'search_query': search_query if search_query else 'default',
+                        'search_queries': firestore.ArrayUnion([search_query if search_query else 'default']),
                         'created_at': firestore.SERVER_TIMESTAMP
                     }
                     
-                    # Store in Firestore
-                    articles_ref.document(article_id).set(article)
+                    # Buffer the Firestore write (committed in batches)
+                    article_writer.set(articles_ref.document(article_id), article, merge=True)
                     facebook_articles.append(article)
                     
             except Exception as e:
                 print(f"Error fetching posts from Facebook page {page}: {e}")
                 continue
                 
+        article_writer.flush()
         return facebook_articles
         
     except Exception as e:
@@ -333,12 +466,12 @@ def fetch_instagram_posts(search_query=None, accounts=None, count=5):
                         'language': 'id' if is_indonesian else 'en',
                         'user': post.owner_username,
                         'type': 'instagram',
-                        'search_query': search_query if search_query else 'default',
+                        'search_queries': firestore.ArrayUnion([search_query if search_query else 'default']),
                         'created_at': firestore.SERVER_TIMESTAMP
                     }
                     
-                    # Store in Firestore
-                    articles_ref.document(article_id).set(article)
+                    # Buffer the Firestore write (committed in batches)
+                    article_writer.set(articles_ref.document(article_id), article, merge=True)
                     instagram_articles.append(article)
                     post_count += 1
                     
@@ -389,12 +522,12 @@ def fetch_instagram_posts(search_query=None, accounts=None, count=5):
                             'language': 'id' if is_indonesian else 'en',
                             'user': username,
                             'type': 'instagram',
-                            'search_query': search_query if search_query else 'default',
+                            'search_queries': firestore.ArrayUnion([search_query if search_query else 'default']),
                             'created_at': firestore.SERVER_TIMESTAMP
                         }
                         
-                        # Store in Firestore
-                        articles_ref.document(article_id).set(article)
+                        # Buffer the Firestore write (committed in batches)
+                        article_writer.set(articles_ref.document(article_id), article, merge=True)
                         instagram_articles.append(article)
                         post_count += 1
                         
@@ -402,6 +535,7 @@ def fetch_instagram_posts(search_query=None, accounts=None, count=5):
                     print(f"Error fetching Instagram posts from {username}: {e}")
                     continue
                     
+        article_writer.flush()
         return instagram_articles
         
     except Exception as e:
@@ -414,6 +548,7 @@ def fetch_articles(search_query=None):
     If search_query is provided, search for that topic
     """
     all_articles = []
+    seen_titles = set()
     
     # Default feeds with Indonesian sources
     default_feeds = [
@@ -430,13 +565,6 @@ def fetch_articles(search_query=None):
     # Build list of feeds based on search query
     feeds = []
     if search_query:
-        # Clear existing articles for this query
-        query_articles_ref = articles_ref.where("search_query", "==", search_query)
-        batch = db.batch()
-        for doc in query_articles_ref.stream():
-            batch.delete(doc.reference)
-        batch.commit()
-        
         # Detect if Indonesian query
         is_indonesian_query = contains_indonesian_words(search_query)
         
@@ -475,12 +603,25 @@ def fetch_articles(search_query=None):
     else:
         feeds = default_feeds
     
-    # Process each feed
-    for feed_url in feeds:
+    # Download and parse all feeds concurrently, then process what arrived
+    for feed_result in fetch_feeds(feeds):
+        feed_url = feed_result['url']
+        if feed_result['status'] != 'ok':
+            print(f"Error fetching from {feed_url}: {feed_result['status']} ({feed_result.get('error')})")
+            continue
+        
         try:
-            feed = feedparser.parse(feed_url)
+            entries = feed_result['entries'][:10]
+            
+            # Stored copies of these entries, fetched in one round-trip
+            entry_ids = {article_id_for(getattr(entry, 'link', feed_url)) for entry in entries}
+            existing_docs = {}
+            if entry_ids:
+                for doc in db.get_all([articles_ref.document(i) for i in entry_ids]):
+                    if doc.exists:
+                        existing_docs[doc.id] = doc.to_dict()
             
-            for entry in feed.entries[:10]:
+            for entry in entries:
                 try:
                     # Ensure we have a title
                     if not hasattr(entry, 'title'):
@@ -491,12 +632,42 @@ def fetch_articles(search_query=None):
                     if not isinstance(title, str):
                         title = str(title)
                     
-                    # Skip duplicates
-                    if any(a.get('title') == title for a in all_articles):
+                    # Skip duplicates (set lookup instead of scanning the batch)
+                    title_key = ' '.join(title.lower().split())
+                    if title_key in seen_titles:
                         continue
+                    seen_titles.add(title_key)
+                    
+                    # Stable ID derived from the canonical link
+                    link = getattr(entry, 'link', feed_url)
+                    if not isinstance(link, str):
+                        link = str(link)
+                    article_id = article_id_for(link)
                     
-                    # Generate a unique ID
-                    article_id = str(uuid.uuid4())
+                    # Unchanged articles skip re-processing entirely
+                    existing = existing_docs.get(article_id)
+                    if existing is not None and existing.get('title') == title:
+                        query_tag = search_query if search_query else 'default'
+                        # Add this query to the article's tags, keeping the other queries
+                        # that found it; documents written before 'type' and
+                        # 'search_queries' were stored get them on their next refresh
+                        tags = existing.get('search_queries') or []
+                        if query_tag not in tags or 'type' not in existing:
+                            legacy = [existing['search_query']] if existing.get('search_query') else []
+                            article_writer.set(
+                                articles_ref.document(article_id),
+                                {
+                                    'search_queries': firestore.ArrayUnion(legacy + [query_tag]),
+                                    'search_query': firestore.DELETE_FIELD,
+                                    'type': 'news'
+                                },
+                                merge=True
+                            )
+                            existing['search_queries'] = list(dict.fromkeys(tags + legacy + [query_tag]))
+                            existing.pop('search_query', None)
+                            existing['type'] = 'news'
+                        all_articles.append(existing)
+                        continue
                     
                     # Process publication date
                     pub_date = entry.get('published_parsed', None)
@@ -518,10 +689,6 @@ def fetch_articles(search_query=None):
                         sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
                     
                     # Extract source
-                    link = getattr(entry, 'link', feed_url)
-                    if not isinstance(link, str):
-                        link = str(link)
-                    
                     source_url = link
                     source = urlparse(source_url).netloc.replace('www.', '').split('.')[0].capitalize()
                     
@@ -566,12 +733,13 @@ def fetch_articles(search_query=None):
                         'sentiment_label': sentiment_label,
                         'sentiment_color': get_sentiment_color(sentiment_score),
                         'language': language,
-                        'search_query': search_query if search_query else 'default',
+                        'type': 'news',  # stored so type filters run in Firestore
+                        'search_queries': firestore.ArrayUnion([search_query if search_query else 'default']),
                         'created_at': firestore.SERVER_TIMESTAMP
                     }
                     
-                    # Store in Firestore
-                    articles_ref.document(article_id).set(article)
+                    # Upsert in Firestore (same ID on every refresh), batched
+                    article_writer.set(articles_ref.document(article_id), article, merge=True)
                     
                     # Add to result list (with timestamp for sorting)
                     all_articles.append(article)
@@ -581,7 +749,7 @@ def fetch_articles(search_query=None):
                     continue
                     
         except Exception as e:
-            print(f"Error fetching from {feed_url}: {e}")
+            print(f"Error processing feed {feed_url}: {e}")
     
     # Add social media content
     try:
@@ -599,6 +767,9 @@ def fetch_articles(search_query=None):
     except Exception as e:
         print(f"Error fetching social media content: {e}")
     
+    # Commit whatever is still buffered before returning
+    article_writer.flush()
+    
     return sorted(all_articles, key=lambda x: x.get('published'), reverse=True)
 
 def get_article(article_id):
@@ -608,20 +779,40 @@ def get_article(article_id):
         return doc.to_dict()
     return None
 
-def get_cached_articles(search_query=None):
-    """Get cached articles from Firestore"""
-    query = search_query if search_query else 'default'
-    query_ref = articles_ref.where('search_query', '==', query).limit(30)
-    
-    articles = []
-    for doc in query_ref.stream():
-        article = doc.to_dict()
-        articles.append(article)
+def encode_cursor(article):
+    """Opaque cursor pointing just past an article in (published, id) order (mirrors article_store.py)"""
+    raw = json.dumps([article.get('published') or '', article.get('id')], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(published, article ID) of a cursor; ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        published, article_id = json.loads(raw.decode('utf-8'))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(published, str) or not isinstance(article_id, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return published, article_id
+
+def get_cached_articles(search_query=None, source_type=None, language=None, after=None, limit=30):
+    """
+    One page of cached articles, newest first, and the cursor of the next page
+    Filtering and (published, id) ordering both run in Firestore, served by
+    the composite indexes in firestore.indexes.json, so a page holds exactly
+    `limit` matches (fewer only on the last page) for limit + 1 document reads.
+    """
+    query_ref = cached_articles_query(articles_ref, search_query, source_type, language)
+    if after:
+        query_ref = query_ref.start_after({'published': after[0], 'id': after[1]})
     
-    return sorted(articles, key=lambda x: x.get('published'), reverse=True)
+    articles = [doc.to_dict() for doc in query_ref.limit(limit + 1).stream()]
+    if len(articles) > limit:
+        return articles[:limit], encode_cursor(articles[limit - 1])
+    return articles, None
 
 # API helper functions
-def api_response(data=None, message=None, status="success", code=200):
+def api_response(data=None, message=None, status="success", code=200, meta=None):
     """Generate standardized API response"""
     response = {
         'status': status,
@@ -633,6 +824,10 @@ def api_response(data=None, message=None, status="success", code=200):
         
     if data is not None:
         response['data'] = data
+    
+    # Extra top-level fields, e.g. pagination cursors
+    if meta:
+        response.update(meta)
         
     return https_fn.Response(json.dumps(response), status=code, mimetype='application/json')
 
@@ -686,28 +881,28 @@ def token_auth_required(func):
 @https_fn.on_request(cors=options.CorsOptions(cors_origins=["*"], cors_methods=["GET"]))
 @token_auth_required
 def api_articles(req: https_fn.Request) -> https_fn.Response:
-    """API endpoint for articles with filtering"""
+    """
+    API endpoint for articles with filtering, one page at a time
+    Pages are ordered by (published, id), newest first; pass the returned
+    next_cursor as ?cursor= to get the following page.
+    """
     search_query = req.args.get('query', None)
     source_type = req.args.get('source', None)
     language = req.args.get('language', None)
     limit = min(int(req.args.get('limit', 30)), 100) if req.args.get('limit') else 30
+    cursor = req.args.get('cursor', None)
     
-    # Get articles from cache or fetch new ones
-    articles = get_cached_articles(search_query)
-    
-    # Apply filters
-    if source_type:
-        articles = [a for a in articles if a.get('type', 'news') == source_type]
-    
-    if language:
-        articles = [a for a in articles if a.get('language') == language]
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return api_response(message="Invalid cursor", status="error", code=400)
     
-    # Apply limit
-    articles = articles[:limit]
+    articles, next_cursor = get_cached_articles(search_query, source_type, language, after, limit)
     
     return api_response(
         data=articles,
-        message=f"Retrieved {len(articles)} articles"
+        message=f"Retrieved {len(articles)} articles",
+        meta={'next_cursor': next_cursor}
     )
 
 @https_fn.on_request(cors=options.CorsOptions(cors_origins=["*"], cors_methods=["GET"]))
@@ -753,3 +948,99 @@ def api_sentiment(req: https_fn.Request) -> https_fn.Response:
     }
     
     return api_response(data=result, message="Sentiment analysis completed")
+
+# Texts scored per batch by api_sentiment_bulk (mirrors /api/v1/sentiment/bulk)
+SENTIMENT_BULK_BATCH = int(os.environ.get('SENTIMENT_BULK_BATCH', 500))
+
+def analyze_sentiment_batch(texts):
+    """
+    Polarity for a list of texts in one call
+    Runs TextBlob's pattern analyzer directly, without building a blob per
+    text, and scores each distinct text once.
+    """
+    try:
+        polarity = {text: pattern_sentiment(text)[0] for text in dict.fromkeys(texts) if text}
+    except Exception as e:
+        print(f"Error analyzing sentiment: {e}")
+        return [0.0] * len(texts)
+    return [polarity.get(text, 0.0) for text in texts]
+
+def bulk_sentiment_lines(items):
+    """Score (id, text, extra fields) items in batches, yielding one NDJSON chunk per batch"""
+    def score(batch):
+        texts = [text if isinstance(text, str) else '' for _, text, _ in batch]
+        scores = analyze_sentiment_batch(texts)
+        
+        lines = []
+        for (item_id, _, extra), text, sentiment_score in zip(batch, texts, scores):
+            if not text:
+                lines.append(json.dumps(dict({'id': item_id, 'error': 'No text provided'}, **extra)) + '\n')
+                continue
+            
+            is_indonesian = contains_indonesian_words(text)
+            sentiment_label = "Positif" if sentiment_score > 0 else "Negatif" if sentiment_score < 0 else "Netral"
+            if not is_indonesian:
+                sentiment_label = "Positive" if sentiment_score > 0 else "Negative" if sentiment_score < 0 else "Neutral"
+            
+            lines.append(json.dumps(dict({
+                'id': item_id,
+                'text': text,
+                'language': 'id' if is_indonesian else 'en',
+                'sentiment_score': round(sentiment_score, 2),
+                'sentiment_label': sentiment_label,
+                'sentiment_color': get_sentiment_color(sentiment_score)
+            }, **extra)) + '\n')
+        return ''.join(lines)
+    
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= SENTIMENT_BULK_BATCH:
+            yield score(batch)
+            batch = []
+    if batch:
+        yield score(batch)
+
+def bulk_item(item, index, position='index'):
+    """
+    (id, text, extra fields) from a bulk item: a string or {"id": ..., "text": ...}
+    Plain strings are identified by their index. Objects without an id get a
+    null id plus their position, so they never collide with an explicit id.
+    """
+    if isinstance(item, dict):
+        if 'id' in item:
+            return item['id'], item.get('text'), {}
+        return None, item.get('text'), {position: index}
+    return index, item, {}
+
+def bulk_ndjson_items(stream):
+    """Yield (id, text, extra fields) from an NDJSON upload, one object per line"""
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None, None, {'line': index}
+            continue
+        yield bulk_item(item, index, 'line')
+
+@https_fn.on_request(cors=options.CorsOptions(cors_origins=["*"], cors_methods=["POST"]))
+@token_auth_required
+def api_sentiment_bulk(req: https_fn.Request) -> https_fn.Response:
+    """API endpoint to analyze sentiment of many texts, streamed back as NDJSON"""
+    if req.mimetype == 'application/x-ndjson':
+        items = bulk_ndjson_items(req.stream)
+    else:
+        try:
+            payload = json.loads(req.data)
+        except:
+            return api_response(message="Invalid request format", status="error", code=400)
+        if isinstance(payload, dict):
+            payload = payload.get('texts')
+        if not isinstance(payload, list):
+            return api_response(message="Expected a JSON array of texts or an NDJSON upload", status="error", code=400)
+        items = (bulk_item(item, index) for index, item in enumerate(payload))
+    
+    return https_fn.Response(bulk_sentiment_lines(items), mimetype='application/x-ndjson')
@@ -0,0 +1,83 @@
+"""
+Checks that firestore.indexes.json covers every query get_cached_articles builds
+
+A recording stand-in for the articles collection captures each query shape
+(filters and orderings) for every combination of the optional filters, and
+each shape must match one composite index exactly. The emulator does not
+enforce composite indexes, so this runs offline instead.
+
+    python -m pytest functions/test_firestore_indexes.py
+"""
+import itertools
+import json
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from article_query import FILTER_FIELDS, cached_articles_query
+
+INDEXES_PATH = os.path.join(HERE, os.pardir, 'firestore.indexes.json')
+
+class RecordingQuery:
+    """Remembers the where() and order_by() calls made on it"""
+    def __init__(self, filters=(), orders=()):
+        self.filters = filters
+        self.orders = orders
+
+    def where(self, field, op, value):
+        return RecordingQuery(self.filters + ((field, op),), self.orders)
+
+    def order_by(self, field, direction='ASCENDING'):
+        return RecordingQuery(self.filters, self.orders + ((field, direction),))
+
+def index_fields(query):
+    """
+    The composite index a query needs: its filtered fields in any order,
+    then its orderings exactly
+    """
+    filtered = frozenset(
+        (field, 'CONTAINS' if op == 'array_contains' else 'ASCENDING')
+        for field, op in query.filters
+    )
+    return filtered, query.orders
+
+def defined_indexes(path=INDEXES_PATH):
+    """Field lists of the collection indexes on articles"""
+    with open(path) as f:
+        indexes = json.load(f)['indexes']
+    return [
+        [(field['fieldPath'], field.get('arrayConfig') or field['order']) for field in index['fields']]
+        for index in indexes
+        if index['collectionGroup'] == 'articles' and index['queryScope'] == 'COLLECTION'
+    ]
+
+def serves(fields, query):
+    filtered, orders = index_fields(query)
+    split = len(fields) - len(orders)
+    return tuple(fields[split:]) == orders and frozenset(fields[:split]) == filtered
+
+def query_shapes():
+    """Every query get_cached_articles can build, one per filter combination"""
+    return [
+        cached_articles_query(RecordingQuery(), 'banjir', *values)
+        for values in itertools.product((None, 'x'), repeat=len(FILTER_FIELDS))
+    ]
+
+class FirestoreIndexesTest(unittest.TestCase):
+    def test_every_query_shape_has_an_index(self):
+        defined = defined_indexes()
+        for query in query_shapes():
+            with self.subTest(filters=query.filters):
+                self.assertTrue(any(serves(fields, query) for fields in defined))
+
+    def test_every_index_serves_a_query(self):
+        queries = query_shapes()
+        for fields in defined_indexes():
+            with self.subTest(fields=fields):
+                self.assertTrue(any(serves(fields, query) for query in queries))
+
+if __name__ == '__main__':
+    unittest.main()
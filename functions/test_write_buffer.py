@@ -0,0 +1,155 @@
+"""
+Offline checks for the Firestore write-behind buffer
+
+A fake client stands in for Firestore: db.batch() returns batches that
+record their set() calls and commit into the fake, optionally failing.
+The emulator check is skipped unless FIRESTORE_EMULATOR_HOST is set.
+
+    python -m pytest functions/test_write_buffer.py
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m pytest functions/test_write_buffer.py
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import write_buffer
+from write_buffer import MAX_BATCH_OPS, WriteBehindBuffer
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, doc_ref, data, merge=False):
+        self.ops.append((doc_ref, data, merge))
+
+    def commit(self):
+        index = len(self.db.attempts)
+        self.db.attempts.append(len(self.ops))
+        if index in self.db.fail_commits:
+            raise RuntimeError('commit failed')
+        self.db.committed.append(self.ops)
+
+class FakeDB:
+    def __init__(self, fail_commits=()):
+        self.attempts = []     # ops per commit attempt
+        self.committed = []    # ops of each successful commit
+        self.fail_commits = set(fail_commits)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def written(self):
+        return [doc_ref for ops in self.committed for doc_ref, _, _ in ops]
+
+class WriteBehindBufferTest(unittest.TestCase):
+    def test_flush_splits_into_batches_of_at_most_500(self):
+        db = FakeDB()
+        buffer = WriteBehindBuffer(db, max_age=3600)
+        buffer.max_size = 10 ** 6  # let more than one batch accumulate
+        for i in range(1200):
+            buffer.set(f"doc{i}", {'i': i})
+        buffer.flush()
+        self.assertEqual(db.attempts, [MAX_BATCH_OPS, MAX_BATCH_OPS, 200])
+        self.assertEqual(db.written(), [f"doc{i}" for i in range(1200)])
+        self.assertEqual((buffer.commits, buffer.writes, len(buffer)), (3, 1200, 0))
+
+    def test_max_size_is_capped_at_the_batch_limit(self):
+        self.assertEqual(WriteBehindBuffer(FakeDB(), max_size=2000).max_size, MAX_BATCH_OPS)
+
+    def test_flushes_when_size_limit_is_reached(self):
+        db = FakeDB()
+        buffer = WriteBehindBuffer(db, max_size=3, max_age=3600)
+        buffer.set('a', {})
+        buffer.set('b', {})
+        self.assertEqual(db.attempts, [])
+        buffer.set('c', {}, merge=True)
+        self.assertEqual(db.committed, [[('a', {}, False), ('b', {}, False), ('c', {}, True)]])
+        self.assertEqual(len(buffer), 0)
+
+    def test_flushes_when_oldest_write_is_too_old(self):
+        db = FakeDB()
+        buffer = WriteBehindBuffer(db, max_size=100, max_age=2.0)
+        with mock.patch.object(write_buffer.time, 'monotonic', return_value=100.0):
+            buffer.set('a', {})
+        with mock.patch.object(write_buffer.time, 'monotonic', return_value=101.0):
+            buffer.set('b', {})
+        self.assertEqual(db.attempts, [])
+        with mock.patch.object(write_buffer.time, 'monotonic', return_value=102.5):
+            buffer.set('c', {})
+        self.assertEqual(db.written(), ['a', 'b', 'c'])
+
+    def test_idle_buffer_does_not_flush_by_itself(self):
+        db = FakeDB()
+        buffer = WriteBehindBuffer(db, max_size=100, max_age=2.0)
+        with mock.patch.object(write_buffer.time, 'monotonic', return_value=100.0):
+            buffer.set('a', {})
+        # Long past max_age, but no set() arrives to notice it
+        with mock.patch.object(write_buffer.time, 'monotonic', return_value=10 ** 6):
+            self.assertEqual((db.attempts, len(buffer)), ([], 1))
+            buffer.flush()
+        self.assertEqual(db.written(), ['a'])
+
+    def test_flushes_on_exit(self):
+        db = FakeDB()
+        with WriteBehindBuffer(db, max_size=100, max_age=3600) as buffer:
+            buffer.set('a', {})
+            buffer.set('b', {})
+            self.assertEqual(db.attempts, [])
+        self.assertEqual(db.written(), ['a', 'b'])
+
+    def test_failed_commit_is_retried(self):
+        db = FakeDB(fail_commits={1})
+        buffer = WriteBehindBuffer(db, max_age=3600, retry_delay=0)
+        buffer.max_size = 10 ** 6
+        for i in range(1200):
+            buffer.set(f"doc{i}", {})
+        with mock.patch('builtins.print'):
+            pending = buffer.flush()
+        # The second batch fails once and succeeds on its retry
+        self.assertEqual(db.attempts, [MAX_BATCH_OPS, MAX_BATCH_OPS, MAX_BATCH_OPS, 200])
+        self.assertEqual(sorted(db.written()), sorted(f"doc{i}" for i in range(1200)))
+        self.assertEqual((pending, buffer.commits, buffer.writes, buffer.failures), (0, 3, 1200, 1))
+
+    def test_retries_back_off(self):
+        db = FakeDB(fail_commits={0, 1})
+        buffer = WriteBehindBuffer(db, max_age=3600, retries=2, retry_delay=0.5)
+        buffer.set('a', {})
+        with mock.patch('builtins.print'), mock.patch.object(write_buffer.time, 'sleep') as sleep:
+            buffer.flush()
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(db.written(), ['a'])
+
+    def test_batch_that_keeps_failing_is_kept_for_next_flush(self):
+        db = FakeDB(fail_commits={0, 1, 2})
+        buffer = WriteBehindBuffer(db, max_age=3600, retries=2, retry_delay=0)
+        buffer.set('a', {})
+        buffer.set('b', {})
+        with mock.patch('builtins.print'):
+            pending = buffer.flush()
+        self.assertEqual((pending, len(buffer), db.written()), (2, 2, []))
+        buffer.set('c', {})
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(db.written(), ['a', 'b', 'c'])
+        self.assertEqual((buffer.commits, buffer.writes, buffer.failures), (1, 3, 3))
+
+@unittest.skipUnless(os.environ.get('FIRESTORE_EMULATOR_HOST'), 'needs the Firestore emulator')
+class WriteBehindBufferEmulatorTest(unittest.TestCase):
+    """Runs the buffer against a real client talking to the emulator"""
+    def test_writes_reach_firestore(self):
+        from google.cloud import firestore
+        db = firestore.Client(project=os.environ.get('GCLOUD_PROJECT', 'demo-media-monitoring'))
+        collection = db.collection('write_buffer_test')
+        with WriteBehindBuffer(db, max_age=3600) as buffer:
+            for i in range(MAX_BATCH_OPS + 20):
+                buffer.set(collection.document(f"doc{i}"), {'i': i})
+        self.assertEqual((buffer.commits, buffer.writes), (2, MAX_BATCH_OPS + 20))
+        self.assertEqual(collection.document('doc510').get().to_dict(), {'i': 510})
+        for doc in collection.list_documents():
+            doc.delete()
+
+if __name__ == '__main__':
+    unittest.main()
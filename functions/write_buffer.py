@@ -0,0 +1,99 @@
+"""
+Write-behind buffer for Firestore
+
+Collects document writes and commits them as batched writes instead of one
+round-trip per document. A flush happens when the buffer reaches its size
+limit, when the oldest buffered write is older than max_age seconds (checked
+as writes arrive), and when the caller is done (flush() or leaving a `with`
+block). Batches never exceed Firestore's 500-operation limit.
+
+The age limit is only checked inside set(): an idle buffer never flushes by
+itself, so callers must flush() (or use a `with` block) when they are done.
+
+A batch whose commit fails is retried with exponential backoff. If it still
+fails, its writes go back to the front of the buffer for the next flush, and
+flush() returns how many writes are still waiting, so callers can tell that
+nothing was lost but something is still pending.
+
+The buffer only needs a Firestore client. test_write_buffer.py has a check
+that runs it against the emulator when FIRESTORE_EMULATOR_HOST is set.
+"""
+import threading
+import time
+
+# Firestore rejects batched writes with more than 500 operations
+MAX_BATCH_OPS = 500
+
+class WriteBehindBuffer:
+    """Accumulates Firestore set() calls and commits them in batches"""
+    def __init__(self, db, max_size=MAX_BATCH_OPS, max_age=2.0, retries=2, retry_delay=0.5):
+        self.db = db
+        self.max_size = min(max_size, MAX_BATCH_OPS)
+        self.max_age = max_age
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.ops = []  # (document reference, data, merge)
+        self.oldest = None
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.writes = 0
+        self.failures = 0
+
+    def set(self, doc_ref, data, merge=False):
+        """Buffer a document write, flushing if a size or time limit is hit"""
+        with self.lock:
+            if not self.ops:
+                self.oldest = time.monotonic()
+            self.ops.append((doc_ref, data, merge))
+            due = len(self.ops) >= self.max_size or time.monotonic() - self.oldest >= self.max_age
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Commit everything buffered so far, returning how many writes are still pending"""
+        with self.lock:
+            ops, self.ops = self.ops, []
+            self.oldest = None
+
+        pending = []
+        for start in range(0, len(ops), MAX_BATCH_OPS):
+            chunk = ops[start:start + MAX_BATCH_OPS]
+            if not self._commit(chunk):
+                pending.extend(chunk)
+
+        if pending:
+            # Put failed writes back ahead of anything buffered meanwhile
+            with self.lock:
+                self.ops = pending + self.ops
+                self.oldest = time.monotonic()
+            print(f"Kept {len(pending)} buffered writes for the next flush")
+        return len(pending)
+
+    def _commit(self, chunk):
+        """Commit one batch, retrying with backoff; False if every attempt failed"""
+        for attempt in range(self.retries + 1):
+            batch = self.db.batch()
+            for doc_ref, data, merge in chunk:
+                batch.set(doc_ref, data, merge=merge)
+            try:
+                batch.commit()
+                self.commits += 1
+                self.writes += len(chunk)
+                return True
+            except Exception as e:
+                self.failures += 1
+                print(f"Error committing {len(chunk)} buffered writes (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        return False
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
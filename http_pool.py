@@ -0,0 +1,167 @@
+"""
+Pooled HTTP session for MediaMon feed downloads
+
+Every feed download goes through one process-wide connection pool, so
+repeated fetches from news.google.com or kompas.com reuse an open
+keep-alive connection instead of paying DNS, TCP and TLS again:
+
+    response = http_get(feed_url, timeout=8, headers={'If-None-Match': etag})
+    entries = feedparser.parse(response.content, response_headers=dict(response.headers))
+
+Each thread gets its own requests.Session (sessions are not thread-safe),
+but all of them share the same HTTPAdapter and therefore the same urllib3
+pools. A host keeps up to HTTP_POOL_MAXSIZE idle connections; busier hosts
+can be given their own size with HTTP_POOL_HOSTS
+("news.google.com=16,www.kompas.com=4"). Responses are requested gzip or
+deflate compressed, and brotli as well when the brotli package is
+installed.
+
+pool_stats() reports, per host, how many requests were sent and how many
+new connections that took; the difference is the number of reused ones.
+CountingAdapter keeps those counts as requests go out, so they survive pools
+the adapter drops.
+"""
+import os
+import threading
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode br responses)
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# Seconds allowed to open a connection; the read timeout is the caller's
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+
+# Hosts whose pools are kept open at once
+HTTP_POOL_HOSTS_MAX = int(os.environ.get('HTTP_POOL_HOSTS_MAX', 32))
+
+# Idle keep-alive connections kept per host
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', os.environ.get('FEED_MAX_WORKERS', 8)))
+
+# Per-host overrides of HTTP_POOL_MAXSIZE, e.g. "news.google.com=16,www.kompas.com=4"
+HTTP_POOL_HOSTS = os.environ.get('HTTP_POOL_HOSTS', '')
+
+USER_AGENT = 'MediaMon/1.0 (+https://github.com/Farrrrrrrrrr/media-monitoring-py)'
+
+def parse_pool_hosts(value):
+    """{host: pool size} from "host=size,host=size" """
+    sizes = {}
+    for item in value.split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size.strip().isdigit():
+            sizes[host.strip().lower()] = int(size)
+    return sizes
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and new connections per host"""
+    def __init__(self, *args, **kwargs):
+        self.counts = {}  # host -> {'requests', 'connections'}
+        self.counts_lock = threading.Lock()
+        self.pool_local = threading.local()
+        # Connections each pool had opened when last counted
+        self.opened = weakref.WeakKeyDictionary()
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, url, proxies=None):
+        pool = super().get_connection(url, proxies)
+        self.pool_local.pool = pool
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        # Used instead of get_connection from requests 2.32 on
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        self.pool_local.pool = pool
+        return pool
+
+    def send(self, request, **kwargs):
+        self.pool_local.pool = None
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            pool = self.pool_local.pool
+            if pool is not None:
+                self._count(pool)
+
+    def _count(self, pool):
+        with self.counts_lock:
+            counts = self.counts.setdefault(pool.host, {'requests': 0, 'connections': 0})
+            counts['requests'] += 1
+            opened = pool.num_connections
+            counts['connections'] += opened - self.opened.get(pool, 0)
+            self.opened[pool] = opened
+
+    def stats(self):
+        with self.counts_lock:
+            return {host: dict(counts) for host, counts in self.counts.items()}
+
+class HTTPPool:
+    """Keep-alive connection pools shared by the sessions of every thread"""
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, host_sizes=None,
+                 pool_connections=HTTP_POOL_HOSTS_MAX, connect_timeout=HTTP_CONNECT_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        self.adapter = CountingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        # Hosts with their own pool size get their own adapter
+        self.host_adapters = {
+            host: CountingAdapter(pool_connections=1, pool_maxsize=size)
+            for host, size in (host_sizes or {}).items()
+        }
+        self.local = threading.local()
+
+    def session(self):
+        """This thread's session, mounted on the shared adapters"""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            for host, adapter in self.host_adapters.items():
+                session.mount(f"http://{host}/", adapter)
+                session.mount(f"https://{host}/", adapter)
+            self.local.session = session
+        return session
+
+    def timeout(self, timeout):
+        """(connect, read) timeout for a caller's overall timeout"""
+        if timeout is None:
+            return (self.connect_timeout, None)
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def get(self, url, timeout=None, headers=None):
+        return self.session().get(url, timeout=self.timeout(timeout), headers=headers)
+
+    def stats(self):
+        """{host: {'requests', 'connections', 'reused'}} since start"""
+        hosts = {}
+        for adapter in (self.adapter, *self.host_adapters.values()):
+            for host, counts in adapter.stats().items():
+                total = hosts.setdefault(host, {'requests': 0, 'connections': 0})
+                total['requests'] += counts['requests']
+                total['connections'] += counts['connections']
+        for counts in hosts.values():
+            counts['reused'] = max(counts['requests'] - counts['connections'], 0)
+        return hosts
+
+# Pool shared by every feed download in this process
+http_pool = HTTPPool(host_sizes=parse_pool_hosts(HTTP_POOL_HOSTS))
+
+def http_get(url, timeout=None, headers=None):
+    """GET through the shared keep-alive pool"""
+    return http_pool.get(url, timeout=timeout, headers=headers)
+
+def pool_stats():
+    """Per-host request and connection counts plus totals"""
+    hosts = http_pool.stats()
+    requests_sent = sum(counts['requests'] for counts in hosts.values())
+    connections = sum(counts['connections'] for counts in hosts.values())
+    return {
+        'requests': requests_sent,
+        'connections': connections,
+        'reused': max(requests_sent - connections, 0),
+        'accept_encoding': ACCEPT_ENCODING,
+        'hosts': hosts
+    }
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+Background ingestion for MediaMon
+
+Polls the configured RSS feeds and social media connectors on a schedule
+and writes the results into the shared article store, so the Flask views
+and the API only ever read from the store instead of scraping inside the
+HTTP request.
+
+The home page feeds and INGESTION_QUERIES are polled every interval. Other
+searches are answered from the local full-text index when the stored
+articles already hold SEARCH_MIN_RESULTS matches; colder searches are
+served from the store's per-query result cache: a fresh entry
+is returned as-is, a stale one (older than QUERY_CACHE_TTL) is returned
+immediately while a single background refresh runs, and only a query that
+was never seen waits for its first ingestion.
+
+The worker runs either as a thread inside the web process (started by
+main.py when INGESTION_MODE=thread) or as its own process:
+
+    ARTICLE_STORE_DB=/tmp/mediamon_articles.db python ingestion.py
+
+In process mode the web workers should run with INGESTION_MODE=process and
+the same ARTICLE_STORE_DB (or ARTICLE_STORE_PATH for a pickle snapshot) so
+they read what the worker writes. Searches the web workers need ingested
+are queued in the SQLite database, and the ingestion process picks them up
+every INGESTION_REQUEST_POLL seconds; a pickle snapshot cannot carry them,
+so there only INGESTION_QUERIES are ever ingested.
+
+When the store is shared on disk, only one process polls the monitored
+queries: each worker takes an exclusive lock on INGESTION_LOCK_PATH before
+polling, and the others keep retrying it at every interval, taking over if
+the holder exits. Every process still refreshes the searches its own
+readers are waiting on.
+
+Under the async server (asgi.py) the cold wait is awaited with
+read_articles_async instead of blocking a thread, so a waiting request
+costs a coroutine rather than a worker.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows: every worker polls
+    fcntl = None
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from article_store import articles, query_tag
+from search_index import SEARCH_MIN_RESULTS
+from fetch_planner import FetchQuery
+
+# 'thread' runs the worker inside the web process, 'process' expects a
+# separate `python ingestion.py`, 'off' disables ingestion entirely
+INGESTION_MODE = os.environ.get('INGESTION_MODE', 'thread')
+
+# Seconds between full polls of the monitored queries
+INGESTION_INTERVAL = float(os.environ.get('INGESTION_INTERVAL', 300))
+
+# How long a view waits for the first ingestion of a query it has never seen
+INGESTION_COLD_WAIT = float(os.environ.get('INGESTION_COLD_WAIT', 10))
+
+# Seconds a search result stays fresh before a background refresh is queued
+QUERY_CACHE_TTL = float(os.environ.get('QUERY_CACHE_TTL', 600))
+
+# Seconds between checks for searches queued by web workers (INGESTION_MODE=process)
+INGESTION_REQUEST_POLL = float(os.environ.get('INGESTION_REQUEST_POLL', 1))
+
+# Comma-separated searches polled from startup, e.g. "politik,ekonomi"
+INGESTION_QUERIES = [q.strip() for q in os.environ.get('INGESTION_QUERIES', '').split(',') if q.strip()]
+
+# Lock file electing the one process that polls a shared store
+INGESTION_LOCK_PATH = os.environ.get('INGESTION_LOCK_PATH') or (
+    f"{articles.path}.ingestion.lock" if articles.path else None
+)
+
+class PollLease:
+    """Exclusive lock on a file, held until the process exits"""
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        """True if this process holds the lease (taking it when it is free)"""
+        if self.file is not None or fcntl is None:
+            return True
+        f = open(self.path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def poll_lease():
+    """The lease for polling the shared store, or None when the store is per-process"""
+    return PollLease(INGESTION_LOCK_PATH) if INGESTION_LOCK_PATH else None
+
+class IngestionWorker:
+    """Polls monitored queries and refreshes searches on demand into an ArticleStore"""
+    def __init__(self, fetch, store, interval=INGESTION_INTERVAL, queries=None, lease=None, requests=False):
+        self.fetch = fetch
+        self.store = store
+        self.interval = interval
+        self.lease = lease
+        self.requests = requests  # also run the searches web workers queue in the store
+        self.lock = threading.Lock()
+        self.monitored = [None] + list(queries or [])  # None is the home page (default feeds)
+        self.pending = OrderedDict()  # query tag -> search query waiting for a refresh
+        self.done = {}  # query tag -> Future resolved when its queued refresh finishes
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def refresh(self, search_query):
+        """
+        Queue a background refresh of a query
+        Only one refresh per query is ever queued or running; the returned
+        Future resolves when it finishes.
+        """
+        tag = query_tag(search_query)
+        with self.lock:
+            future = self.done.get(tag)
+            if future is None:
+                future = self.done[tag] = Future()
+                self.pending[tag] = search_query
+        self.wake.set()
+        return future
+
+    def ingest(self, search_query):
+        """Run one ingestion pass for a single query"""
+        started = time.monotonic()
+        try:
+            article_list = self.fetch(search_query)
+            self.store.replace_query(search_query, article_list)
+            print(f"Ingested {len(article_list)} articles for '{query_tag(search_query)}' "
+                  f"in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"Error ingesting '{query_tag(search_query)}': {e}")
+
+    def _drain_pending(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                if not self.pending:
+                    return
+                tag, search_query = self.pending.popitem(last=False)
+            try:
+                self.ingest(search_query)
+            finally:
+                with self.lock:
+                    self.done.pop(tag).set_result(None)
+
+    def run(self):
+        """Poll loop: queued refreshes immediately, monitored queries every interval"""
+        next_poll = time.monotonic()
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            if time.monotonic() >= next_poll:
+                # Another process holding the lease already polls the shared store
+                if self.lease is None or self.lease.acquire():
+                    for search_query in self.monitored:
+                        self.refresh(search_query)
+                next_poll = time.monotonic() + self.interval
+            if self.requests:
+                for payload in self.store.take_requests():
+                    self.refresh(FetchQuery.from_dict(payload))
+            self._drain_pending()
+            timeout = max(0, next_poll - time.monotonic())
+            self.wake.wait(min(timeout, INGESTION_REQUEST_POLL) if self.requests else timeout)
+
+    def start(self):
+        """Run the poll loop on a daemon thread"""
+        self.thread = threading.Thread(target=self.run, name='ingestion', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        if self.lease is not None:
+            self.lease.release()
+
+# Worker running inside this process, if any
+worker = None
+
+# Seconds read_articles may block on a cold query; the async server sets it
+# to 0 once it has already awaited the refresh
+cold_wait = contextvars.ContextVar('cold_wait', default=INGESTION_COLD_WAIT)
+
+# A cold query handed to the separate ingestion process (INGESTION_MODE=process)
+REQUESTED = object()
+
+# Whether this process already warned that it cannot hand queries over
+warned_unrequested = False
+
+def start_worker(fetch):
+    """Start the in-process ingestion thread when INGESTION_MODE=thread"""
+    global worker
+    if INGESTION_MODE != 'thread' or worker is not None:
+        return worker
+
+    worker = IngestionWorker(fetch, articles, queries=INGESTION_QUERIES, lease=poll_lease()).start()
+    return worker
+
+def read_articles(search_query=None):
+    """
+    Read articles for a query from the shared store
+    Searches with enough matches among the stored articles are answered from
+    the local full-text index. Otherwise stale results are served
+    immediately while the worker refreshes them in the background, and a
+    query seen for the first time waits briefly for its first ingestion run,
+    falling back to whatever local matches there are if it does not finish.
+    `search_query` can also be a FetchQuery, whose refreshes only run the
+    connectors that can match its filters.
+    """
+    local = local_matches(search_query)
+    if local and len(local) >= SEARCH_MIN_RESULTS:
+        return local
+
+    refresh = cold_refresh(search_query)
+    if refresh is REQUESTED:
+        # Wait for the ingestion process to store the first results
+        stop = time.monotonic() + cold_wait.get()
+        while articles.query_age(search_query) is None and time.monotonic() < stop:
+            time.sleep(min(INGESTION_REQUEST_POLL, 0.2))
+    elif refresh is not None and cold_wait.get() > 0:
+        wait([refresh], cold_wait.get())
+
+    # The few local matches beat an empty page when ingestion has not finished
+    return stored_results(search_query) or local
+
+async def read_articles_async(search_query=None):
+    """read_articles for the async server: the cold wait yields to other requests"""
+    local = local_matches(search_query)
+    if local and len(local) >= SEARCH_MIN_RESULTS:
+        return local
+
+    refresh = cold_refresh(search_query)
+    if refresh is REQUESTED:
+        stop = time.monotonic() + INGESTION_COLD_WAIT
+        while articles.query_age(search_query) is None and time.monotonic() < stop:
+            await asyncio.sleep(min(INGESTION_REQUEST_POLL, 0.2))
+    elif refresh is not None:
+        try:
+            # shield: timing out must not cancel the refresh other readers share
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(refresh)), INGESTION_COLD_WAIT)
+        except asyncio.TimeoutError:
+            pass
+
+    return stored_results(search_query) or local
+
+def stored_results(search_query):
+    """The stored results of a query, cut to its limit if it has one"""
+    results = articles.query(search_query)
+    limit = FetchQuery.of(search_query).limit
+    return results[:limit] if limit else results
+
+def local_matches(search_query):
+    """
+    Stored articles matching a search (none for the home page)
+    Searches with at least SEARCH_MIN_RESULTS of them never go upstream.
+    """
+    fetch_query = FetchQuery.of(search_query)
+    if fetch_query.search_query:
+        return [a for a in articles.search(fetch_query.search_query) if fetch_query.accepts(a)]
+    return []
+
+def cold_refresh(search_query):
+    """
+    What a read has to wait for, if the query was never ingested: the
+    worker's Future, REQUESTED when the ingestion process was asked for it,
+    or None. Stale results only queue a background refresh.
+    """
+    if worker is None and INGESTION_MODE != 'process':
+        return None
+    age = articles.query_age(search_query)
+    if age is None:
+        # Someone is waiting: stop at the query's limit
+        return queue_refresh(search_query)
+    if age > QUERY_CACHE_TTL:
+        # Nobody waits on a background refresh, so it stores the full results
+        queue_refresh(FetchQuery.of(search_query).unlimited())
+    return None
+
+def queue_refresh(search_query):
+    """Refresh a query in this process's worker, or queue it for the ingestion process"""
+    global warned_unrequested
+    if worker is not None:
+        return worker.refresh(search_query)
+
+    fetch_query = FetchQuery.of(search_query)
+    if articles.request_query(fetch_query.tag, fetch_query.to_dict()):
+        return REQUESTED
+    if not warned_unrequested:
+        warned_unrequested = True
+        print(f"Warning: '{fetch_query.tag}' was never ingested and cannot be queued for the ingestion "
+              f"process without ARTICLE_STORE_DB; only INGESTION_QUERIES will be ingested")
+    return None
+
+if __name__ == '__main__':
+    from app import fetch_articles
+
+    if not articles.path:
+        print("Neither ARTICLE_STORE_DB nor ARTICLE_STORE_PATH is set; web workers will not see ingested articles")
+
+    IngestionWorker(fetch_articles, articles, queries=INGESTION_QUERIES, lease=poll_lease(), requests=True).run()
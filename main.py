@@ -9,7 +9,11 @@ logger = logging.getLogger(__name__)
 try:
     # Import your actual Flask application
     # Adjust this import to match your actual app's structure
-    from app import app
+    from app import app, fetch_articles
+    
+    # Keep the article store filled in the background (INGESTION_MODE=thread)
+    from ingestion import start_worker
+    start_worker(fetch_articles)
     
     if __name__ == "__main__":
         # This is used when running locally
@@ -0,0 +1,193 @@
+"""
+Staged ingestion pipeline for MediaMon
+
+Ingestion runs as a chain of generator stages:
+
+    fetch -> normalize -> dedupe -> language -> sentiment -> store
+
+The fetch stage drains the connectors on a background thread into a
+bounded queue, so network I/O overlaps with processing and never runs more
+than PIPELINE_QUEUE_SIZE items ahead. Every other stage is either a
+per-item function (returning the item, or None to drop it) or a batch
+function that receives up to batch_size items at once, so expensive work
+like language identification and sentiment scoring runs in batches. A
+stage never holds more than one batch.
+
+Stages are built per run, so they can carry per-run state; the Pipeline
+keeps per-stage counters (items in/out, batches, seconds spent inside the
+stage) by stage name across runs:
+
+    results = list(ingest_pipeline.run(source, stages))
+    print(ingest_pipeline.summary())
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Items handed from one batch stage to the next at a time
+PIPELINE_BATCH_SIZE = int(os.environ.get('PIPELINE_BATCH_SIZE', 64))
+
+# Fetched items allowed to wait for processing before the connectors block
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 256))
+
+class PipelineItem:
+    """One record moving through the stages"""
+    __slots__ = ('kind', 'raw', 'article', 'text', 'keys', 'reused')
+
+    def __init__(self, kind, raw):
+        self.kind = kind        # connector that produced it: 'news', 'twitter', ...
+        self.raw = raw          # connector-specific payload
+        self.article = None     # article dict, set by the normalize stage
+        self.text = None        # text that language and sentiment are judged on
+        self.keys = None        # de-duplication keys, if the connector uses them
+        self.reused = False     # True when a stored article is reused unchanged
+
+class StageStats:
+    """Counters for one stage"""
+    __slots__ = ('items_in', 'items_out', 'batches', 'seconds')
+
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'batches': self.batches,
+            'seconds': round(self.seconds, 4)
+        }
+
+class Stage:
+    """A named pipeline step over single items or batches of items"""
+    def __init__(self, name, fn, batch_size=None):
+        self.name = name
+        self.fn = fn
+        self.batch_size = batch_size
+
+    def process(self, stream, stats):
+        if self.batch_size is None:
+            for item in stream:
+                stats.items_in += 1
+                started = time.perf_counter()
+                try:
+                    item = self.fn(item)
+                except Exception as e:
+                    print(f"Error in {self.name} stage: {e}")
+                    item = None
+                stats.seconds += time.perf_counter() - started
+                if item is not None:
+                    stats.items_out += 1
+                    yield item
+            return
+
+        batch = []
+        for item in stream:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield from self._run_batch(batch, stats)
+                batch = []
+        if batch:
+            yield from self._run_batch(batch, stats)
+
+    def _run_batch(self, batch, stats):
+        stats.items_in += len(batch)
+        stats.batches += 1
+        started = time.perf_counter()
+        try:
+            results = self.fn(batch)
+        except Exception as e:
+            print(f"Error in {self.name} stage, dropping {len(batch)} items: {e}")
+            results = []
+        stats.seconds += time.perf_counter() - started
+        stats.items_out += len(results)
+        return results
+
+_DONE = object()
+
+class Pipeline:
+    """Runs sources through stages, keeping per-stage counters across runs"""
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stats = OrderedDict(fetch=StageStats())
+        self.runs = 0
+
+    def _stats_for(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = StageStats()
+        return stats
+
+    def _fetch(self, source, queue_size):
+        """Drain the source on a background thread into a bounded queue"""
+        stats = self.stats['fetch']
+        buffer = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    buffer.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            iterator = iter(source)
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        stats.seconds += time.perf_counter() - started
+                    stats.items_in += 1
+                    stats.items_out += 1
+                    if not put(item):
+                        return
+            except Exception as e:
+                print(f"Error in fetch stage: {e}")
+            put(_DONE)
+
+        producer = threading.Thread(target=produce, name='pipeline-fetch', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Unblock the producer if the consumer stopped early
+            stop.set()
+
+    def run(self, source, stages, queue_size=None):
+        """
+        Generator of the items that make it through every stage
+        `queue_size` lowers the fetch read-ahead for this run, e.g. to a
+        run's result limit.
+        """
+        self.runs += 1
+        stream = self._fetch(source, min(queue_size or self.queue_size, self.queue_size))
+        for stage in stages:
+            stream = stage.process(stream, self._stats_for(stage.name))
+        return stream
+
+    def stats_dict(self):
+        return {
+            'runs': self.runs,
+            'stages': {name: stats.to_dict() for name, stats in self.stats.items()}
+        }
+
+    def summary(self):
+        """One-line timing summary, e.g. for ingestion logs"""
+        return ', '.join(
+            f"{name} {stats.seconds:.2f}s/{stats.items_out}" for name, stats in self.stats.items()
+        )
@@ -0,0 +1,156 @@
+"""
+Local full-text search over ingested articles
+
+Searches are answered from the articles already in the store before going
+back out to Google News. Titles and summaries (with HTML stripped) are
+reduced to search tokens: lowercased, accents removed, reduplicated words
+("anak-anak") reduced to their base, Indonesian particles and possessives
+("-lah", "-kah", "-pun", "-nya", "-ku", "-mu") stripped, and common
+Indonesian/English function words dropped. Queries are tokenized the same
+way, so "kebijakannya" finds "kebijakan".
+
+The in-memory store keeps a SearchIndex (an inverted index ranked with
+BM25, title terms weighted double); the SQLite store indexes the same
+tokens in an FTS5 table. Every query token has to match:
+
+    index = SearchIndex()
+    index.add(article)
+    ids = index.search('harga beras', limit=50)
+
+A query with fewer than SEARCH_MIN_RESULTS local matches counts as cold
+and is searched upstream instead.
+"""
+import html
+import math
+import os
+import re
+import unicodedata
+
+# Local matches needed to answer a search without going upstream
+SEARCH_MIN_RESULTS = int(os.environ.get('SEARCH_MIN_RESULTS', 5))
+
+# Most results a local search returns
+SEARCH_LIMIT = int(os.environ.get('SEARCH_LIMIT', 100))
+
+# Title terms count this many times the summary's
+TITLE_WEIGHT = 2
+
+STOPWORDS = frozenset((
+    'dan', 'atau', 'yang', 'di', 'ke', 'dari', 'ini', 'itu', 'dengan', 'untuk',
+    'dalam', 'pada', 'akan', 'oleh', 'juga', 'adalah', 'sebagai', 'tidak', 'ada',
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are',
+    'was', 'with', 'by', 'at', 'as', 'from', 'it', 'be', 'that', 'this'
+))
+
+_PARTICLES = ('lah', 'kah', 'tah', 'pun')
+_POSSESSIVES = ('nya', 'ku', 'mu')
+
+_tags = re.compile(r'<[^>]+>')
+_words = re.compile(r'[^\W_]+(?:-[^\W_]+)*', re.UNICODE)
+
+def _strip_suffix(word, suffixes):
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+def clean_text(text):
+    """Plain text of a title or HTML summary"""
+    if not text:
+        return ''
+    if not isinstance(text, str):
+        text = str(text)
+    return html.unescape(_tags.sub(' ', text))
+
+def tokenize(text):
+    """Search tokens of a text, in order"""
+    text = unicodedata.normalize('NFKD', clean_text(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for word in _words.findall(text):
+        # "anak-anak" and "anak-anaknya" index as "anak"; "covid-19" as both parts
+        parts = word.split('-')
+        if len(parts) == 2 and parts[1].startswith(parts[0]):
+            parts = parts[:1]
+        for part in parts:
+            # "jakarta-nya" is a clitic, not a second word
+            if part in STOPWORDS or part in _POSSESSIVES or part in _PARTICLES:
+                continue
+            if part.isalpha():
+                part = _strip_suffix(_strip_suffix(part, _PARTICLES), _POSSESSIVES)
+            tokens.append(part)
+    return tokens
+
+def article_terms(article):
+    """Term frequencies of an article, title terms weighted"""
+    terms = {}
+    for token in tokenize(article.title):
+        terms[token] = terms.get(token, 0) + TITLE_WEIGHT
+    for token in tokenize(article.summary):
+        terms[token] = terms.get(token, 0) + 1
+    return terms
+
+class SearchIndex:
+    """In-memory inverted index over article titles and summaries, ranked with BM25"""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}  # token -> {article_id: term frequency}
+        self.lengths = {}   # article_id -> weighted token count
+        self.tokens = {}    # article_id -> its indexed tokens
+        self.total_length = 0
+
+    def add(self, article):
+        """Index an article, replacing any earlier version of it"""
+        self.remove(article.id)
+        terms = article_terms(article)
+        for token, frequency in terms.items():
+            self.postings.setdefault(token, {})[article.id] = frequency
+        self.tokens[article.id] = tuple(terms)
+        length = sum(terms.values())
+        self.lengths[article.id] = length
+        self.total_length += length
+
+    def remove(self, article_id):
+        length = self.lengths.pop(article_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for token in self.tokens.pop(article_id):
+            docs = self.postings[token]
+            del docs[article_id]
+            if not docs:
+                del self.postings[token]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """IDs of the articles matching every query token, best first"""
+        tokens = set(tokenize(query))
+        if not tokens or not self.lengths:
+            return []
+
+        postings = []
+        for token in tokens:
+            docs = self.postings.get(token)
+            if not docs:
+                return []
+            postings.append(docs)
+        postings.sort(key=len)
+
+        # Candidates are the rarest token's documents
+        candidates = [doc for doc in postings[0] if all(doc in docs for docs in postings[1:])]
+
+        count = len(self.lengths)
+        average = self.total_length / count
+        scores = {}
+        for docs in postings:
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc in candidates:
+                frequency = docs[doc]
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[doc] / average)
+                scores[doc] = scores.get(doc, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+
+        return sorted(candidates, key=scores.get, reverse=True)[:limit]
+
+    def __len__(self):
+        return len(self.lengths)
@@ -0,0 +1,423 @@
+"""
+Batch sentiment engine for MediaMon
+
+TextBlob builds a blob object per text, runs pattern's general-purpose
+tokenizer and walks a lazily loaded lexicon of per-POS dictionaries on every
+call. This engine loads the same pattern lexicon once into a flat
+word -> (polarity, subjectivity, intensity, is_modifier) dict and scores a
+whole list of texts with a lean tokenizer and the same assessment rules
+(modifiers, negation, exclamation marks, emoticons), so polarity matches
+TextBlob(text).sentiment.polarity.
+
+    from sentiment import sentiment_engine
+    scores = sentiment_engine.score_batch(titles)
+
+IndonesianSentiment scores Indonesian text against the lexicon in
+sentiment_id.tsv. A rule-based affix stemmer reduces derived forms
+(me-/ber-/di-/ter-/pe-/ke-...-an, -kan, -i, -nya, -lah) to lexicon roots, and
+its results are memoized so a repeated word costs one dictionary lookup.
+score_batch(texts, languages) sends each text to the scorer for its
+language; Indonesian texts with no lexicon hit are scored in English too.
+
+SentimentCache memoizes scores in a bounded LRU keyed by a hash of the
+normalized text, its language and MODEL_VERSION, optionally persisted to
+disk, with hit/miss counters to show how much re-scoring it saves.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from textblob.en import sentiment as pattern_sentiment
+from textblob._text import EMOTICONS, PUNCTUATION, ABBREVIATIONS, RE_SARCASM, RE_EMOTICONS
+
+# Bump whenever scoring or a lexicon changes so memoized results are not reused
+MODEL_VERSION = 'pattern-en-1/lexicon-id-1/en-fallback-1'
+
+INDONESIAN_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_id.tsv')
+
+# Distinct Indonesian words whose stems are memoized before the memo is reset
+STEM_CACHE_SIZE = int(os.environ.get('STEM_CACHE_SIZE', 100000))
+
+# Memoized scores kept in memory, and where to persist them (optional)
+SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 50000))
+SENTIMENT_CACHE_PATH = os.environ.get('SENTIMENT_CACHE_PATH')
+
+# Same negations pattern uses for English
+NEGATIONS = frozenset(("no", "not", "n't", "never"))
+
+# Pattern's contraction handling: "'s" -> " 's", "n't" -> " n't", ...
+_CONTRACTIONS = re.compile(r"('d|'m|'s|'ll|'re|'ve|n't)")
+
+# Quotes get surrounded by spaces before splitting
+_QUOTES = str.maketrans({q: f" {q} " for q in ('“', '”', '‘', '’', "'", '"')})
+
+_LEADING = tuple(PUNCTUATION.replace(".", ""))
+_TRAILING = _LEADING + (".",)
+_ABBR1 = re.compile(r"^[A-Za-z]\.$")
+_ABBR2 = re.compile(r"^([A-Za-z]\.)+$")
+_ABBR3 = re.compile("^[A-Z][" + "|".join("bcdfghjklmnpqrstvwxz") + "]+.$")
+
+def _clamp(value):
+    return -1.0 if value < -1.0 else 1.0 if value > 1.0 else value
+
+class LexiconSentiment:
+    """Pattern-compatible polarity scoring over a precompiled lexicon"""
+    def __init__(self):
+        # Force pattern to parse its XML lexicon once, then flatten it
+        pattern_sentiment.load()
+        self.lexicon = {}
+        for word, senses in dict.items(pattern_sentiment):
+            p, s, i = senses[None]
+            self.lexicon[word] = (p, s, i, 'RB' in senses)
+
+        # Lowercased emoticon -> polarity, first match wins like pattern
+        self.emoticons = {}
+        for (_, polarity), faces in EMOTICONS.items():
+            for face in faces:
+                self.emoticons.setdefault(face.lower(), polarity)
+
+    def tokenize(self, text):
+        """Lowercased tokens, split the way pattern's find_tokens splits them"""
+        text = _CONTRACTIONS.sub(r" \1", text).translate(_QUOTES)
+
+        tokens = []
+        split = False
+        for t in text.split():
+            tail = []
+            while t.startswith(_LEADING):
+                tokens.append(t[0])
+                t = t[1:]
+                split = True
+            while t.endswith(_TRAILING):
+                if t.endswith(_LEADING):
+                    tail.append(t[-1])
+                    t = t[:-1]
+                if t.endswith("..."):
+                    tail.append("...")
+                    t = t[:-3].rstrip(".")
+                if t.endswith("."):
+                    if t in ABBREVIATIONS or _ABBR1.match(t) or _ABBR2.match(t) or _ABBR3.match(t):
+                        break
+                    tail.append(".")
+                    t = t[:-1]
+            if t:
+                tokens.append(t)
+            if tail:
+                tokens.extend(reversed(tail))
+                split = True
+
+        joined = " ".join(tokens)
+        if split:
+            # Re-join "( ! )" and emoticons like ": )" that splitting took apart
+            if "!" in joined:
+                joined = RE_SARCASM.sub("(!)", joined)
+            joined = RE_EMOTICONS.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), joined)
+        return joined.lower().split()
+
+    def polarity(self, text):
+        """Polarity in [-1.0, 1.0] for a single text"""
+        if not isinstance(text, str) or not text:
+            return 0.0
+
+        lexicon = self.lexicon
+        scored = []  # [polarity, subjectivity, intensity, negated]
+        modifier = None
+        negation = None
+
+        for w in self.tokenize(text):
+            entry = lexicon.get(w)
+            if entry is not None:
+                p, s, i, is_modifier = entry
+                if modifier is None:
+                    scored.append([p, s, i, False])
+                else:
+                    # "really good": scale by the modifier's intensity
+                    last = scored[-1]
+                    last[0] = _clamp(p * last[2])
+                    last[1] = _clamp(s * last[2])
+                    last[2] = i
+                if negation is not None:
+                    last = scored[-1]
+                    last[2] = 1.0 / last[2]
+                    last[3] = True
+                modifier = w if is_modifier else None
+                negation = w if w in NEGATIONS else None
+            else:
+                if w in NEGATIONS:
+                    negation = w
+                elif negation and len(w.strip("'")) > 1:
+                    negation = None
+                if negation is not None and modifier is not None and modifier.endswith("ly"):
+                    # "really not good"
+                    scored[-1][3] = True
+                    negation = None
+                elif modifier and len(w) > 2:
+                    modifier = None
+                if w == "!" and scored:
+                    scored[-1][0] = _clamp(scored[-1][0] * 1.25)
+                if w == "(!)":
+                    scored.append([0.0, 1.0, 1.0, False])
+                if not w.isalpha() and len(w) <= 5 and w not in PUNCTUATION:
+                    face = self.emoticons.get(w)
+                    if face is not None:
+                        scored.append([face, 1.0, 1.0, False])
+
+        if not scored:
+            return 0.0
+        # "not good" = slightly bad, "not bad" = slightly good
+        return sum(p * -0.5 if negated else p for p, _, _, negated in scored) / len(scored)
+
+    def score_batch(self, texts):
+        """Polarity for every text in the list, in order"""
+        polarity = self.polarity
+        return [polarity(text) for text in texts]
+
+# Indonesian negations and intensifiers; "sekali"/"banget" follow their word
+INDONESIAN_NEGATIONS = frozenset(("tidak", "tak", "bukan", "belum", "jangan", "tanpa", "kurang"))
+INDONESIAN_INTENSIFIERS = {"sangat": 1.3, "amat": 1.3, "paling": 1.5, "terlalu": 1.2, "makin": 1.2, "semakin": 1.2, "begitu": 1.2}
+INDONESIAN_POST_INTENSIFIERS = {"sekali": 1.3, "banget": 1.3}
+
+# Affixes tried by the stemmer, outermost first
+_PARTICLES = ('lah', 'kah', 'tah', 'pun')
+_POSSESSIVES = ('nya', 'ku', 'mu')
+_DERIVATIONAL = ('kan', 'an', 'i')
+
+# Prefix -> replacements for the removed prefix ("menulis" -> "tulis")
+_PREFIXES = (
+    ('memper', ('',)), ('diper', ('',)), ('menge', ('',)), ('penge', ('',)),
+    ('meny', ('s',)), ('meng', ('', 'k')), ('mem', ('p', '')), ('men', ('t', '')), ('me', ('',)),
+    ('peny', ('s',)), ('peng', ('', 'k')), ('pem', ('p', '')), ('pen', ('t', '')), ('per', ('',)), ('pe', ('',)),
+    ('ber', ('',)), ('bel', ('',)), ('be', ('',)), ('ter', ('',)), ('di', ('',)), ('ke', ('',)), ('se', ('',)),
+)
+
+_indonesian_tokens = re.compile(r"[a-z]+(?:-[a-z]+)*")
+
+class IndonesianSentiment:
+    """Lexicon polarity scoring for Indonesian with a memoized affix stemmer"""
+    def __init__(self, path=INDONESIAN_LEXICON_PATH, max_stems=STEM_CACHE_SIZE):
+        self.lexicon = {}
+        self.phrases = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                word, polarity = line.split('\t')
+                target = self.phrases if ' ' in word else self.lexicon
+                target[word] = float(polarity)
+        self.max_stems = max_stems
+        self.stems = {}  # word -> lexicon root, or None when it has none
+
+    def _prefix_forms(self, word, depth=2):
+        yield word
+        if depth == 0:
+            return
+        for prefix, replacements in _PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= 3:
+                rest = word[len(prefix):]
+                for replacement in replacements:
+                    yield from self._prefix_forms(replacement + rest, depth - 1)
+
+    def _suffix_forms(self, word):
+        forms = [word]
+        for particle in _PARTICLES:
+            if word.endswith(particle) and len(word) - len(particle) >= 4:
+                forms.append(word[:-len(particle)])
+        for form in list(forms):
+            for possessive in _POSSESSIVES:
+                if form.endswith(possessive) and len(form) - len(possessive) >= 4:
+                    forms.append(form[:-len(possessive)])
+        for form in list(forms):
+            for suffix in _DERIVATIONAL:
+                if form.endswith(suffix) and len(form) - len(suffix) >= 4:
+                    forms.append(form[:-len(suffix)])
+        return forms
+
+    def stem(self, word):
+        """Lexicon root of a lowercased word ("kesulitan" -> "sulit"), or None"""
+        root = self.stems.get(word, False)
+        if root is not False:
+            return root
+
+        root = None
+        lexicon = self.lexicon
+        if word in lexicon:
+            root = word
+        elif len(word) > 4:
+            # Least stripped form wins, so "penghargaan" is not read as "harga"
+            for form in self._suffix_forms(word):
+                root = next((f for f in self._prefix_forms(form) if f in lexicon), None)
+                if root is not None:
+                    break
+
+        if len(self.stems) >= self.max_stems:
+            self.stems.clear()
+        self.stems[word] = root
+        return root
+
+    def polarity(self, text):
+        """Polarity in [-1.0, 1.0] for a single Indonesian text"""
+        if not isinstance(text, str) or not text:
+            return 0.0
+
+        tokens = _indonesian_tokens.findall(text.lower())
+        scored = []
+        negation = 0  # words a negation still reaches ("tidak begitu efektif")
+        intensity = 1.0
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            i += 1
+            if token in INDONESIAN_NEGATIONS:
+                negation = 2
+                continue
+            if token in INDONESIAN_INTENSIFIERS:
+                intensity = INDONESIAN_INTENSIFIERS[token]
+                continue
+            if token in INDONESIAN_POST_INTENSIFIERS:
+                if scored:
+                    scored[-1] = _clamp(scored[-1] * INDONESIAN_POST_INTENSIFIERS[token])
+                continue
+
+            phrase = f"{token} {tokens[i]}" if i < len(tokens) else None
+            if phrase in self.phrases:
+                polarity = self.phrases[phrase]
+                i += 1
+            else:
+                # Reduplicated forms like "obat-obatan" score as their first part
+                root = self.stem(token.split('-', 1)[0])
+                polarity = self.lexicon[root] if root is not None else 0.0
+
+            if polarity:
+                polarity = _clamp(polarity * intensity)
+                if negation:
+                    # "tidak efektif" = slightly bad, same weighting pattern uses
+                    polarity *= -0.5
+                scored.append(polarity)
+                negation = 0
+            elif negation:
+                negation -= 1
+            intensity = 1.0
+
+        if not scored:
+            return 0.0
+        return sum(scored) / len(scored)
+
+    def score_batch(self, texts):
+        """Polarity for every text in the list, in order"""
+        polarity = self.polarity
+        return [polarity(text) for text in texts]
+
+class SentimentCache:
+    """Bounded LRU of polarity scores with hit/miss counters"""
+    def __init__(self, max_size=SENTIMENT_CACHE_SIZE, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.scores = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+        if self.path:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                if snapshot.get('model_version') == MODEL_VERSION:
+                    self.scores = OrderedDict(snapshot.get('scores', []))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                print(f"Error loading sentiment cache: {e}")
+
+    @staticmethod
+    def key(text, language):
+        """Hash of the whitespace-normalized text, language and model version"""
+        normalized = ' '.join(text.split()) if isinstance(text, str) else ''
+        return hashlib.sha1(f"{MODEL_VERSION}|{language}|{normalized}".encode('utf-8')).hexdigest()
+
+    def score_batch(self, texts, languages, scorer):
+        """
+        Scores for texts, calling scorer(texts, languages) once for the misses only
+        """
+        keys = [self.key(text, language) for text, language in zip(texts, languages)]
+        results = [None] * len(texts)
+        missing = []
+
+        with self.lock:
+            for index, key in enumerate(keys):
+                score = self.scores.get(key)
+                if score is None:
+                    missing.append(index)
+                else:
+                    self.scores.move_to_end(key)
+                    results[index] = score
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            scored = scorer([texts[i] for i in missing], [languages[i] for i in missing])
+            with self.lock:
+                for index, score in zip(missing, scored):
+                    results[index] = score
+                    self.scores[keys[index]] = score
+                while len(self.scores) > self.max_size:
+                    self.scores.popitem(last=False)
+                self.dirty = True
+
+        return results
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'model_version': MODEL_VERSION,
+            'size': len(self.scores),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def save(self):
+        """Persist the cache if a path is configured and it changed"""
+        if not self.path or not self.dirty:
+            return
+
+        with self.lock:
+            data = json.dumps({'model_version': MODEL_VERSION, 'scores': list(self.scores.items())})
+            self.dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving sentiment cache: {e}")
+
+# Loaded once per process
+sentiment_engine = LexiconSentiment()
+indonesian_sentiment = IndonesianSentiment()
+sentiment_cache = SentimentCache(path=SENTIMENT_CACHE_PATH)
+
+def score_batch(texts, languages):
+    """
+    Polarity for every text, Indonesian ones with the Indonesian scorer and
+    everything else with the English engine, each language in one batch.
+    Indonesian texts the lexicon finds nothing in (English words in an
+    Indonesian title, or a misdetected short text) get the English score.
+    """
+    scores = [0.0] * len(texts)
+    indonesian = [i for i, language in enumerate(languages) if language == 'id']
+    other = [i for i, language in enumerate(languages) if language != 'id']
+    for i, score in zip(indonesian, indonesian_sentiment.score_batch([texts[i] for i in indonesian])):
+        scores[i] = score
+    other += [i for i in indonesian if not scores[i]]
+    if other:
+        for i, score in zip(other, sentiment_engine.score_batch([texts[i] for i in other])):
+            scores[i] = score
+    return scores
@@ -0,0 +1,94 @@
+"""
+Reusable social media clients for MediaMon
+
+Connectors ask the registry for their client instead of building and
+authenticating a new one on every fetch. Each client is created once per
+process by the factory registered for it, and only rebuilt when a call
+fails with one of that client's authentication errors:
+
+    social_clients.register('twitter', create_twitter_client, auth_errors=(tweepy.errors.Unauthorized,))
+    tweets = social_clients.call('twitter', lambda api: api.home_timeline(count=10))
+
+Factories take a `refresh` flag: False on first use (a factory may restore
+a saved session), True after an auth failure (it must log in again). The
+Instagram session is saved to INSTAGRAM_SESSION_PATH, so restarts reuse it
+instead of logging in.
+"""
+import os
+import tempfile
+import threading
+
+# Instagram session file kept across restarts
+INSTAGRAM_SESSION_PATH = os.environ.get(
+    'INSTAGRAM_SESSION_PATH',
+    os.path.join(tempfile.gettempdir(), 'mediamon_instagram.session')
+)
+
+class ClientRegistry:
+    """Creates each registered client once and re-authenticates it lazily"""
+    def __init__(self):
+        self.factories = {}    # name -> (factory, auth error types)
+        self.clients = {}      # name -> live client
+        self.lock = threading.Lock()
+        self.created = {}      # name -> clients built
+        self.refreshed = {}    # name -> rebuilds after an auth failure
+
+    def register(self, name, factory, auth_errors=()):
+        with self.lock:
+            self.factories[name] = (factory, tuple(auth_errors))
+            self.clients.pop(name, None)
+
+    def get(self, name):
+        """The live client, created on first use"""
+        client = self.clients.get(name)
+        if client is not None:
+            return client
+        with self.lock:
+            client = self.clients.get(name)
+            if client is None:
+                client = self._create(name, refresh=False)
+            return client
+
+    def refresh(self, name, stale=None):
+        """
+        Rebuild a client after an auth failure
+        Threads that hit the failure with the same client share one rebuild.
+        """
+        with self.lock:
+            client = self.clients.get(name)
+            if client is not None and stale is not None and client is not stale:
+                return client  # already rebuilt by another thread
+            self.refreshed[name] = self.refreshed.get(name, 0) + 1
+            return self._create(name, refresh=True)
+
+    def _create(self, name, refresh):
+        factory, _ = self.factories[name]
+        client = factory(refresh=refresh)
+        self.clients[name] = client
+        self.created[name] = self.created.get(name, 0) + 1
+        return client
+
+    def auth_errors(self, name):
+        return self.factories[name][1]
+
+    def call(self, name, fn):
+        """fn(client), retried once with a re-authenticated client on an auth failure"""
+        client = self.get(name)
+        try:
+            return fn(client)
+        except self.auth_errors(name) as e:
+            print(f"{name} authentication failed ({e}), logging in again")
+            return fn(self.refresh(name, stale=client))
+
+    def stats(self):
+        return {
+            name: {
+                'active': name in self.clients,
+                'created': self.created.get(name, 0),
+                'refreshed': self.refreshed.get(name, 0)
+            }
+            for name in self.factories
+        }
+
+# Clients shared by every connector in this process
+social_clients = ClientRegistry()